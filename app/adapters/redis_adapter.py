@@ -1,37 +1,232 @@
 """
 Adapter for Redis operations.
+
+All calls go through ``redis.asyncio`` on a single bounded connection pool, so a
+slow Redis round trip suspends only the awaiting coroutine instead of the whole
+event loop. With a ResiliencePolicy, calls (including scripts and pipelines)
+also fail fast while Redis is down and never outlive the request's deadline.
 """
 
-import redis
+import time
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline, PubSub
+from redis.client import NEVER_DECODE
+from redis.commands.core import AsyncScript
 
 from app.utils.logger import logger
+from app.utils.metrics import metrics
+from app.utils.resilience import ResiliencePolicy
+
+
+T = TypeVar("T")
+
+REDIS_COMMAND_SECONDS = metrics.histogram("redis_command_seconds", "Redis round trip per command, including "
+                                          "waiting for a pooled connection", ("command",))
+REDIS_COMMAND_ERRORS = metrics.counter("redis_command_errors_total", "Redis calls that raised", ("command",))
+REDIS_POOL_WAIT_SECONDS = metrics.histogram("redis_pool_wait_seconds", "Time to check a connection out of the pool")
+
+# Command options that return the reply as bytes (binary values), e.g. pipe.execute_command("GET", key, **UNDECODED)
+UNDECODED = {NEVER_DECODE: True}
+
+async def timed(command: str, operation: Callable[[], Awaitable[T]],
+                resilience: Optional[ResiliencePolicy] = None, idempotent: bool = False) -> T:
+    """
+    Run ``operation`` (through ``resilience`` when given) and record its
+    latency, or its failure, under ``command``.
+    """
+    started = time.perf_counter()
+    try:
+        if resilience is None:
+            return await operation()
+        return await resilience.call(operation, idempotent=idempotent)
+    except Exception:
+        REDIS_COMMAND_ERRORS.labels(command).inc()
+        raise
+    finally:
+        REDIS_COMMAND_SECONDS.labels(command).observe(time.perf_counter() - started)
+
+class ResilientPipeline(Pipeline):
+    """
+    Pipeline whose ``execute`` goes through the adapter's ResiliencePolicy.
+    Pipelines may hold non-idempotent commands, so they are never retried.
+    """
+
+    resilience: Optional[ResiliencePolicy] = None
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        return await timed("pipeline", lambda: Pipeline.execute(self, raise_on_error), self.resilience)
+
+class ResilientScript:
+    """
+    A registered Lua script whose direct calls go through the adapter's
+    ResiliencePolicy; calls queued on a pipeline (``client=pipe``) run with it.
+    Queuing happens at once, like any pipelined command, so it need not be
+    awaited.
+    """
+
+    def __init__(self, script: AsyncScript, resilience: Optional[ResiliencePolicy]):
+        self.script = script
+        self.resilience = resilience
+
+    @property
+    def sha(self) -> str:
+        return self.script.sha
+
+    @sha.setter
+    def sha(self, value: str) -> None:
+        self.script.sha = value
+
+    def __call__(self, keys: Optional[list] = None, args: Optional[list] = None, client=None) -> Awaitable[Any]:
+        if client is not None:
+            # The pipeline loads the scripts it holds before it executes
+            keys = keys or []
+            client.scripts.add(self.script)
+            return client.evalsha(self.script.sha, len(keys), *keys, *(args or []))
+        return timed("evalsha", lambda: self.script(keys=keys, args=args), self.resilience)
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    BlockingConnectionPool that records how long each checkout waited, the
+    first sign of a pool that is too small.
+    """
+
+    async def get_connection(self, command_name, *keys, **options):
+        started = time.perf_counter()
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        finally:
+            REDIS_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
 
 class RedisAdapter:
-    def __init__(self, redis_url: str):
-        self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+    def __init__(self, redis_url: str = None, max_connections: int = 50,
+                 socket_timeout: float = 1.0, socket_connect_timeout: float = 1.0,
+                 pool_timeout: float = 1.0, client: Optional[Redis] = None,
+                 resilience: Optional[ResiliencePolicy] = None):
+        """
+        Either build a pooled client from ``redis_url`` or wrap an existing
+        asyncio ``client`` (useful for benchmarks against a local stand-in).
+
+        ``pool_timeout`` bounds how long a caller waits for a free connection
+        once ``max_connections`` are checked out. ``resilience`` guards every
+        call; reads are the idempotent ones it may retry or hedge.
+        """
+        self.resilience = resilience
+        if client is not None:
+            self.pool = client.connection_pool
+            self.redis = client
+            return
+
+        self.pool = InstrumentedConnectionPool.from_url(
+            redis_url,
+            max_connections=max_connections,
+            timeout=pool_timeout,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_connect_timeout,
+            decode_responses=True,
+        )
+        self.redis = Redis(connection_pool=self.pool)
+
+    def _call(self, command: str, operation: Callable[[], Awaitable[T]], idempotent: bool = False) -> Awaitable[T]:
+        return timed(command, operation, self.resilience, idempotent)
+
+    async def get(self, key: str) -> str:
+        return await self._call("get", lambda: self.redis.get(key), idempotent=True)
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """
+        Like ``get``, for binary values: the reply is not decoded.
+        """
+        return await self._call("get", lambda: self.redis.execute_command("GET", key, **UNDECODED), idempotent=True)
+
+    async def set(self, key: str, value: str, expire: int = None) -> None:
+        await self._call("set", lambda: self.redis.set(key, value, ex=expire))
+
+    async def set_nx(self, key: str, value: str, expire_ms: int = None) -> bool:
+        """
+        Set ``key`` only if it does not exist; returns True when it was set.
+        """
+        return bool(await self._call("set", lambda: self.redis.set(key, value, px=expire_ms, nx=True)))
+
+    async def mget(self, keys: list[str]) -> list[str]:
+        return await self._call("mget", lambda: self.redis.mget(keys), idempotent=True)
 
-    def get(self, key: str) -> str:
-        return self.redis.get(key)
+    async def mget_bytes(self, keys: list[str]) -> list[Optional[bytes]]:
+        return await self._call("mget", lambda: self.redis.execute_command("MGET", *keys, **UNDECODED),
+                                idempotent=True)
 
-    def set(self, key: str, value: str, expire: int = None) -> None:
-        self.redis.set(key, value, ex=expire)
+    async def mset(self, mapping: dict) -> None:
+        await self._call("mset", lambda: self.redis.mset(mapping))
 
-    def incr(self, key: str) -> int:
-        return self.redis.incr(key)
+    async def incr(self, key: str) -> int:
+        return await self._call("incr", lambda: self.redis.incr(key))
 
-    def expire(self, key: str, time: int) -> None:
-        self.redis.expire(key, time)
+    async def expire(self, key: str, time: int) -> None:
+        await self._call("expire", lambda: self.redis.expire(key, time))
 
-    def hgetall(self, key: str) -> dict:
-        return self.redis.hgetall(key)
+    async def delete(self, *keys: str) -> int:
+        return await self._call("delete", lambda: self.redis.delete(*keys))
 
-    def hmset(self, key: str, mapping: dict) -> None:
-        self.redis.hset(key, mapping=mapping)
+    async def hgetall(self, key: str) -> dict:
+        return await self._call("hgetall", lambda: self.redis.hgetall(key), idempotent=True)
 
-    def ping(self) -> bool:
+    async def hmset(self, key: str, mapping: dict) -> None:
+        await self._call("hset", lambda: self.redis.hset(key, mapping=mapping))
+
+    def register_script(self, script: str) -> ResilientScript:
+        """
+        Register a Lua script. Calling the returned object runs it with EVALSHA,
+        loading it on first use; pass ``client=pipe`` to queue it in a pipeline.
+        """
+        return ResilientScript(self.redis.register_script(script), self.resilience)
+
+    async def publish(self, channel: str, message: str) -> int:
+        return await self._call("publish", lambda: self.redis.publish(channel, message))
+
+    def pubsub(self) -> PubSub:
+        """
+        Return a PubSub object; it holds one pooled connection while subscribed.
+        """
+        return self.redis.pubsub()
+
+    async def script_load(self, script: str) -> str:
+        return await self._call("script_load", lambda: self.redis.script_load(script), idempotent=True)
+
+    def pipeline(self, transaction: bool = False) -> Pipeline:
+        """
+        Return a pipeline bound to the shared pool. Commands are buffered and
+        sent in one round trip on ``await pipe.execute()``; with
+        ``transaction=True`` they are wrapped in MULTI/EXEC.
+        """
+        pipe = ResilientPipeline(self.redis.connection_pool, self.redis.response_callbacks, transaction, None)
+        pipe.resilience = self.resilience
+        return pipe
+
+    async def transaction(self, func: Callable[[Pipeline], Awaitable[Any]], *watches: str) -> Any:
+        """
+        Run ``func`` inside an optimistic WATCH/MULTI/EXEC transaction, retrying
+        when one of the watched keys changes underneath it.
+        """
+        return await self._call("transaction", lambda: self.redis.transaction(func, *watches, value_from_callable=True))
+
+    async def ping(self) -> bool:
         try:
-            return self.redis.ping()
+            return await self._call("ping", self.redis.ping, idempotent=True)
         except Exception as e:
             logger.error(f"Error while checking redis ping: {e}")
             return False
 
+    def pool_stats(self) -> dict:
+        """
+        Connections checked out, idle and allowed, for saturation metrics.
+        """
+        return {
+            "in_use": len(getattr(self.pool, "_in_use_connections", ())),
+            "idle": len(getattr(self.pool, "_available_connections", ())),
+            "max": getattr(self.pool, "max_connections", 0),
+        }
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+        await self.pool.disconnect()
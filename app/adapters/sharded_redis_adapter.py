@@ -0,0 +1,298 @@
+"""
+Adapter that spreads keys over several Redis nodes by consistent hashing.
+
+It offers the same calls as ``RedisAdapter``, so the services run on it
+unchanged. Each node is a ``RedisAdapter`` with its own pool and circuit
+breaker; a key's node comes from a HashRing, so keys sharing a hash tag
+(``rate_limit:gcra:*:{alice}``) stay together and adding or removing a node
+moves about 1/N of the keys. Keys are not copied when they move: cached
+entries are recomputed and the rate limit windows of the affected clients
+start over.
+
+Lua scripts, ``MULTI`` transactions and multi-key commands queued on a
+pipeline must only touch keys of one node (give them a common hash tag).
+Pipelines are split by node and sent to all nodes in parallel; with
+``transaction=True`` each node's share runs in its own MULTI/EXEC, so the
+batch is atomic per node only. Pub/sub and keyless commands go to the first
+node.
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Iterable, Optional
+from urllib.parse import urlparse
+
+from redis.asyncio.client import Pipeline, PubSub
+from redis.commands.core import AsyncCoreCommands
+
+from app.adapters.redis_adapter import RedisAdapter, ResilientScript
+from app.utils.hash_ring import HashRing
+from app.utils.logger import logger
+from app.utils.resilience import ResiliencePolicy
+
+
+# Commands whose first key follows the script and the number of keys
+SCRIPT_COMMANDS = frozenset({"EVAL", "EVALSHA", "EVAL_RO", "EVALSHA_RO"})
+
+def node_name(url: str) -> str:
+    """
+    ``host:port/db`` of a Redis URL, without credentials (names show up in metrics and logs).
+    """
+    parsed = urlparse(url)
+    return f"{parsed.hostname}:{parsed.port or 6379}{parsed.path or '/0'}"
+
+class ShardedScript:
+    """
+    A Lua script registered on every node; each call runs on the node of its
+    first key (the first node for scripts without keys).
+    """
+
+    def __init__(self, adapter: "ShardedRedisAdapter", source: str):
+        self.adapter = adapter
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+        self._by_node: dict[str, ResilientScript] = {}
+
+    def for_node(self, node: str) -> ResilientScript:
+        script = self._by_node.get(node)
+        if script is None:
+            script = self._by_node[node] = self.adapter.nodes[node].register_script(self.source)
+        return script
+
+    def __call__(self, keys: Optional[list] = None, args: Optional[list] = None, client=None) -> Awaitable[Any]:
+        if isinstance(client, ShardedPipeline):
+            return client.queue_script(self, keys or [], args or [])
+        node = self.adapter.node_for(keys[0]) if keys else self.adapter.primary
+        return self.for_node(node)(keys=keys, args=args)
+
+class ShardedPipeline(AsyncCoreCommands):
+    """
+    Buffers commands like a redis-py pipeline (``pipe.get(key)``,
+    ``pipe.hset(...)``, scripts with ``client=pipe``) and on ``execute``
+    sends each node its share in one round trip, all nodes concurrently.
+    Replies come back in the order the commands were queued.
+    """
+
+    def __init__(self, adapter: "ShardedRedisAdapter", transaction: bool = False):
+        self.adapter = adapter
+        self.transaction = transaction
+        # (node, command args, command options, or (script, keys, args) for a script call)
+        self._queued: list[tuple[str, tuple, dict, Optional[tuple]]] = []
+
+    async def __aenter__(self) -> "ShardedPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._queued = []
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def __await__(self):
+        # Awaitable like a redis-py pipeline, which is what queueing a script call returns
+        return self._async_self().__await__()
+
+    async def _async_self(self) -> "ShardedPipeline":
+        return self
+
+    def execute_command(self, *args, **options) -> "ShardedPipeline":
+        self._queued.append((self.adapter.node_for_command(args), args, options, None))
+        return self
+
+    def queue_script(self, script: ShardedScript, keys: list, args: list) -> "ShardedPipeline":
+        node = self.adapter.node_for(keys[0]) if keys else self.adapter.primary
+        self._queued.append((node, (), {}, (script, keys, args)))
+        return self
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        queued, self._queued = self._queued, []
+        by_node: dict[str, list[int]] = {}
+        for index, (node, _, _, _) in enumerate(queued):
+            by_node.setdefault(node, []).append(index)
+
+        async def run(node: str, indices: list[int]) -> list:
+            async with self.adapter.nodes[node].pipeline(self.transaction) as pipe:
+                for index in indices:
+                    _, args, options, script_call = queued[index]
+                    if script_call is None:
+                        pipe.execute_command(*args, **options)
+                    else:
+                        script, keys, script_args = script_call
+                        await script.for_node(node)(keys=keys, args=script_args, client=pipe)
+                return await pipe.execute(raise_on_error)
+
+        if len(by_node) == 1:
+            (node, indices), = by_node.items()
+            return await run(node, indices)
+        replies: list = [None] * len(queued)
+        results = await asyncio.gather(*(run(node, indices) for node, indices in by_node.items()))
+        for indices, node_replies in zip(by_node.values(), results):
+            for index, reply in zip(indices, node_replies):
+                replies[index] = reply
+        return replies
+
+class ShardedRedisAdapter:
+    def __init__(self, nodes: dict[str, RedisAdapter], vnodes: int = 160):
+        """
+        Shard over ``nodes`` (name -> adapter, the first one also carrying
+        pub/sub) with ``vnodes`` ring points per node.
+        """
+        if not nodes:
+            raise ValueError("ShardedRedisAdapter needs at least one node")
+        self.nodes = dict(nodes)
+        self.primary = next(iter(self.nodes))
+        self.ring = HashRing(self.nodes, vnodes=vnodes)
+        # The adapters guard themselves, one circuit breaker per node
+        self.resilience = None
+
+    @classmethod
+    def from_urls(cls, urls: Iterable[str], vnodes: int = 160,
+                  resilience: Optional[Callable[[str], ResiliencePolicy]] = None, **options) -> "ShardedRedisAdapter":
+        """
+        One pooled RedisAdapter per URL, built with ``options``;
+        ``resilience(name)`` gives each node its own policy.
+        """
+        nodes = {}
+        for url in urls:
+            name = node_name(url)
+            nodes[name] = RedisAdapter(url, resilience=resilience(name) if resilience else None, **options)
+        return cls(nodes, vnodes=vnodes)
+
+    def node_for(self, key: str) -> str:
+        return self.ring.node_for(key)
+
+    def node_for_command(self, args: tuple) -> str:
+        command = str(args[0]).upper()
+        if command in SCRIPT_COMMANDS:
+            key = args[3] if len(args) > 3 and int(args[2]) > 0 else None
+        elif command == "PUBLISH" or len(args) < 2:
+            key = None
+        else:
+            key = args[1]
+        if key is None:
+            return self.primary
+        return self.ring.node_for(key if isinstance(key, str) else str(key))
+
+    def adapter_for(self, key: str) -> RedisAdapter:
+        return self.nodes[self.ring.node_for(key)]
+
+    def add_node(self, name: str, adapter: RedisAdapter) -> None:
+        """
+        Start routing about 1/N of the keys to ``adapter``.
+        """
+        self.nodes[name] = adapter
+        self.ring.add(name)
+        logger.info(f"Redis node {name} added, {len(self.nodes)} nodes")
+
+    async def remove_node(self, name: str) -> None:
+        """
+        Route ``name``'s keys to the remaining nodes and close its pool.
+        """
+        if name == self.primary:
+            raise ValueError(f"{name} carries pub/sub and cannot be removed")
+        self.ring.remove(name)
+        adapter = self.nodes.pop(name)
+        logger.info(f"Redis node {name} removed, {len(self.nodes)} nodes")
+        await adapter.close()
+
+    def _grouped(self, keys: Iterable[str]) -> dict[str, list[int]]:
+        by_node: dict[str, list[int]] = {}
+        for index, key in enumerate(keys):
+            by_node.setdefault(self.ring.node_for(key), []).append(index)
+        return by_node
+
+    async def get(self, key: str) -> str:
+        return await self.adapter_for(key).get(key)
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        return await self.adapter_for(key).get_bytes(key)
+
+    async def set(self, key: str, value: str, expire: int = None) -> None:
+        await self.adapter_for(key).set(key, value, expire=expire)
+
+    async def set_nx(self, key: str, value: str, expire_ms: int = None) -> bool:
+        return await self.adapter_for(key).set_nx(key, value, expire_ms=expire_ms)
+
+    async def mget(self, keys: list[str]) -> list[str]:
+        return await self._mget(keys, RedisAdapter.mget)
+
+    async def mget_bytes(self, keys: list[str]) -> list[Optional[bytes]]:
+        return await self._mget(keys, RedisAdapter.mget_bytes)
+
+    async def _mget(self, keys: list[str], read: Callable[[RedisAdapter, list[str]], Awaitable[list]]) -> list:
+        by_node = self._grouped(keys)
+        if len(by_node) == 1:
+            return await read(self.nodes[next(iter(by_node))], keys)
+        values: list = [None] * len(keys)
+        results = await asyncio.gather(*(read(self.nodes[node], [keys[index] for index in indices])
+                                         for node, indices in by_node.items()))
+        for indices, node_values in zip(by_node.values(), results):
+            for index, value in zip(indices, node_values):
+                values[index] = value
+        return values
+
+    async def mset(self, mapping: dict) -> None:
+        keys = list(mapping)
+        by_node = self._grouped(keys)
+        await asyncio.gather(*(self.nodes[node].mset({keys[index]: mapping[keys[index]] for index in indices})
+                               for node, indices in by_node.items()))
+
+    async def incr(self, key: str) -> int:
+        return await self.adapter_for(key).incr(key)
+
+    async def expire(self, key: str, time: int) -> None:
+        await self.adapter_for(key).expire(key, time)
+
+    async def delete(self, *keys: str) -> int:
+        by_node = self._grouped(keys)
+        counts = await asyncio.gather(*(self.nodes[node].delete(*(keys[index] for index in indices))
+                                        for node, indices in by_node.items()))
+        return sum(counts)
+
+    async def hgetall(self, key: str) -> dict:
+        return await self.adapter_for(key).hgetall(key)
+
+    async def hmset(self, key: str, mapping: dict) -> None:
+        await self.adapter_for(key).hmset(key, mapping)
+
+    def register_script(self, script: str) -> ShardedScript:
+        return ShardedScript(self, script)
+
+    async def publish(self, channel: str, message: str) -> int:
+        return await self.nodes[self.primary].publish(channel, message)
+
+    def pubsub(self) -> PubSub:
+        return self.nodes[self.primary].pubsub()
+
+    async def script_load(self, script: str) -> str:
+        """
+        Load ``script`` on every node; returns its SHA1.
+        """
+        shas = await asyncio.gather(*(node.script_load(script) for node in self.nodes.values()))
+        return shas[0]
+
+    def pipeline(self, transaction: bool = False) -> ShardedPipeline:
+        return ShardedPipeline(self, transaction)
+
+    async def transaction(self, func: Callable[[Pipeline], Awaitable[Any]], *watches: str) -> Any:
+        """
+        Optimistic transaction on the node of ``watches``, which must share one.
+        """
+        nodes = {self.ring.node_for(key) for key in watches} or {self.primary}
+        if len(nodes) > 1:
+            raise ValueError(f"Watched keys {watches} span several nodes; give them a common hash tag")
+        return await self.nodes[nodes.pop()].transaction(func, *watches)
+
+    async def ping(self) -> bool:
+        return all(await asyncio.gather(*(node.ping() for node in self.nodes.values())))
+
+    def pool_stats(self) -> dict:
+        totals = {"in_use": 0, "idle": 0, "max": 0}
+        for node in self.nodes.values():
+            for name, value in node.pool_stats().items():
+                totals[name] += value
+        return totals
+
+    async def close(self) -> None:
+        for node in self.nodes.values():
+            await node.close()
@@ -2,9 +2,14 @@
 Environment variables configuration for the FastAPI project.
 """
 
+from typing import Literal
+
 from pydantic import SecretStr, Field
 from pydantic_settings import BaseSettings
 
+from app.models.rate_limit import RateLimitRule
+from app.models.upstream import UpstreamPoolConfig
+
 # ____Environment Configuration____
 class APIEnvSettings(BaseSettings):
     """
@@ -17,7 +22,109 @@ class APIEnvSettings(BaseSettings):
     REDIS_HOST: str 
     REDIS_PORT: int
     LOG_FILE_PATH: str
+    # Logs are queued on the request path and written in batches by a background thread
+    LOG_LEVEL: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO"
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    LOG_QUEUE_SIZE: int = Field(10_000, gt=0, description="Records waiting to be written before new ones are dropped")
+    LOG_BATCH_SIZE: int = Field(256, gt=0, description="Records written with one write call at most")
+    LOG_FLUSH_INTERVAL: float = Field(0.05, gt=0, description="Seconds between writes of queued records")
+    LOG_MAX_BYTES: int = Field(100 * 1024 * 1024, ge=0, description="Size at which the log file rotates, 0 never")
+    LOG_BACKUP_COUNT: int = Field(5, ge=0, description="Rotated log files kept")
+    # JSON mapping of level -> share of records kept, e.g. {"INFO": 0.1}
+    LOG_SAMPLE_RATES: dict[Literal["DEBUG", "INFO", "WARNING"], float] = {}
+    # Per-route and per-stage latency histograms, served in the Prometheus text format at /metrics
+    METRICS_ENABLED: bool = True
     REDIS_URL: str
+    REDIS_MAX_CONNECTIONS: int = Field(50, gt=0, description="Upper bound of the shared Redis connection pool")
+    REDIS_SOCKET_TIMEOUT: float = Field(1.0, gt=0, description="Seconds to wait for a Redis reply")
+    REDIS_CONNECT_TIMEOUT: float = Field(1.0, gt=0, description="Seconds to wait for a new Redis connection")
+    REDIS_POOL_TIMEOUT: float = Field(1.0, gt=0, description="Seconds to wait for a free pooled connection")
+    # JSON list of Redis URLs to shard keys across by consistent hashing (REDIS_URL is then unused), e.g.
+    # ["redis://10.0.0.5:6379/0", "redis://10.0.0.6:6379/0"]; the first one also carries pub/sub
+    REDIS_NODES: list[str] = []
+    REDIS_VNODES: int = Field(160, gt=0, description="Points per node on the hash ring; more spreads keys more evenly")
+    # Redis circuit breaker: fail fast for REDIS_BREAKER_RECOVERY seconds after consecutive failures
+    REDIS_BREAKER_FAILURES: int = Field(5, gt=0, description="Consecutive Redis failures that open the circuit")
+    REDIS_BREAKER_RECOVERY: float = Field(5.0, gt=0, description="Seconds before a probe call is let through")
+    # Retries of idempotent Redis reads, as a fraction of calls plus a per-second floor
+    RETRY_BUDGET_RATIO: float = Field(0.1, ge=0, description="Retries allowed per Redis call")
+    RETRY_BUDGET_MIN_PER_SECOND: float = Field(5.0, ge=0, description="Retries always allowed per second")
+    # Idempotent Redis reads still unanswered after this long are sent again (0 disables hedging)
+    REDIS_HEDGE_DELAY_MS: float = Field(0, ge=0, description="Milliseconds before a hedged Redis read")
+    # Deadline of every request, shortened by a client's X-Request-Timeout-Ms header
+    REQUEST_TIMEOUT: float = Field(10.0, gt=0, description="Seconds a request may take end to end")
+    # Adaptive limit on requests in flight per worker; the excess gets an immediate 503 instead of queueing
+    CONCURRENCY_LIMIT_ENABLED: bool = True
+    CONCURRENCY_LIMIT_ALGORITHM: Literal["gradient", "aimd"] = "gradient"
+    CONCURRENCY_LIMIT_INITIAL: int = Field(20, gt=0, description="Requests in flight allowed before any latency is seen")
+    CONCURRENCY_LIMIT_MIN: int = Field(4, gt=0, description="Lowest the adaptive limit goes")
+    CONCURRENCY_LIMIT_MAX: int = Field(500, gt=0, description="Highest the adaptive limit goes")
+    CONCURRENCY_LIMIT_LATENCY_TARGET_MS: float = Field(100, gt=0, description="Mean latency above which aimd backs off")
+    # JSON mapping of path prefix -> priority (critical, high, normal, low); authenticated reads default to high,
+    # other requests to normal, and low ones are shed first
+    CONCURRENCY_PRIORITY_ROUTES: dict[str, Literal["critical", "high", "normal", "low"]] = {
+        "/redis_health_check": "critical", "/ready": "critical", "/metrics": "critical", "/token": "low",
+        "/products/export": "low"}
+    RATE_LIMIT_DEFAULT: RateLimitRule = RateLimitRule()
+    # JSON mapping of route -> client tier -> rule, e.g.
+    # {"/products/": {"default": {"limit": 3, "period": 60}, "premium": {"algorithm": "gcra", "limit": 100, "period": 60}}}
+    RATE_LIMIT_RULES: dict[str, dict[str, RateLimitRule]] = {}
+    # Hybrid local+Redis limiting: tokens leased per Redis call (0 disables it, 1 is exact)
+    RATE_LIMIT_LEASE_SIZE: int = Field(0, ge=0, description="Tokens leased from Redis per call, 0 to disable")
+    RATE_LIMIT_LEASE_TTL: float = Field(1.0, gt=0, description="Seconds before unused leased tokens are dropped")
+    # Micro-batching of exact checks into one pipelined Redis call (ignored with leases)
+    RATE_LIMIT_BATCHING: bool = False
+    RATE_LIMIT_BATCH_MAX_DELAY_MS: float = Field(1.0, ge=0, description="Longest a check waits for its batch")
+    RATE_LIMIT_BATCH_MAX_SIZE: int = Field(128, gt=0, description="Checks that flush a batch immediately")
+    # What rate limiting does while Redis is unavailable: allow, deny, or count per worker
+    RATE_LIMIT_FAILURE_MODE: Literal["open", "closed", "local"] = "open"
+    # In-process L1 response cache in front of Redis (0 bytes disables it); larger entries are not admitted
+    CACHE_L1_MAX_BYTES: int = Field(32 * 1024 * 1024, ge=0, description="Memory budget of the in-process cache")
+    CACHE_L1_TTL: float = Field(5.0, gt=0, description="Longest an L1 entry may be served, in seconds")
+    CACHE_L1_MAX_ENTRY_BYTES: int = Field(256 * 1024, gt=0, description="Largest value kept in the L1 cache")
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    # Stampede protection for get_or_compute
+    CACHE_STALE_TTL: int = Field(60, ge=0, description="Seconds an expired value may still be served while refreshing")
+    CACHE_XFETCH_BETA: float = Field(1.0, ge=0, description="Eagerness of probabilistic early expiration, 0 disables")
+    CACHE_LOCK_TIMEOUT: float = Field(5.0, gt=0, description="Seconds a recompute lock is held at most")
+    # Cached values are stored zlib-compressed from CACHE_COMPRESS_MIN_BYTES (0 disables compression), and cached
+    # responses still larger than CACHE_MAX_ENTRY_BYTES are not stored (0 admits any size)
+    CACHE_COMPRESS_MIN_BYTES: int = Field(1024, ge=0, description="Smallest cached value that is compressed")
+    CACHE_COMPRESS_LEVEL: int = Field(1, ge=1, le=9, description="zlib level of compressed cache values")
+    CACHE_MAX_ENTRY_BYTES: int = Field(256 * 1024, ge=0, description="Largest cached response stored in Redis")
+    # Last known values served by get_or_compute while Redis is unavailable (0 seconds disables it)
+    CACHE_STALE_IF_ERROR: float = Field(300, ge=0, description="Seconds a last known value may be served on errors")
+    CACHE_STALE_IF_ERROR_MAX_BYTES: int = Field(8 * 1024 * 1024, gt=0, description="Memory budget of last known values")
+    # Cache of verified access tokens (0 bytes disables it) and revocation broadcasts
+    AUTH_TOKEN_CACHE_MAX_BYTES: int = Field(4 * 1024 * 1024, ge=0, description="Memory budget of the token cache")
+    AUTH_TOKEN_CACHE_TTL: float = Field(60.0, gt=0, description="Longest a verified token is trusted without re-checking")
+    AUTH_REVOCATION_CHANNEL: str = "auth:revoked"
+    # Password hashing runs on a dedicated executor with bounded admission
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: int = Field(4, gt=0, description="Threads or processes hashing passwords")
+    PASSWORD_HASH_MAX_PENDING: int = Field(64, gt=0, description="Queued logins before new ones get a 503")
+    LOGIN_MAX_FAILURES: int = Field(5, gt=0, description="Failed logins before a username is locked out")
+    LOGIN_FAILURE_WINDOW: float = Field(300, gt=0, description="Seconds failed logins are counted and locked out for")
+    # HTTP response cache for routes marked with @cached
+    HTTP_CACHE_MAX_BODY_BYTES: int = Field(1024 * 1024, gt=0, description="Largest response body that is cached")
+    HTTP_CACHE_TENANT_HEADER: str = "X-Tenant-ID"
+    # Streaming catalog export: products read per MGET (about two batches are held at once), gzip level
+    EXPORT_BATCH_SIZE: int = Field(1000, gt=0, description="Products read and sent per chunk of an export")
+    EXPORT_GZIP_LEVEL: int = Field(6, ge=1, le=9, description="Compression level of gzipped exports")
+    # Keep a pre-serialized JSON copy of each product next to its compact record: pages need no encoding, at
+    # about three times the memory per product
+    PRODUCT_JSON_COPY: bool = True
+    # Products seeded at startup when missing, by one worker while the others wait (0 leaves seeding to app.seed)
+    SEED_ON_STARTUP: int = Field(0, ge=0, description="Products 0..N-1 seeded once at startup")
+    SEED_CHUNK_SIZE: int = Field(500, gt=0, description="Products written per round trip by the startup seed")
+    SEED_TIMEOUT: float = Field(30.0, gt=0, description="Seconds the startup seed waits for Redis per chunk")
+    # Product text search: "redis" shares one index, "memory" keeps a copy per worker
+    SEARCH_BACKEND: Literal["memory", "redis"] = "redis"
+    SEARCH_DEPTH: int = Field(1000, gt=0, description="Best postings per term scored for multi-term queries")
+    SEARCH_SYNC_INTERVAL: float = Field(5.0, gt=0, description="Seconds between memory index catch-ups")
+    # JSON mapping of path prefix -> upstream pool proxied by the gateway, e.g.
+    # {"/orders": {"servers": ["http://10.0.0.5:9000", "http://10.0.0.6:9000"], "strategy": "peak_ewma", "health_path": "/health"}}
+    UPSTREAMS: dict[str, UpstreamPoolConfig] = {}
     
     class Config:
         env_file = '.env'
@@ -6,6 +6,8 @@ from abc import ABC, abstractmethod
 
 from fastapi import Request, Response
 
+from app.models.rate_limit import RateLimitResult
+
 
 class AbstractGateway(ABC):
     @abstractmethod
@@ -17,7 +19,7 @@ class AbstractGateway(ABC):
         pass
 
     @abstractmethod
-    async def rate_limit(self, request: Request) -> bool:
+    async def rate_limit(self, client_id: str, route: str = "*", tier: str = "default") -> RateLimitResult:
         pass
 
     @abstractmethod
@@ -2,21 +2,106 @@
 Factory for creating API gateway instances with injected dependencies.
 """
 
+from app.config.settings import env_settings
 from app.core.request_handler import RequestHandler
 from app.services.auth_service import AuthService
-from app.services.rate_limit_service import RedisRateLimiter
-from app.services.cache_service import RedisCacheService
+from app.services.rate_limit_service import RateLimitPolicy, RedisRateLimiter
+from app.services.hybrid_rate_limit_service import HybridRateLimiter
+from app.services.batching_rate_limit_service import BatchingRateLimiter
+from app.services.fallback_rate_limit_service import FallbackRateLimiter
+from app.services.cache_service import RedisCacheService, TieredCacheService
 from app.adapters.redis_adapter import RedisAdapter
+from app.adapters.sharded_redis_adapter import ShardedRedisAdapter
 from app.services.product_service import ProductService
+from app.services.proxy_service import ProxyService
+from app.services.search_service import InMemorySearchIndex, RedisSearchIndex
+from app.services.login_limiter import FailedLoginLimiter
+from app.services.token_denylist import TokenDenylist
+from app.utils.hashing import PasswordHasher
+from app.utils.lru_cache import LRUCache
+from app.utils.resilience import CircuitBreaker, ResiliencePolicy, RetryBudget
 
 
 class GatewayFactory:
     @staticmethod
-    def create_gateway(user_db, redis_url):
-        redis_adapter = RedisAdapter(redis_url)
-        auth_service = AuthService(user_db)
-        rate_limit_service = RedisRateLimiter(redis_adapter)
-        cache_service = RedisCacheService(redis_adapter)
-        product_service = ProductService(redis_adapter)
-        
-        return RequestHandler(auth_service, rate_limit_service, cache_service, product_service)
+    def create_gateway(user_db, redis_url) -> RequestHandler:
+        """
+        Build the gateway object graph. Meant to be called once per process
+        (from the application lifespan); every service shares one Redis pool
+        (one per node when ``REDIS_NODES`` shards the keys).
+        """
+        def redis_resilience(name: str) -> ResiliencePolicy:
+            return ResiliencePolicy(
+                CircuitBreaker(name, failure_threshold=env_settings.REDIS_BREAKER_FAILURES,
+                               recovery_time=env_settings.REDIS_BREAKER_RECOVERY),
+                RetryBudget(env_settings.RETRY_BUDGET_RATIO, min_per_second=env_settings.RETRY_BUDGET_MIN_PER_SECOND),
+                hedge_delay=env_settings.REDIS_HEDGE_DELAY_MS / 1000 or None,
+            )
+
+        pool_options = dict(
+            max_connections=env_settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=env_settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=env_settings.REDIS_CONNECT_TIMEOUT,
+            pool_timeout=env_settings.REDIS_POOL_TIMEOUT,
+        )
+        if env_settings.REDIS_NODES:
+            redis_adapter = ShardedRedisAdapter.from_urls(env_settings.REDIS_NODES, vnodes=env_settings.REDIS_VNODES,
+                                                          resilience=lambda node: redis_resilience(f"redis {node}"),
+                                                          **pool_options)
+        else:
+            redis_adapter = RedisAdapter(redis_url, resilience=redis_resilience("redis"), **pool_options)
+        token_cache = None
+        if env_settings.AUTH_TOKEN_CACHE_MAX_BYTES:
+            token_cache = LRUCache(env_settings.AUTH_TOKEN_CACHE_MAX_BYTES, env_settings.AUTH_TOKEN_CACHE_TTL)
+        auth_service = AuthService(
+            user_db,
+            token_cache=token_cache,
+            denylist=TokenDenylist(redis_adapter, channel=env_settings.AUTH_REVOCATION_CHANNEL),
+            hasher=PasswordHasher(env_settings.PASSWORD_HASH_EXECUTOR,
+                                  max_workers=env_settings.PASSWORD_HASH_WORKERS,
+                                  max_pending=env_settings.PASSWORD_HASH_MAX_PENDING),
+            login_limiter=FailedLoginLimiter(redis_adapter,
+                                             max_failures=env_settings.LOGIN_MAX_FAILURES,
+                                             window=env_settings.LOGIN_FAILURE_WINDOW),
+        )
+        if env_settings.RATE_LIMIT_LEASE_SIZE:
+            rate_limit_service = HybridRateLimiter(redis_adapter, env_settings.RATE_LIMIT_DEFAULT,
+                                                   lease_size=env_settings.RATE_LIMIT_LEASE_SIZE,
+                                                   lease_ttl=env_settings.RATE_LIMIT_LEASE_TTL)
+        else:
+            rate_limit_service = RedisRateLimiter(redis_adapter, env_settings.RATE_LIMIT_DEFAULT)
+            if env_settings.RATE_LIMIT_BATCHING:
+                rate_limit_service = BatchingRateLimiter(rate_limit_service,
+                                                         max_delay=env_settings.RATE_LIMIT_BATCH_MAX_DELAY_MS / 1000,
+                                                         max_batch_size=env_settings.RATE_LIMIT_BATCH_MAX_SIZE)
+        rate_limit_service = FallbackRateLimiter(rate_limit_service, env_settings.RATE_LIMIT_FAILURE_MODE,
+                                                 default_rule=env_settings.RATE_LIMIT_DEFAULT)
+        rate_limit_policy = RateLimitPolicy(env_settings.RATE_LIMIT_DEFAULT, env_settings.RATE_LIMIT_RULES)
+        cache_service = RedisCacheService(redis_adapter,
+                                          stale_ttl=env_settings.CACHE_STALE_TTL,
+                                          beta=env_settings.CACHE_XFETCH_BETA,
+                                          lock_timeout=env_settings.CACHE_LOCK_TIMEOUT,
+                                          compress_min_bytes=env_settings.CACHE_COMPRESS_MIN_BYTES,
+                                          compress_level=env_settings.CACHE_COMPRESS_LEVEL,
+                                          max_entry_bytes=env_settings.CACHE_MAX_ENTRY_BYTES,
+                                          last_known=LRUCache(env_settings.CACHE_STALE_IF_ERROR_MAX_BYTES,
+                                                              env_settings.CACHE_STALE_IF_ERROR)
+                                          if env_settings.CACHE_STALE_IF_ERROR else None)
+        if env_settings.CACHE_L1_MAX_BYTES:
+            cache_service = TieredCacheService(redis_adapter,
+                                               LRUCache(env_settings.CACHE_L1_MAX_BYTES, env_settings.CACHE_L1_TTL,
+                                                        max_entry_bytes=env_settings.CACHE_L1_MAX_ENTRY_BYTES),
+                                               channel=env_settings.CACHE_INVALIDATION_CHANNEL,
+                                               l2=cache_service)
+        if env_settings.SEARCH_BACKEND == "memory":
+            search_index = InMemorySearchIndex(redis_adapter, depth=env_settings.SEARCH_DEPTH,
+                                               sync_interval=env_settings.SEARCH_SYNC_INTERVAL)
+        else:
+            search_index = RedisSearchIndex(redis_adapter, depth=env_settings.SEARCH_DEPTH)
+        product_service = ProductService(redis_adapter, search_index=search_index,
+                                         json_copy=env_settings.PRODUCT_JSON_COPY)
+        proxy_service = ProxyService(env_settings.UPSTREAMS) if env_settings.UPSTREAMS else None
+
+        return RequestHandler(auth_service, rate_limit_service, cache_service, product_service,
+                              rate_limit_policy=rate_limit_policy, redis_adapter=redis_adapter,
+                              proxy_service=proxy_service)
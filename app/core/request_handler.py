@@ -2,32 +2,94 @@
 Concrete implementation of the AbstractGateway for handling API requests.
 """
 
+import time
+
 from fastapi import Request, Response
 
+from app.adapters.redis_adapter import RedisAdapter
 from app.core.abstract_gateway import AbstractGateway
+from app.models.rate_limit import RateLimitResult
 from app.services.auth_service import AuthService
 from app.services.product_service import ProductService
-from app.services.rate_limit_service import RateLimiter
+from app.services.proxy_service import ProxyService
+from app.services.rate_limit_service import RateLimiter, RateLimitPolicy
 from app.services.cache_service import CacheService
+from app.utils.http_cache import CachedResponse, build_cache_key, digest
+from app.utils.logger import handler as log_handler
+from app.utils.metrics import STAGE_SECONDS, Collected, metrics, stats_family
+
+
+RATE_LIMIT_SECONDS = STAGE_SECONDS.labels("rate_limit")
+CACHE_SECONDS = STAGE_SECONDS.labels("cache")
+RATE_LIMIT_DECISIONS = metrics.counter("gateway_rate_limit_decisions_total", "Rate limit checks by route and outcome",
+                                       ("route", "decision"))
+# Page size bounds of the products catch-all, the same as the limit parameter of /products/
+MAX_PAGE_SIZE = 1000
 
 class RequestHandler(AbstractGateway):
     def __init__(self, auth_service: AuthService, rate_limit_service: RateLimiter, 
-                    cache_service: CacheService, product_service: ProductService):
+                    cache_service: CacheService, product_service: ProductService,
+                    rate_limit_policy: RateLimitPolicy = None, redis_adapter: RedisAdapter = None,
+                    proxy_service: ProxyService = None):
         self.auth_service = auth_service
         self.rate_limit_service = rate_limit_service
+        self.rate_limit_policy = rate_limit_policy
         self.cache_service = cache_service
         self.product_service = product_service
+        self.redis_adapter = redis_adapter
+        self.proxy_service = proxy_service
+
+    async def start(self) -> None:
+        """
+        Start background tasks of the services. Called once at application startup.
+        """
+        metrics.register_collector("gateway", self.metric_families)
+        await self.auth_service.start()
+        await self.cache_service.start()
+        await self.product_service.start()
+        if self.proxy_service is not None:
+            await self.proxy_service.start()
+
+    async def warm_up(self) -> None:
+        """
+        Get this worker ready for traffic after ``start``: connect to Redis
+        and build what the first requests would otherwise wait for.
+        """
+        if self.redis_adapter is not None:
+            await self.redis_adapter.ping()
+        await self.product_service.warm_up()
+
+    async def close(self) -> None:
+        """
+        Stop background tasks and release the shared Redis connection pool.
+        Called once at application shutdown.
+        """
+        metrics.unregister_collector("gateway")
+        await self.auth_service.close()
+        await self.cache_service.close()
+        await self.product_service.close()
+        if self.proxy_service is not None:
+            await self.proxy_service.close()
+        if self.redis_adapter is not None:
+            await self.redis_adapter.close()
 
     async def handle_request(self, request: Request) -> Response:
+        pool = self.proxy_service.match(request.url.path) if self.proxy_service is not None else None
+        if pool is None and not request.url.path.startswith("/products"):
+            return Response(content="Not Found", status_code=404)
         if not await self.authenticate(request):
             return Response(content="Unauthorized", status_code=401)
-        if not await self.rate_limit(request):
-            return Response(content="Rate limit exceeded", status_code=429)
+        # Proxied routes share the rule (and the resolved-rule cache entry) of their prefix, and every path of the
+        # products catch-all that of "/products": raw paths would grow that cache and the metric's labels unbounded
+        route = (pool.prefix or "/") if pool is not None else "/products"
+        limit = await self.rate_limit(request.client.host, route=route)
+        if not limit.allowed:
+            return Response(content="Rate limit exceeded", status_code=429, headers=limit.headers())
 
-        # Process the request and generate response
+        # Process the request and generate response (cacheable routes are
+        # cached inside process_request with stampede protection)
         response = await self.process_request(request)
-
-        await self.cache_response(request, response)
+        response.headers.update(limit.headers())
         return response
 
     async def authenticate(self, request: Request) -> bool:
@@ -40,24 +102,146 @@ class RequestHandler(AbstractGateway):
         except Exception:
             return False
 
-    async def rate_limit(self, client_id: str) -> bool:
+    async def rate_limit(self, client_id: str, route: str = "*", tier: str = "default") -> RateLimitResult:
         """
-        Checks the rate limit for a given client_id (username).
-        Returns True if the request is within the allowed limit, False otherwise.
+        Checks the rate limit for a given client_id (username) under the rule
+        configured for ``route`` and the client's ``tier``.
+        The result tells whether the request is allowed plus its remaining quota.
         """
-        return await self.rate_limit_service.check_rate_limit(client_id)
+        rule = self.rate_limit_policy.resolve(route, tier) if self.rate_limit_policy else None
+        with RATE_LIMIT_SECONDS.time():
+            result = await self.rate_limit_service.check_rate_limit(client_id, rule)
+        RATE_LIMIT_DECISIONS.labels(route, "allowed" if result.allowed else "denied").inc()
+        return result
 
-    async def cache_response(self, request: Request, response: Response) -> None:
-        await self.cache_service.cache_response(request.url.path, response.body)
+    def cache_key(self, request: Request) -> str:
+        """
+        Cache key of the request: method, path, normalized query string and
+        the caller's credentials (so one user's response is never served to another).
+        """
+        vary = {"user": digest(request.headers.get("Authorization", ""))}
+        return build_cache_key(request.method, request.url.path, request.url.query, vary)
+
+    async def cache_response(self, request: Request, response: Response, ttl: int = 300) -> None:
+        """
+        Store ``response`` in the format ResponseCacheMiddleware serves.
+        """
+        entry = CachedResponse.from_parts(response.status_code, response.raw_headers, response.body)
+        await self.cache_service.cache_response(self.cache_key(request), entry.encode(), expire_time=ttl)
 
     async def process_request(self, request: Request) -> Response:
-        cached_response = await self.cache_service.get_cached_response(request.url.path)
-        if cached_response:
-            return Response(content=cached_response, media_type="application/json")
+        # Configured upstream pools take precedence over the built-in routes
+        pool = self.proxy_service.match(request.url.path) if self.proxy_service is not None else None
+        if pool is not None:
+            return await self.proxy_service.forward(request, pool)
 
         # Route based on the request path and method
         if request.method == "GET" and request.url.path.startswith("/products"):
-            products = await self.product_service.get_products()
-            return Response(content=products.json(), media_type="application/json")
+            try:
+                limit = int(request.query_params.get("limit", 10))
+                if not 1 <= limit <= MAX_PAGE_SIZE:
+                    raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+                cursor = request.query_params.get("cursor")
+
+                async def load_products() -> str:
+                    return (await self.product_service.get_products_json(limit=limit, cursor=cursor)).decode()
+
+                # The product list is the same for every user, so the key has no Vary dimension
+                key = build_cache_key(request.method, request.url.path, request.url.query, namespace="data")
+                with CACHE_SECONDS.time():
+                    content = await self.cache_service.get_or_compute(key, load_products)
+            except ValueError:
+                return Response(content="Invalid limit or cursor", status_code=400)
+            return Response(content=content, media_type="application/json")
+
+        return Response(content="Not Found", status_code=404)
+
+    def metric_families(self) -> list[Collected]:
+        """
+        Counters and gauges the services already keep, read when ``/metrics``
+        is scraped so the request path pays nothing for them.
+        """
+        families = [Collected("gateway_log_records_dropped_total", "counter",
+                              "Log records dropped because the log queue was full", [({}, log_handler.dropped)])]
+        if self.redis_adapter is not None:
+            # A sharded adapter has one pool and circuit breaker per node
+            nodes = getattr(self.redis_adapter, "nodes", None) or {"default": self.redis_adapter}
+            pool_samples, circuit_samples, event_samples, retry_samples = [], [], [], []
+            for node, adapter in nodes.items():
+                pool_samples.extend(({"node": node, "state": state}, value)
+                                    for state, value in adapter.pool_stats().items())
+                resilience = adapter.resilience
+                if resilience is None:
+                    continue
+                breaker = resilience.breaker
+                circuit_samples.append(({"node": node}, int(breaker.state != breaker.CLOSED)))
+                event_samples.extend(({"node": node, "event": event}, value) for event, value in breaker.stats.items())
+                retry_samples.extend(({"node": node, "kind": kind}, value) for kind, value in resilience.stats.items())
+            families.append(Collected("redis_pool_connections", "gauge", "Redis pool connections by state",
+                                      pool_samples))
+            families.append(Collected("redis_circuit_open", "gauge", "1 while a Redis circuit is not closed",
+                                      circuit_samples))
+            families.append(Collected("redis_circuit_events_total", "counter",
+                                      "Redis circuit openings and rejected calls", event_samples))
+            families.append(Collected("redis_retries_total", "counter", "Retried and hedged Redis calls",
+                                      retry_samples))
+
+        # Data cache: L1/L2 hit counts of the tiered cache and the stampede protection of the Redis tier
+        tiered = getattr(self.cache_service, "l1", None) is not None
+        if tiered:
+            stats = self.cache_service.stats
+            lookups = sum(stats.values())
+            families.append(stats_family("gateway_cache_lookups_total", "Data cache lookups by the tier that answered",
+                                         "counter", stats, "result"))
+            families.append(Collected("gateway_cache_hit_ratio", "gauge", "Share of data cache lookups each tier answered",
+                                      [({"tier": "l1"}, stats["l1_hits"] / lookups if lookups else 0),
+                                       ({"tier": "l2"}, stats["l2_hits"] / lookups if lookups else 0)]))
+            families.append(Collected("gateway_cache_l1_bytes", "gauge", "Memory held by the L1 data cache",
+                                      [({}, self.cache_service.l1.bytes)]))
+            families.append(Collected("gateway_cache_l1_rejected_total", "counter",
+                                      "Values too large to be admitted to the L1 data cache",
+                                      [({}, self.cache_service.l1.rejections)]))
+        redis_cache = self.cache_service.l2 if tiered else self.cache_service
+        if hasattr(redis_cache, "stampede_stats"):
+            families.append(stats_family("gateway_cache_stampede_total", "get_or_compute outcomes in the Redis tier",
+                                         "counter", redis_cache.stampede_stats, "event"))
+        if hasattr(redis_cache, "write_stats"):
+            # Average stored entry: stored bytes over plain + compressed writes
+            families.append(stats_family("gateway_cache_writes_total", "Redis cache writes by how they were stored",
+                                         "counter", redis_cache.write_stats, "result"))
+            families.append(stats_family("gateway_cache_write_bytes_total",
+                                         "Bytes of Redis cache writes before (raw) and after (stored) compression",
+                                         "counter", redis_cache.write_bytes, "size"))
+
+        token_cache = self.auth_service.token_cache
+        if token_cache is not None:
+            families.append(Collected("gateway_token_cache_lookups_total", "counter", "Verified token cache lookups",
+                                      [({"result": "hit"}, token_cache.hits), ({"result": "miss"}, token_cache.misses)]))
+        if self.auth_service.hasher is not None:
+            families.append(stats_family("gateway_password_hashes_total", "Password checks by outcome", "counter",
+                                         self.auth_service.hasher.stats, "result"))
+
+        # Each wrapper of the rate limiter (fallback, batching, ...) keeps its own stats
+        limiter_samples, batch_samples = [], []
+        limiter = self.rate_limit_service
+        while limiter is not None:
+            for event, value in getattr(limiter, "stats", {}).items():
+                limiter_samples.append(({"limiter": type(limiter).__name__, "event": event}, value))
+            # Power-of-two buckets: size="8" counts batches of 5 to 8 checks
+            for size, value in sorted(getattr(limiter, "batch_size_buckets", {}).items()):
+                batch_samples.append(({"size": str(size)}, value))
+            limiter = getattr(limiter, "limiter", None)
+        families.append(Collected("gateway_rate_limiter_events_total", "counter", "Rate limiter internals",
+                                  limiter_samples))
+        families.append(Collected("gateway_rate_limit_batches_total", "counter",
+                                  "Rate limit batches by their number of checks, up to the size label", batch_samples))
 
-        return Response(content="Not Found", status_code=404)
\ No newline at end of file
+        if self.proxy_service is not None:
+            now = time.monotonic()
+            servers = [({"pool": pool.prefix or "/", "server": server.url}, server)
+                       for pool in self.proxy_service.pools for server in pool.servers]
+            families.append(Collected("gateway_upstream_outstanding", "gauge", "Requests in flight per upstream server",
+                                      [(labels, server.outstanding) for labels, server in servers]))
+            families.append(Collected("gateway_upstream_available", "gauge", "1 while an upstream server takes traffic",
+                                      [(labels, int(server.available(now))) for labels, server in servers]))
+        return families
@@ -0,0 +1,78 @@
+"""
+Deterministic fake product generation for seeding.
+"""
+
+import random
+import uuid
+from datetime import date
+
+from faker import Faker
+
+from app.models.product import Product
+from app.utils.product_codec import encode_product
+
+
+CATEGORIES = ["Smartphone", "Laptop", "Tablet", "Smartwatch", "Camera", "Speaker", "Headphones", "Monitor", "Printer"]
+COLORS = ["Black", "White", "Silver", "Gold", "Blue", "Red"]
+MATERIALS = ["Plastic", "Metal", "Glass", "Aluminum", "Carbon Fiber"]
+FIRST_RELEASE = date(2020, 1, 1).toordinal()
+LAST_RELEASE = date(2025, 12, 31).toordinal()
+
+class ProductGenerator:
+    """
+    Builds fake products: a Product's fields with random, plausible values.
+
+    Calling Faker per field costs about a millisecond per product, so Faker
+    only fills small pools of names, words and sentences once (seeded, hence
+    identical in every process); each product then draws from the pools with
+    its own ``random.Random`` seeded by ``seed`` and its id. A product thus
+    depends only on the seed and its id, never on chunking or process count.
+    """
+
+    def __init__(self, seed: int = 0, pool_size: int = 2000):
+        self.seed = seed
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.companies = [fake.company() for _ in range(pool_size)]
+        self.words = [fake.word() for _ in range(pool_size)]
+        self.descriptions = [fake.sentence(nb_words=10) for _ in range(pool_size)]
+        self.sentences = [fake.sentence() for _ in range(pool_size)]
+
+    def product(self, pid: int) -> dict:
+        rng = random.Random(f"{self.seed}:{pid}")
+        return {
+            "name": f"{rng.choice(self.companies)} {rng.choice(self.words)}",
+            "brand": rng.choice(self.companies),
+            "category": rng.choice(CATEGORIES),
+            "price": round(rng.randint(0, 999) + rng.randint(0, 99) / 100, 2),
+            "stock": rng.randint(0, 500),
+            "sku": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "release_date": str(date.fromordinal(rng.randint(FIRST_RELEASE, LAST_RELEASE))),
+            "description": rng.choice(self.descriptions),
+            "features": ", ".join(rng.sample(self.sentences, 3)),
+            "warranty": f"{rng.randint(1, 3)} years",
+            "rating": round(rng.randint(0, 9) / 2 + 2.5, 1),
+            "dimensions": f"{rng.randint(5, 50)}x{rng.randint(5, 50)}x{rng.randint(1, 10)} cm",
+            "weight": f"{rng.randint(100, 5000)} grams",
+            "color": rng.choice(COLORS),
+            "material": rng.choice(MATERIALS),
+        }
+
+# One generator per seed and process; building the pools is the slow part
+_generators: dict[int, ProductGenerator] = {}
+
+def generate_product_rows(seed: int, start: int, count: int) -> list[tuple[int, dict, str, bytes]]:
+    """
+    Generate, validate and serialize products ``start .. start + count - 1``
+    as ``(id, fields, JSON, record)`` rows. Module-level so it can run in a
+    process pool.
+    """
+    generator = _generators.get(seed)
+    if generator is None:
+        generator = _generators[seed] = ProductGenerator(seed)
+    rows = []
+    for pid in range(start, start + count):
+        product = Product.model_validate({**generator.product(pid), "id": pid})
+        fields = product.model_dump(mode="json")
+        rows.append((pid, fields, product.model_dump_json(), encode_product(fields)))
+    return rows
@@ -2,35 +2,113 @@
 Main entry point for the FastAPI application.
 """
 
-from contextlib import asynccontextmanager
+import os
+import sys
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 
 from app.config.settings import env_settings
-from app.services.product_service import ProductService
-from app.adapters.redis_adapter import RedisAdapter
+from app.core.gateway_factory import GatewayFactory
+from app.db.fake_db import fake_users_db
+from app.middleware.load_shedding import LoadSheddingMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.request_id import RequestIdMiddleware
+from app.middleware.resilience import ResilienceMiddleware
+from app.middleware.response_cache import ResponseCacheMiddleware
 from app.routes import api_router
+from app.seed import seed_adapter, seed_service
+from app.services.product_service import ProductService
+from app.utils.distributed_lock import run_once
+from app.utils.logger import logger
+
+
+async def seed_on_startup(count: int) -> None:
+    """
+    Seed products 0..count-1 in whichever worker takes the lock first.
+    """
+    # Not the gateway's adapter: its short timeouts and circuit breaker are meant for requests, not bulk writes
+    redis_adapter = seed_adapter(None, env_settings.SEED_TIMEOUT)
+    try:
+        product_service = seed_service(redis_adapter)
+
+        async def seeded() -> bool:
+            # Chunks are written in id order, so the last product arrives last. Its record, not its JSON copy,
+            # which is not written with PRODUCT_JSON_COPY=false
+            return await redis_adapter.get_bytes(ProductService.record_key(count - 1)) is not None
+
+        await run_once(redis_adapter, "startup:seed",
+                       lambda: product_service.seed_products(count, chunk_size=env_settings.SEED_CHUNK_SIZE), seeded)
+    finally:
+        await redis_adapter.close()
+
+
+async def warm_up(app: FastAPI) -> None:
+    """
+    Run the one-time initialization (in whichever worker gets there first)
+    and this worker's own warm-up, retrying while Redis is unavailable, then
+    mark the worker ready.
+    """
+    gateway = app.state.gateway
+    while True:
+        try:
+            if env_settings.SEED_ON_STARTUP:
+                await seed_on_startup(env_settings.SEED_ON_STARTUP)
+            await gateway.warm_up()
+            break
+        except Exception as e:
+            logger.error(f"Warm-up failed, retrying: {e!r}")
+            await asyncio.sleep(1)
+    app.state.ready.set()
+    # Run by the prefork launcher (app.server), which waits for every worker
+    ready_fd = getattr(app.state, "ready_fd", None)
+    if ready_fd is not None:
+        os.write(ready_fd, f"{os.getpid()}\n".encode())
+    logger.info("Worker ready")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Initialize Redis adapter and product service
-    redis_adapter = RedisAdapter(env_settings.REDIS_URL)
-    product_service = ProductService(redis_adapter)
-
-    # Check if the seed data exists in Redis
-    existing_data = redis_adapter.hgetall("product:1")
-    if not existing_data:
-        # Seed fake products into Redis if they don't already exist
-        await product_service.seed_fake_products(num_products=1000)
+    # Build the process-wide gateway (one Redis pool, one set of services)
+    gateway = GatewayFactory.create_gateway(user_db=fake_users_db, redis_url=env_settings.REDIS_URL)
+    app.state.gateway = gateway
+    app.state.ready = asyncio.Event()
+    await gateway.start()
 
+    # Connections are accepted right away; /ready answers 503 until the warm-up is done
+    warm_up_task = asyncio.create_task(warm_up(app))
     yield  # Yield control to the app for its runtime
 
+    warm_up_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await warm_up_task
+    await gateway.close()
+
 
 # Initialize FastAPI app with lifespan event handler
 app = FastAPI(lifespan=lifespan)
 
+app.add_middleware(ResponseCacheMiddleware, max_body_bytes=env_settings.HTTP_CACHE_MAX_BODY_BYTES)
+# Cache lookups also run under the request deadline
+app.add_middleware(ResilienceMiddleware, default_timeout=env_settings.REQUEST_TIMEOUT)
+# Sheds excess load before it takes a deadline, a cache lookup or a Redis connection
+if env_settings.CONCURRENCY_LIMIT_ENABLED:
+    app.add_middleware(LoadSheddingMiddleware, algorithm=env_settings.CONCURRENCY_LIMIT_ALGORITHM,
+                       initial=env_settings.CONCURRENCY_LIMIT_INITIAL, min_limit=env_settings.CONCURRENCY_LIMIT_MIN,
+                       max_limit=env_settings.CONCURRENCY_LIMIT_MAX,
+                       latency_target=env_settings.CONCURRENCY_LIMIT_LATENCY_TARGET_MS / 1000,
+                       routes=env_settings.CONCURRENCY_PRIORITY_ROUTES)
+# Times the whole request, including 503/504s and cache hits answered by the middlewares above
+if env_settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+# Outermost of all, so every log line of a request carries its id
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(api_router)
 
 
+if __name__ == "__main__" and sys.argv[1:2] == ["seed"]:
+    from app.seed import main
 
+    main(sys.argv[2:])
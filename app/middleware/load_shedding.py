@@ -0,0 +1,123 @@
+"""
+ASGI middleware that bounds the requests a worker handles at once and
+refuses the excess immediately, lowest priority first.
+"""
+
+import time
+from typing import Literal, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.concurrency_limit import ConcurrencyLimiter
+from app.utils.metrics import Collected, metrics, stats_family
+
+
+Priority = Literal["critical", "high", "normal", "low"]
+
+# Share of the adaptive limit each priority may fill; critical requests are never refused
+PRIORITY_SHARES = {"high": 1.0, "normal": 0.8, "low": 0.5}
+
+REQUESTS_SHED = metrics.counter("gateway_requests_shed_total", "Requests refused with 503 by the concurrency limit",
+                                ("priority",))
+
+class LoadSheddingMiddleware:
+    """
+    Keep at most an adaptive number of HTTP requests in flight (see
+    ``ConcurrencyLimiter``) and answer the rest with an immediate 503 and
+    ``Retry-After`` rather than letting them queue and slow everyone down.
+
+    A request's priority is that of the longest matching prefix in
+    ``routes``; otherwise reads (GET/HEAD) with a bearer token this worker
+    has already verified (see ``AuthService.is_verified``) are high,
+    everything else normal. Checking the token cache instead of the token
+    keeps shedding cheap and stops made-up credentials from jumping the
+    queue, at the cost of a client's first read with a new token (and every
+    read without the token cache) being normal. With the default shares a
+    low priority request is refused once half the limit is in use, a normal
+    one at 80% and a high one at the limit, so logins are shed well before
+    authenticated product reads and health checks never are.
+    """
+
+    def __init__(self, app: ASGIApp, algorithm: Literal["gradient", "aimd"] = "gradient", initial: int = 20,
+                 min_limit: int = 4, max_limit: int = 500, latency_target: float = 0.1,
+                 routes: Optional[dict[str, Priority]] = None, retry_after: int = 1):
+        self.app = app
+        options = {"latency_target": latency_target} if algorithm == "aimd" else {}
+        limit = ConcurrencyLimiter.ALGORITHMS[algorithm](initial, min_limit, max_limit, **options)
+        self.limiter = ConcurrencyLimiter(limit, PRIORITY_SHARES)
+        self.routes = sorted((routes or {}).items(), key=lambda route: len(route[0]), reverse=True)
+        self.retry_after = str(retry_after).encode()
+        self._shed = {priority: REQUESTS_SHED.labels(priority) for priority in PRIORITY_SHARES}
+        metrics.register_collector("load_shedding", self.metric_families)
+
+    def priority(self, scope: Scope) -> Priority:
+        path = scope["path"]
+        for prefix, priority in self.routes:
+            if path.startswith(prefix):
+                return priority
+        if scope["method"] in ("GET", "HEAD"):
+            scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+            if scheme.lower() == "bearer" and token and self._verified(scope, token):
+                return "high"
+        return "normal"
+
+    @staticmethod
+    def _verified(scope: Scope, token: str) -> bool:
+        # Built in the lifespan, after the middleware; absent while the app starts
+        gateway = getattr(scope["app"].state, "gateway", None)
+        return gateway is not None and gateway.auth_service.is_verified(token)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = self.priority(scope)
+        if priority == "critical":
+            await self.app(scope, receive, send)
+            return
+
+        if not self.limiter.try_acquire(priority):
+            self._shed[priority].inc()
+            await self._respond(send)
+            return
+
+        status = None
+        started = time.perf_counter()
+        latency = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, latency
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                latency = time.perf_counter() - started
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The limit adapts to the time until the response starts, so a long stream does not
+            # read as congestion (it still holds its slot until done). Requests that failed or ran
+            # out of time count as drops, whatever their latency.
+            self.limiter.release(latency if latency is not None else time.perf_counter() - started,
+                                 dropped=status is None or status == 504)
+
+    async def _respond(self, send: Send) -> None:
+        body = b"Server overloaded"
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                        (b"content-length", str(len(body)).encode()), (b"retry-after", self.retry_after)],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def metric_families(self) -> list[Collected]:
+        return [
+            Collected("gateway_concurrency_limit", "gauge", "Current adaptive concurrency limit",
+                      [({}, self.limiter.limit.limit)]),
+            Collected("gateway_concurrency_inflight", "gauge", "Requests holding a concurrency slot",
+                      [({}, self.limiter.inflight)]),
+            stats_family("gateway_concurrency_decisions_total", "Admission decisions of the concurrency limit",
+                         "counter", self.limiter.stats, "decision"),
+        ]
@@ -0,0 +1,50 @@
+"""
+ASGI middleware that records the latency and status of every HTTP request.
+"""
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.metrics import metrics
+
+
+HTTP_REQUEST_SECONDS = metrics.histogram("http_request_seconds", "Time to handle an HTTP request, until its last "
+                                         "response byte", ("method", "route"))
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP requests by response status", ("method", "route", "status"))
+
+# Route label of requests no route matched, so unknown paths cannot grow the label set
+UNMATCHED_ROUTE = "unmatched"
+
+class MetricsMiddleware:
+    """
+    Time each HTTP request and count it by method, route template (e.g.
+    ``/products/``, never the raw path) and status. The route is read from
+    the scope after the router matched it, so this has to wrap the app.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route = route.path if route is not None else UNMATCHED_ROUTE
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, status).inc()
@@ -0,0 +1,47 @@
+"""
+ASGI middleware that tags every request, and every log record it produces, with an id.
+"""
+
+import uuid
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.logger import request_id
+
+
+# Longest client-supplied id that is kept; longer ones are replaced
+MAX_REQUEST_ID_LENGTH = 128
+
+class RequestIdMiddleware:
+    """
+    Reuse the client's ``header`` (e.g. set by a load balancer in front of
+    the gateway) or generate an id, expose it to log records through the
+    ``request_id`` context variable, and echo it in the response.
+    """
+
+    def __init__(self, app: ASGIApp, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.lower()
+        self.raw_header = self.header.encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = Headers(scope=scope).get(self.header)
+        if not value or len(value) > MAX_REQUEST_ID_LENGTH or not value.isprintable():
+            value = uuid.uuid4().hex
+        raw_value = value.encode("latin-1", "replace")
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), (self.raw_header, raw_value)]
+            await send(message)
+
+        token = request_id.set(value)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
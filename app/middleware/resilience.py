@@ -0,0 +1,81 @@
+"""
+ASGI middleware that gives every request a deadline and turns dependency
+failures into fast, retryable errors.
+"""
+
+import math
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.logger import logger
+from app.utils.resilience import DEPENDENCY_ERRORS, CircuitOpenError, DeadlineExceeded, deadline
+
+
+class ResilienceMiddleware:
+    """
+    Run each HTTP request under a deadline of ``default_timeout`` seconds,
+    shortened by the client's ``header`` (milliseconds) when it sends one.
+    Redis calls and proxied requests made while handling it never wait past
+    that deadline.
+
+    A request whose deadline passes is answered with 504, and one that failed
+    because a dependency is unavailable with 503 (plus ``Retry-After`` when
+    its circuit is open), as long as the response has not started yet.
+    """
+
+    def __init__(self, app: ASGIApp, default_timeout: Optional[float] = 10.0, header: str = "x-request-timeout-ms"):
+        self.app = app
+        self.default_timeout = default_timeout
+        self.header = header
+
+    def timeout(self, scope: Scope) -> Optional[float]:
+        requested = Headers(scope=scope).get(self.header)
+        if requested is None:
+            return self.default_timeout
+        try:
+            seconds = max(0.0, float(requested) / 1000)
+        except ValueError:
+            return self.default_timeout
+        return seconds if self.default_timeout is None else min(seconds, self.default_timeout)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        with deadline(self.timeout(scope)):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            except DeadlineExceeded:
+                if started:
+                    raise
+                logger.warning("Deadline exceeded for %s %s", scope["method"], scope["path"])
+                await self._respond(send, 504, b"Gateway timeout")
+            except DEPENDENCY_ERRORS as e:
+                if started:
+                    raise
+                logger.error("%s %s failed on an unavailable dependency: %r", scope["method"], scope["path"], e)
+                headers = []
+                if isinstance(e, CircuitOpenError):
+                    headers.append((b"retry-after", str(max(1, math.ceil(e.retry_after))).encode()))
+                await self._respond(send, 503, b"Service unavailable", headers)
+
+    @staticmethod
+    async def _respond(send: Send, status: int, body: bytes, headers: list = ()) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                        (b"content-length", str(len(body)).encode()), *headers],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,247 @@
+"""
+ASGI middleware that caches whole HTTP responses of opted-in routes.
+"""
+
+from typing import Callable, Iterable, Optional
+
+from starlette.datastructures import Headers
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.settings import env_settings
+from app.services.cache_service import CacheService
+from app.utils.http_cache import (
+    CachedResponse, build_cache_key, digest, etag_matches, max_age, parse_cache_control,
+)
+from app.utils.logger import logger
+from app.utils.metrics import STAGE_SECONDS, metrics
+
+
+# Vary dimensions and the request header each one reads
+VARY_HEADERS = {
+    "user": "authorization",
+    "tenant": env_settings.HTTP_CACHE_TENANT_HEADER.lower(),
+}
+
+# Statuses cacheable by default (RFC 9110 section 15.1), minus errors that may be transient
+CACHEABLE_STATUSES = frozenset({200, 203, 204, 300, 301, 308})
+
+# Headers sent back with a 304 (RFC 9110 section 15.4.5)
+NOT_MODIFIED_HEADERS = frozenset({b"cache-control", b"content-location", b"etag", b"expires", b"vary"})
+
+CACHE_LOOKUP_SECONDS = STAGE_SECONDS.labels("response_cache")
+HTTP_CACHE_REQUESTS = metrics.counter("http_cache_requests_total", "Requests to cacheable routes by cache outcome",
+                                      ("result",))
+CACHE_HITS, CACHE_MISSES, CACHE_BYPASSES = (HTTP_CACHE_REQUESTS.labels(result) for result in ("hit", "miss", "bypass"))
+
+class CachePolicy:
+    __slots__ = ("ttl", "vary")
+
+    def __init__(self, ttl: int, vary: Iterable[str] = ()):
+        self.ttl = ttl
+        self.vary = tuple(vary)
+
+def cached(ttl: int, vary: Iterable[str] = ()) -> Callable:
+    """
+    Mark an endpoint as cacheable for ``ttl`` seconds by ``ResponseCacheMiddleware``.
+
+    ``vary`` names the request dimensions that select distinct entries:
+    ``"user"``, ``"tenant"`` or any request header name. Place it below the
+    router decorator::
+
+        @api_router.get("/cached_products/")
+        @cached(ttl=300)
+        async def get_cached_products(...): ...
+    """
+    policy = CachePolicy(ttl, vary)
+
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__response_cache__ = policy
+        return endpoint
+
+    return decorator
+
+class ResponseCacheMiddleware:
+    """
+    Serve GET/HEAD responses of ``@cached`` routes from the gateway's
+    CacheService.
+
+    Keys combine method, path, the sorted query string and the route's Vary
+    dimensions. Request ``no-store`` bypasses the cache and ``no-cache`` (or
+    ``max-age=0``) forces a refresh; responses marked ``no-store``, ``private``
+    (unless varied by user), ``max-age=0`` or carrying cookies are not stored,
+    and ``s-maxage``/``max-age`` shorten the route TTL. Every stored response
+    gets a strong ETag and a matching ``If-None-Match`` is answered with 304
+    straight from the cache. Misses are buffered up to ``max_body_bytes`` to
+    compute the ETag; larger bodies are streamed and not cached.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_bytes: int = 1024 * 1024, max_routes: int = 10_000):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.max_routes = max_routes
+        self._policies: dict[tuple[str, str], tuple[Optional[BaseRoute], Optional[CachePolicy]]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        route, policy = self._policy_for(scope)
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        request_control = parse_cache_control(headers.get("cache-control"))
+        if "no-store" in request_control:
+            CACHE_BYPASSES.inc()
+            await self.app(scope, receive, send)
+            return
+
+        cache_service = self._cache_service(scope)
+        key = build_cache_key(scope["method"], scope["path"], scope["query_string"].decode("latin-1"),
+                              self._vary_values(policy, headers))
+        refresh = "no-cache" in request_control or request_control.get("max-age") == "0"
+        if not refresh:
+            try:
+                with CACHE_LOOKUP_SECONDS.time():
+                    raw = await cache_service.get_cached_response(key)
+            except Exception as e:
+                logger.error(f"Response cache lookup for {scope['path']} failed: {e}")
+                raw = None
+            if raw is not None:
+                CACHE_HITS.inc()
+                # The router never sees this request; tell the metrics middleware which route it was
+                scope["route"] = route
+                await self._send_cached(raw, headers, scope["method"], send)
+                return
+        CACHE_MISSES.inc()
+        if scope["method"] == "HEAD":
+            # A HEAD response has no body to hash or store
+            await self.app(scope, receive, send)
+            return
+
+        await self._fetch(scope, receive, send, cache_service, key, policy, headers)
+
+    def _policy_for(self, scope: Scope) -> tuple[Optional[BaseRoute], Optional[CachePolicy]]:
+        route_key = (scope["method"], scope["path"])
+        if route_key in self._policies:
+            return self._policies[route_key]
+        found = (None, None)
+        for route in scope["app"].router.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                found = (route, getattr(child_scope.get("endpoint"), "__response_cache__", None))
+                break
+        if len(self._policies) >= self.max_routes:
+            self._policies.clear()
+        self._policies[route_key] = found
+        return found
+
+    @staticmethod
+    def _cache_service(scope: Scope) -> CacheService:
+        return scope["app"].state.gateway.cache_service
+
+    @staticmethod
+    def _vary_values(policy: CachePolicy, headers: Headers) -> dict[str, str]:
+        return {name: digest(headers.get(VARY_HEADERS.get(name, name.lower()), "")) for name in policy.vary}
+
+    @staticmethod
+    def _vary_header(policy: CachePolicy) -> Optional[bytes]:
+        if not policy.vary:
+            return None
+        return ", ".join(VARY_HEADERS.get(name, name.lower()) for name in policy.vary).encode("latin-1")
+
+    async def _send_cached(self, raw: str, headers: Headers, method: str, send: Send) -> None:
+        if_none_match = headers.get("if-none-match")
+        entry = CachedResponse.decode(raw, with_body=False)
+        if etag_matches(if_none_match, entry.etag):
+            response_headers = [(name, value) for name, value in entry.headers if name in NOT_MODIFIED_HEADERS]
+            await self._send(send, 304, response_headers, b"", entry.age(), b"HIT")
+            return
+        if method == "HEAD":
+            await self._send(send, entry.status, entry.headers, b"", entry.age(), b"HIT")
+            return
+        entry = CachedResponse.decode(raw)
+        await self._send(send, entry.status, entry.headers, entry.body, entry.age(), b"HIT")
+
+    async def _fetch(self, scope: Scope, receive: Receive, send: Send, cache_service: CacheService,
+                     key: str, policy: CachePolicy, request_headers: Headers) -> None:
+        start: Optional[Message] = None
+        chunks: list[bytes] = []
+        size = 0
+        passthrough = False
+
+        async def buffer(message: Message) -> None:
+            nonlocal start, size, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if message.get("more_body", False):
+                if size > self.max_body_bytes:
+                    # Too large to cache: stop buffering and stream the rest
+                    passthrough = True
+                    await send(start)
+                    await send({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+                return
+            if size > self.max_body_bytes:
+                await send(start)
+                await send({"type": "http.response.body", "body": b"".join(chunks)})
+                return
+            await self._complete(start, b"".join(chunks), send, cache_service, key, policy, request_headers)
+
+        await self.app(scope, receive, buffer)
+
+    async def _complete(self, start: Message, body: bytes, send: Send, cache_service: CacheService, key: str,
+                        policy: CachePolicy, request_headers: Headers) -> None:
+        status = start["status"]
+        headers = Headers(raw=start.get("headers", []))
+        ttl = self._storable_ttl(status, headers, policy)
+        if ttl is None:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        raw_headers = list(start.get("headers", []))
+        if "cache-control" not in headers:
+            visibility = b"private" if "user" in policy.vary else b"public"
+            raw_headers.append((b"cache-control", visibility + b", max-age=" + str(ttl).encode()))
+        vary = self._vary_header(policy)
+        if vary is not None and "vary" not in headers:
+            raw_headers.append((b"vary", vary))
+        entry = CachedResponse.from_parts(status, raw_headers, body)
+        try:
+            await cache_service.cache_response(key, entry.encode(), expire_time=ttl)
+        except Exception as e:
+            logger.error(f"Failed to store response cache entry {key}: {e}")
+
+        if etag_matches(request_headers.get("if-none-match"), entry.etag):
+            response_headers = [(name, value) for name, value in entry.headers if name in NOT_MODIFIED_HEADERS]
+            await self._send(send, 304, response_headers, b"", 0, b"MISS")
+            return
+        await self._send(send, status, entry.headers, body, 0, b"MISS")
+
+    @staticmethod
+    def _storable_ttl(status: int, headers: Headers, policy: CachePolicy) -> Optional[int]:
+        if status not in CACHEABLE_STATUSES or "set-cookie" in headers:
+            return None
+        control = parse_cache_control(headers.get("cache-control"))
+        if "no-store" in control or ("private" in control and "user" not in policy.vary):
+            return None
+        ttl = policy.ttl
+        stated = max_age(control)
+        if stated is not None:
+            ttl = min(ttl, stated)
+        return ttl if ttl > 0 else None
+
+    @staticmethod
+    async def _send(send: Send, status: int, headers: list[tuple[bytes, bytes]], body: bytes, age: int,
+                    cache_status: bytes) -> None:
+        headers = headers + [(b"age", str(age).encode()), (b"x-cache", cache_status)]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
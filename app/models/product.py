@@ -2,9 +2,10 @@
 Product-related data models.
 """
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from datetime import date
 from decimal import Decimal
-from typing import Optional
+from typing import Literal, Optional
 
 class Product(BaseModel):
     id: Optional[int]
@@ -23,3 +24,36 @@ class Product(BaseModel):
     weight: str
     color: str
     material: str
+
+class ProductPage(BaseModel):
+    products: list[Product]
+    next_cursor: Optional[str] = None
+
+class ProductQuery(BaseModel):
+    """
+    Filters, sort order and page size of a product query.
+    Range bounds are inclusive; omitted filters match everything.
+    """
+    category: Optional[str] = None
+    brand: Optional[str] = None
+    color: Optional[str] = None
+    material: Optional[str] = None
+    min_price: Optional[Decimal] = Field(None, ge=0)
+    max_price: Optional[Decimal] = Field(None, ge=0)
+    min_rating: Optional[float] = None
+    max_rating: Optional[float] = None
+    min_stock: Optional[int] = None
+    max_stock: Optional[int] = None
+    released_after: Optional[date] = None
+    released_before: Optional[date] = None
+    sort: Literal["id", "price", "rating", "stock", "release_date"] = "id"
+    order: Literal["asc", "desc"] = "asc"
+    limit: int = Field(10, ge=1, le=1000)
+
+    def ranges(self) -> dict[str, tuple]:
+        return {
+            "price": (self.min_price, self.max_price),
+            "rating": (self.min_rating, self.max_rating),
+            "stock": (self.min_stock, self.max_stock),
+            "release_date": (self.released_after, self.released_before),
+        }
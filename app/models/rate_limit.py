@@ -0,0 +1,47 @@
+"""
+Rate limiting related data models.
+"""
+
+import math
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+RateLimitAlgorithm = Literal["fixed_window", "sliding_window", "sliding_log", "token_bucket", "gcra"]
+
+# Pydantic models for structured data
+class RateLimitRule(BaseModel):
+    algorithm: RateLimitAlgorithm = "sliding_window"
+    limit: int = Field(3, gt=0, description="Requests allowed per period")
+    period: float = Field(60, gt=0, description="Period length in seconds")
+    burst: Optional[int] = Field(None, gt=0, description="Bucket capacity for token_bucket/gcra, defaults to limit")
+    scope: str = "*"
+
+    @property
+    def capacity(self) -> int:
+        return self.burst or self.limit
+
+    @property
+    def period_ms(self) -> int:
+        return int(self.period * 1000)
+
+class RateLimitResult(BaseModel):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the quota is fully restored
+    retry_after: float = 0.0  # seconds until a denied request may be retried
+
+    def headers(self) -> dict[str, str]:
+        """
+        ``RateLimit-*`` response headers, plus ``Retry-After`` for denied requests.
+        """
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(max(self.remaining, 0)),
+            "RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
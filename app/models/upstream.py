@@ -0,0 +1,36 @@
+"""
+Upstream pool configuration for proxied routes.
+"""
+
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+BalancingStrategy = Literal["round_robin", "least_outstanding", "peak_ewma"]
+
+class UpstreamPoolConfig(BaseModel):
+    servers: list[str] = Field(..., min_length=1, description="Base URLs, e.g. http://10.0.0.5:9000")
+    strategy: BalancingStrategy = "round_robin"
+    strip_prefix: bool = Field(False, description="Drop the route prefix from the upstream path")
+    connect_timeout: float = Field(2.0, gt=0, description="Seconds to wait for a new upstream connection")
+    timeout: float = Field(30.0, gt=0, description="Seconds to wait for each read from or write to the upstream")
+    max_connections: int = Field(100, gt=0, description="Open connections per pool")
+    max_keepalive: int = Field(20, ge=0, description="Idle keep-alive connections kept per pool")
+    # Passive health: a circuit breaker per server; consecutive failures (transport errors, 5xx)
+    # eject it for eject_seconds, then one probe request decides whether it comes back
+    max_failures: int = Field(3, gt=0, description="Consecutive failures before a server is ejected")
+    eject_seconds: float = Field(10.0, gt=0, description="Seconds an ejected server receives no traffic")
+    # Active health: GET health_path on every server each interval (None disables it)
+    health_path: Optional[str] = None
+    health_interval: float = Field(5.0, gt=0, description="Seconds between active health checks")
+    health_timeout: float = Field(1.0, gt=0, description="Seconds an active health check may take")
+    # Recovered servers ramp up from a small share of traffic over this many seconds
+    slow_start: float = Field(10.0, ge=0, description="Seconds to ramp a recovered server to full weight")
+    # Peak-EWMA latency decay time
+    ewma_decay: float = Field(10.0, gt=0, description="Seconds for a latency spike to decay")
+    # Retries of requests that never reached a server and hedges, as a fraction of requests
+    retry_budget: float = Field(0.1, ge=0, description="Retries and hedges allowed per request")
+    # Idempotent requests without a body still waiting for headers after this long are also
+    # sent to a second server; the first answer wins (None disables hedging)
+    hedge_delay_ms: Optional[float] = Field(None, gt=0, description="Milliseconds before a hedged request")
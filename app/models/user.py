@@ -4,14 +4,18 @@ Data models for users related.
 
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 # Pydantic models for structured data
 class User(BaseModel):
+    # Principals are cached and shared between requests, so they must not change
+    model_config = ConfigDict(frozen=True)
+
     username: str
     full_name: Optional[str] = None
     disabled: Optional[bool] = None
+    tier: str = "default"
 
 class UserInDB(User):
     hashed_password: str
\ No newline at end of file
@@ -5,43 +5,73 @@ This file contains various endpoints, including Redis connectivity check, token
 rate-limited access to product data, and cached product retrieval.
 """
 
+import os
 from datetime import timedelta
+from datetime import date
+from decimal import Decimal
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.adapters.redis_adapter import RedisAdapter
 from app.config.settings import env_settings
 from app.core.request_handler import RequestHandler
-from app.core.gateway_factory import GatewayFactory
-from app.db.fake_db import fake_users_db
-from app.services.auth_service import AuthService
+from app.middleware.response_cache import cached
+from app.services.auth_service import oauth2_scheme
+from app.models.product import ProductQuery
 from app.models.user import User
+from app.utils.json_codec import dumps
 from app.utils.logger import logger
+from app.utils.metrics import STAGE_SECONDS, metrics
+from app.utils.streaming import accepts_encoding, gzip_chunks
+
+CACHE_SECONDS = STAGE_SECONDS.labels("cache")
 
 
 api_router = APIRouter()
 
-def get_redis_adapter() -> RedisAdapter:
-    return RedisAdapter(env_settings.REDIS_URL)
+def get_gateway(request: Request) -> RequestHandler:
+    """
+    Return the process-wide gateway built in the application lifespan.
+    """
+    return request.app.state.gateway
+
+async def get_current_user(token: str = Depends(oauth2_scheme),
+                           request_handler: RequestHandler = Depends(get_gateway)) -> User:
+    """
+    Resolve the bearer token through the gateway's AuthService (and its token cache).
+    """
+    return await request_handler.auth_service.get_current_user(token)
 
-def get_gateway(redis_adapter: RedisAdapter = Depends(get_redis_adapter)):
-    user_db = fake_users_db
-    return GatewayFactory.create_gateway(user_db=user_db, redis_url=env_settings.REDIS_URL)
+def get_redis_adapter(request_handler: RequestHandler = Depends(get_gateway)) -> RedisAdapter:
+    return request_handler.redis_adapter
 
 # Redis health check route
 @api_router.get("/redis_health_check")
-def redis_health_check(redis_adapter: RedisAdapter = Depends(get_redis_adapter)):
+async def redis_health_check(redis_adapter: RedisAdapter = Depends(get_redis_adapter)):
     """
     Health check for Redis connection by attempting to ping the server.
     """
     try:
-        is_redis_alive = redis_adapter.ping()
+        is_redis_alive = await redis_adapter.ping()
         return {"status": "Redis is working correctly"} if is_redis_alive else HTTPException(status_code=500, detail="Redis ping failed")
     except Exception as e:
         logger.error(f"Redis health check failed: {e}")
         raise HTTPException(status_code=500, detail="Redis is not functioning properly")
 
+# Readiness probe: the worker accepts connections before it is warmed up
+@api_router.get("/ready")
+async def ready(request: Request):
+    """
+    200 once this worker finished its warm-up, 503 before.
+    """
+    if not request.app.state.ready.is_set():
+        return JSONResponse({"status": "warming up", "worker": os.getpid()}, status_code=503,
+                            headers={"Retry-After": "1"})
+    return {"status": "ready", "worker": os.getpid()}
+
 # Token endpoint for login
 @api_router.post("/token", response_model=dict)
 async def login_for_access_token(
@@ -60,8 +90,21 @@ async def login_for_access_token(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@api_router.post("/logout")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+    request_handler: RequestHandler = Depends(get_gateway)
+):
+    """
+    Revoke the presented token on every worker.
+    """
+    await request_handler.auth_service.revoke_token(token)
+    logger.info("User %s logged out", current_user.username)
+    return {"message": "Logged out"}
+
 @api_router.get("/protected-route/")
-async def protected_route(current_user: User = Depends(AuthService(fake_users_db).get_current_user)):
+async def protected_route(current_user: User = Depends(get_current_user)):
     """
     Protected route that requires a valid JWT token for access.
     """
@@ -70,50 +113,181 @@ async def protected_route(current_user: User = Depends(AuthService(fake_users_db
 # Products route that requires JWT authorization
 @api_router.get("/products/")
 async def get_products(
+    limit: int = Query(10, ge=1, le=1000),
+    cursor: Optional[str] = None,
     request_handler: RequestHandler = Depends(get_gateway),
-    current_user: User = Depends(AuthService(fake_users_db).get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
-    Rate-limited endpoint to retrieve a list of products.
+    Rate-limited endpoint to retrieve a page of products.
+    Pass the returned ``next_cursor`` back as ``cursor`` to fetch the next page.
     Logs when rate limits are hit and when requests are successful.
     """
     try:
-        logger.info(f"User {current_user.username} is attempting to access products.")
+        logger.info("User %s is attempting to access products.", current_user.username)
 
         # Apply rate-limiting using the authenticated user's username as client_id
-        if not await request_handler.rate_limit(current_user.username):
-            logger.warning(f"Rate limit hit for user {current_user.username}.")
-            raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        limit_result = await request_handler.rate_limit(current_user.username, route="/products/", tier=current_user.tier)
+        if not limit_result.allowed:
+            raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=limit_result.headers())
 
-        products = await request_handler.product_service.get_products()
-        logger.info(f"Products successfully fetched for user {current_user.username}")
-        return {"products": products}
+        try:
+            # Pre-serialized page: no model building or JSON encoding per request
+            content = await request_handler.product_service.get_products_json(limit=limit, cursor=cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        logger.info("Products successfully fetched for user %s", current_user.username)
+        return Response(content=content, media_type="application/json", headers=limit_result.headers())
 
     except HTTPException as err:
         if err.status_code == 429:
-            logger.warning(f"Rate limit hit for user {current_user.username}.")
-            raise err
+            logger.warning("Rate limit hit for user %s.", current_user.username)
+        raise err
+
+# Filtered and sorted product search backed by secondary indexes
+@api_router.get("/products/query")
+async def query_products(
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    color: Optional[str] = None,
+    material: Optional[str] = None,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    min_rating: Optional[float] = None,
+    max_rating: Optional[float] = None,
+    min_stock: Optional[int] = None,
+    max_stock: Optional[int] = None,
+    released_after: Optional[date] = None,
+    released_before: Optional[date] = None,
+    sort: Literal["id", "price", "rating", "stock", "release_date"] = "id",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(10, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    request_handler: RequestHandler = Depends(get_gateway),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Rate-limited endpoint returning one page of the products that match every
+    given filter (range bounds are inclusive), in ``sort``/``order`` order, plus
+    the total number of matches. Pass ``next_cursor`` back as ``cursor`` with the
+    same filters to fetch the next page.
+    """
+    limit_result = await request_handler.rate_limit(current_user.username, route="/products/query", tier=current_user.tier)
+    if not limit_result.allowed:
+        logger.warning("Rate limit hit for user %s.", current_user.username)
+        raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=limit_result.headers())
+
+    query = ProductQuery(category=category, brand=brand, color=color, material=material,
+                         min_price=min_price, max_price=max_price, min_rating=min_rating, max_rating=max_rating,
+                         min_stock=min_stock, max_stock=max_stock, released_after=released_after,
+                         released_before=released_before, sort=sort, order=order, limit=limit)
+    try:
+        content = await request_handler.product_service.query_products_json(query, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return Response(content=content, media_type="application/json", headers=limit_result.headers())
+
+# Free-text product search ranked by relevance
+@api_router.get("/products/search")
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=100),
+    request_handler: RequestHandler = Depends(get_gateway),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Rate-limited endpoint returning the ``limit`` products whose name, brand,
+    description and features best match ``q`` (BM25), each with its score.
+    """
+    limit_result = await request_handler.rate_limit(current_user.username, route="/products/search", tier=current_user.tier)
+    if not limit_result.allowed:
+        logger.warning("Rate limit hit for user %s.", current_user.username)
+        raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=limit_result.headers())
+
+    content = await request_handler.product_service.search_products_json(q, limit=limit)
+    return Response(content=content, media_type="application/json", headers=limit_result.headers())
+
+# Search-as-you-type completions
+@api_router.get("/products/suggest")
+async def suggest_products(
+    prefix: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=50),
+    request_handler: RequestHandler = Depends(get_gateway),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Indexed terms starting with ``prefix``, most common first.
+    """
+    limit_result = await request_handler.rate_limit(current_user.username, route="/products/suggest", tier=current_user.tier)
+    if not limit_result.allowed:
+        logger.warning("Rate limit hit for user %s.", current_user.username)
+        raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=limit_result.headers())
+
+    suggestions = await request_handler.product_service.suggest_terms(prefix, limit=limit)
+    return Response(content=dumps({"suggestions": suggestions}), media_type="application/json",
+                    headers=limit_result.headers())
+
+# Whole catalog as NDJSON, streamed in batches
+@api_router.get("/products/export")
+async def export_products(
+    request: Request,
+    request_handler: RequestHandler = Depends(get_gateway),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Rate-limited endpoint streaming every product as one JSON object per
+    line, gzipped when the client accepts it. Memory use does not grow with
+    the catalog, and a slow client slows the export down instead of making
+    it buffer.
+    """
+    limit_result = await request_handler.rate_limit(current_user.username, route="/products/export",
+                                                    tier=current_user.tier)
+    if not limit_result.allowed:
+        logger.warning("Rate limit hit for user %s.", current_user.username)
+        raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=limit_result.headers())
+
+    logger.info("User %s started a product export", current_user.username)
+    body = request_handler.product_service.export_json(batch_size=env_settings.EXPORT_BATCH_SIZE,
+                                                       batch_timeout=env_settings.REQUEST_TIMEOUT)
+    headers = {**limit_result.headers(), "Vary": "Accept-Encoding"}
+    if accepts_encoding(request.headers.get("accept-encoding"), "gzip"):
+        body = gzip_chunks(body, level=env_settings.EXPORT_GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
 
 # Cached route to get products (cached for 5 minutes)
-# @api_router.get("/cached_products/")
-# async def get_cached_products(
-#     request_handler: RequestHandler = Depends(get_gateway)
-# ):
-#     """
-#     Endpoint to retrieve cached products from Redis.
-#     Cache duration: 5 minutes.
-#     """
-#     cached_products = await request_handler.cache_service.get_cached_response("cached_products")
-
-#     if cached_products:
-#         logger.info("Cache hit: Returning cached products")
-#         return {"cached_products": cached_products}
-
-#     logger.info("Cache miss: Fetching fresh products from Redis and caching them for 5 minutes")
-#     products = await request_handler.product_service.get_products()
-
-#     # Store the fetched data in the cache for 5 minutes
-#     await request_handler.cache_service.cache_response("cached_products", products, expire_time=300)
-#     logger.info("Products cached for 5 minutes")
-
-#     return {"products": products}
+@api_router.get("/cached_products/")
+@cached(ttl=300)
+async def get_cached_products(
+    request_handler: RequestHandler = Depends(get_gateway)
+):
+    """
+    Endpoint to retrieve cached products from Redis.
+    Cache duration: 5 minutes. The whole response is cached by ResponseCacheMiddleware
+    (with an ETag, so revalidations get a 304); behind it, concurrent misses share one
+    backend fetch, and an expired entry keeps being served while a single caller refreshes it.
+    """
+    async def load_products() -> str:
+        logger.info("Cache miss: Fetching fresh products from Redis and caching them for 5 minutes")
+        return (await request_handler.product_service.get_products_json()).decode()
+
+    with CACHE_SECONDS.time():
+        products = await request_handler.cache_service.get_or_compute("cached_products", load_products, ttl=300)
+    return Response(content=products, media_type="application/json")
+
+# Prometheus scrape endpoint
+@api_router.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """
+    Every metric of this worker in the Prometheus text format.
+    """
+    if not env_settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Everything not matched above goes through the gateway: paths under a configured
+# upstream prefix are proxied, anything else is a 404. Keep this route last.
+@api_router.api_route("/{path:path}", methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+                      include_in_schema=False)
+async def gateway(request: Request, request_handler: RequestHandler = Depends(get_gateway)):
+    return await request_handler.handle_request(request)
@@ -0,0 +1,74 @@
+"""
+Command line entry point for seeding fake products into Redis.
+
+    python -m app.seed --count 1000000 --processes 4
+    python -m app.main seed --count 1000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Optional
+
+from app.adapters.redis_adapter import RedisAdapter
+from app.adapters.sharded_redis_adapter import ShardedRedisAdapter
+from app.config.settings import env_settings
+from app.services.product_service import ProductService
+from app.services.search_service import RedisSearchIndex
+
+
+def seed_adapter(redis_url: Optional[str], timeout: float) -> RedisAdapter:
+    """
+    An adapter for bulk writes: ``timeout`` seconds per chunk and no
+    resilience policy, so a slow chunk is waited for instead of timing out
+    or opening a circuit breaker the way request-path calls would.
+    """
+    if env_settings.REDIS_NODES and not redis_url:
+        return ShardedRedisAdapter.from_urls(env_settings.REDIS_NODES, vnodes=env_settings.REDIS_VNODES,
+                                             socket_timeout=timeout, socket_connect_timeout=timeout)
+    return RedisAdapter(redis_url or env_settings.REDIS_URL, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+
+def seed_service(redis_adapter: RedisAdapter) -> ProductService:
+    # Workers with the memory backend index new products themselves
+    search_index = RedisSearchIndex(redis_adapter) if env_settings.SEARCH_BACKEND == "redis" else None
+    return ProductService(redis_adapter, search_index, json_copy=env_settings.PRODUCT_JSON_COPY)
+
+
+async def seed(args: argparse.Namespace) -> None:
+    redis_adapter = seed_adapter(args.redis_url, args.timeout)
+    started = time.perf_counter()
+    last_report = 0.0
+
+    def report(written: int) -> None:
+        nonlocal last_report
+        now = time.perf_counter()
+        if now - last_report < 1 and written < args.count:
+            return
+        last_report = now
+        elapsed = now - started
+        print(f"{written:>12,}/{args.count:,} products ({written / args.count:6.1%})  "
+              f"{written / elapsed:>10,.0f} products/s", flush=True)
+
+    try:
+        await seed_service(redis_adapter).seed_products(args.count, seed=args.seed, chunk_size=args.chunk_size,
+                                            processes=args.processes, progress=report)
+    finally:
+        await redis_adapter.close()
+    elapsed = time.perf_counter() - started
+    print(f"Seeded {args.count:,} products in {elapsed:.1f}s ({args.count / elapsed:,.0f} products/s)")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Seed fake products (ids 0..count-1) into Redis.")
+    parser.add_argument("--count", type=int, default=1000, help="Number of products to write")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed writes the same data")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Products written per pipelined round trip")
+    parser.add_argument("--processes", type=int, default=0, help="Generate products in this many processes")
+    parser.add_argument("--redis-url", help="Defaults to REDIS_NODES, or REDIS_URL when it is empty")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for Redis per chunk")
+    asyncio.run(seed(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Production launcher: loads the application once, then forks workers that
+all serve one listening socket.
+
+    python -m app.server --workers 4 --host 0.0.0.0 --port 8080
+
+Everything imported before the fork (settings, the fake user database and
+its bcrypt hash, FastAPI, Faker...) is paid for once and shared copy-on-write.
+Nothing with a connection, thread or event loop is created before it: each
+worker builds its own gateway (Redis pools, caches, executors) in the
+application lifespan, so no state is shared across forks. The launcher
+restarts workers that exit and stops them all on SIGTERM or SIGINT.
+"""
+
+import os
+import time
+import errno
+import select
+import signal
+import socket
+import argparse
+from typing import Optional
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+from app.utils.logger import listener, logger, restart_after_fork
+
+
+def bind(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+class Launcher:
+    def __init__(self, app: str = "app.main:app", host: str = "127.0.0.1", port: int = 8000, workers: int = 1,
+                 backlog: int = 2048, graceful_timeout: float = 30.0):
+        self.app_path = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.backlog = backlog
+        self.graceful_timeout = graceful_timeout
+        self.children: dict[int, float] = {}
+        self.ready: set[int] = set()
+        self.stopping = False
+        self.asgi_app = None
+        self.sock: Optional[socket.socket] = None
+        self.ready_read = self.ready_write = -1
+
+    def run(self) -> None:
+        launched = time.perf_counter()
+        # Preload: import the application once, before forking
+        self.asgi_app = import_from_string(self.app_path)
+        self.sock = bind(self.host, self.port, self.backlog)
+        self.ready_read, self.ready_write = os.pipe()
+        logger.info(f"Launcher {os.getpid()} loaded {self.app_path} in {time.perf_counter() - launched:.2f}s, "
+                    f"forking {self.workers} workers on {self.host}:{self.port}")
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.workers):
+            self.spawn()
+
+        all_ready = False
+        while self.children:
+            self._reap()
+            if self.stopping:
+                break
+            try:
+                readable, _, _ = select.select([self.ready_read], [], [], 0.5)
+            except InterruptedError:
+                continue
+            if readable:
+                for pid in os.read(self.ready_read, 4096).split():
+                    self.ready.add(int(pid))
+            if not all_ready and len(self.ready & self.children.keys()) == self.workers:
+                all_ready = True
+                logger.info(f"All {self.workers} workers ready {time.perf_counter() - launched:.2f}s after launch")
+        self._shutdown()
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._serve()
+                code = 0
+            except Exception:
+                logger.exception("Worker failed")
+            finally:
+                listener.stop()
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+
+    def _serve(self) -> None:
+        # The launcher's handlers and pipe end are not the worker's; uvicorn installs its own
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        os.close(self.ready_read)
+        restart_after_fork()
+        # The app writes its pid here once warmed up (see app.main.warm_up)
+        self.asgi_app.state.ready_fd = self.ready_write
+
+        config = uvicorn.Config(self.asgi_app, lifespan="on", log_config=None)
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.children.pop(pid, None)
+            self.ready.discard(pid)
+            if started is None or self.stopping:
+                continue
+            logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            # Do not spin when workers die right after starting (e.g. a bad configuration)
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            self.spawn()
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def _shutdown(self) -> None:
+        logger.info(f"Stopping {len(self.children)} workers")
+        for pid in self.children:
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in self.children:
+            logger.warning(f"Worker {pid} did not stop in {self.graceful_timeout:g}s, killing it")
+            self._signal(pid, signal.SIGKILL)
+        self.sock.close()
+
+    @staticmethod
+    def _signal(pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                raise
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the gateway from several preforked worker processes.")
+    parser.add_argument("--app", default="app.main:app", help="ASGI application to load before forking")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backlog", type=int, default=2048, help="Pending connections the socket queues")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="Seconds workers get to finish their requests on shutdown")
+    args = parser.parse_args(argv)
+    Launcher(args.app, args.host, args.port, args.workers, args.backlog, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,42 +2,158 @@
 Authentication service responsible for user authentication and token management.
 """
 
+import math
+import time
 from typing import Optional
 from datetime import timedelta
 
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
 
-from app.utils.jwt_manager import create_access_token, decode_jwt_token
+from app.utils.jwt_manager import create_access_token, decode_jwt_token, token_digest
 from app.models.user import User, UserInDB
-from app.utils.hashing import verify_password
+from app.services.login_limiter import FailedLoginLimiter
+from app.services.token_denylist import TokenDenylist
+from app.utils.hashing import HasherSaturated, PasswordHasher, verify_password
+from app.utils.lru_cache import LRUCache
+from app.utils.metrics import STAGE_SECONDS
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+AUTH_SECONDS = STAGE_SECONDS.labels("auth")
+
 class AuthService:
-    def __init__(self, user_db):
+    """
+    Verifies access tokens and resolves them to users.
+
+    Verified tokens are remembered in ``token_cache`` (keyed by the token's
+    SHA-256 digest, never the token itself) until the earlier of their
+    ``exp`` and the cache TTL, so a repeat request skips the signature check
+    and JSON decoding. Users resolve to immutable ``User`` principals built
+    once per username. Revoked tokens are rejected through ``denylist``.
+
+    Passwords are checked on ``hasher``'s executor so bcrypt never blocks the
+    event loop (inline when no hasher is given), and ``login_limiter`` locks
+    out usernames with too many recent failures.
+    """
+
+    def __init__(self, user_db, token_cache: Optional[LRUCache] = None,
+                 denylist: Optional[TokenDenylist] = None, hasher: Optional[PasswordHasher] = None,
+                 login_limiter: Optional[FailedLoginLimiter] = None):
         self.user_db = user_db
+        self.token_cache = token_cache
+        self.denylist = denylist
+        self.hasher = hasher
+        self.login_limiter = login_limiter
+        self._principals: dict[str, User] = {}
+
     async def authenticate_user(self, username: str, password: str) -> Optional[User]:
+        """
+        Return the user when the password matches, None otherwise. Raises 429
+        while the username is locked out and 503 when the hasher is saturated.
+        """
+        if self.login_limiter is not None:
+            blocked_for = await self.login_limiter.blocked_for(username)
+            if blocked_for:
+                raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                    detail="Too many failed login attempts",
+                                    headers={"Retry-After": str(math.ceil(blocked_for))})
+
         user = self.get_user(username)
-        if not user or not verify_password(password, user.hashed_password):
+        if not user or not await self._verify_password(password, user.hashed_password):
+            if self.login_limiter is not None:
+                await self.login_limiter.record_failure(username)
             return None
+        if self.login_limiter is not None:
+            await self.login_limiter.reset(username)
         return user
 
+    async def _verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        if self.hasher is None:
+            return verify_password(plain_password, hashed_password)
+        try:
+            return await self.hasher.verify(plain_password, hashed_password)
+        except HasherSaturated as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Login service busy",
+                                headers={"Retry-After": str(e.retry_after)})
+
     def get_user(self, username: str) -> Optional[UserInDB]:
         if username in self.user_db:
             user_dict = self.user_db[username]
             return UserInDB(**user_dict)
         return None
 
+    def get_principal(self, username: str) -> Optional[User]:
+        """
+        The public view of ``username``, shared by every request of that user.
+        """
+        principal = self._principals.get(username)
+        if principal is None and username in self.user_db:
+            fields = {name: value for name, value in self.user_db[username].items() if name in User.model_fields}
+            principal = self._principals[username] = User(**fields)
+        return principal
+
     async def get_current_user(self, token: str = Depends(oauth2_scheme)) -> User:
-        payload = decode_jwt_token(token)
+        with AUTH_SECONDS.time():
+            return self._verify(token)
+
+    def is_verified(self, token: str) -> bool:
+        """
+        Whether ``token`` was verified recently (it is in ``token_cache``) and
+        has not been revoked since. Costs no signature check, so callers that
+        must stay cheap, like load shedding, can tell real credentials apart.
+        """
+        if self.token_cache is None:
+            return False
+        digest = token_digest(token)
+        if self.denylist is not None and self.denylist.is_revoked(digest):
+            return False
+        return digest in self.token_cache
+
+    def _verify(self, token: str) -> User:
+        digest = token_digest(token)
+        if self.denylist is not None and self.denylist.is_revoked(digest):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+        if self.token_cache is not None:
+            principal = self.token_cache.get(digest)
+            if principal is not None:
+                return principal
+
+        try:
+            payload = decode_jwt_token(token)
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        user = self.get_user(username)
-        if user is None:
+        principal = self.get_principal(username)
+        if principal is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-        return User(**user.model_dump())
+
+        if self.token_cache is not None:
+            ttl = self.token_cache.default_ttl
+            if "exp" in payload:
+                ttl = min(ttl, payload["exp"] - time.time())
+            if ttl > 0:
+                self.token_cache.set(digest, principal, ttl=ttl)
+        return principal
+
+    async def revoke_token(self, token: str) -> None:
+        """
+        Reject ``token`` from now on, on every worker, until it expires.
+        """
+        digest = token_digest(token)
+        if self.token_cache is not None:
+            self.token_cache.delete(digest)
+        if self.denylist is None:
+            return
+        try:
+            payload = decode_jwt_token(token)
+        except JWTError:
+            return  # Already unusable
+        # A token without exp never expires, so neither does its denylist entry
+        await self.denylist.revoke(digest, payload.get("exp", float("inf")))
 
     @staticmethod
     async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -47,3 +163,13 @@ class AuthService:
 
     def create_access_token(self, data: dict, expires_delta: timedelta = None) -> str:
         return create_access_token(data, expires_delta)
+
+    async def start(self) -> None:
+        if self.denylist is not None:
+            await self.denylist.start()
+
+    async def close(self) -> None:
+        if self.denylist is not None:
+            await self.denylist.close()
+        if self.hasher is not None:
+            self.hasher.close()
@@ -0,0 +1,104 @@
+"""
+Micro-batching front for the Redis rate limiter.
+
+Checks that arrive within ``max_delay`` seconds of each other (or until
+``max_batch_size`` are waiting) are sent to Redis as one pipeline of EVALSHA
+calls. Redis runs pipelined commands in order, so two checks for the same
+client in one batch are accounted in the order they were made.
+"""
+
+import asyncio
+from typing import Optional
+
+from redis.exceptions import NoScriptError
+
+from app.models.rate_limit import RateLimitResult, RateLimitRule
+from app.services.rate_limit_service import RateLimiter, RedisRateLimiter
+from app.utils.logger import logger
+
+
+class BatchingRateLimiter(RateLimiter):
+    def __init__(self, limiter: RedisRateLimiter, max_delay: float = 0.001, max_batch_size: int = 128):
+        self.limiter = limiter
+        self.max_delay = max_delay
+        self.max_batch_size = max_batch_size
+        self._queue: list[tuple[str, RateLimitRule, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._inflight: set[asyncio.Task] = set()
+        self._scripts_loaded = False
+        # Batch size distribution in power-of-two buckets: {1: n, 2: n, 4: n, ...}
+        self.batch_size_buckets: dict[int, int] = {}
+        self.stats = {"batches": 0, "checks": 0, "max_batch_size": 0}
+
+    async def check_rate_limit(self, client_id: str, rule: Optional[RateLimitRule] = None) -> RateLimitResult:
+        rule = rule or self.limiter.default_rule
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((client_id, rule, future))
+
+        if len(self._queue) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            if self.max_delay > 0:
+                self._flush_handle = loop.call_later(self.max_delay, self._flush)
+            else:
+                self._flush_handle = loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._queue:
+            return
+        batch, self._queue = self._queue, []
+        task = asyncio.get_running_loop().create_task(self._execute(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _execute(self, batch: list) -> None:
+        self._record(len(batch))
+        try:
+            replies = await self._run(batch)
+            if any(isinstance(reply, NoScriptError) for reply in replies):
+                # Script cache was flushed (e.g. Redis restart): reload and retry only
+                # the checks that did not run, preserving their relative order
+                self._scripts_loaded = False
+                retry = [i for i, reply in enumerate(replies) if isinstance(reply, NoScriptError)]
+                for i, reply in zip(retry, await self._run([batch[i] for i in retry])):
+                    replies[i] = reply
+        except Exception as e:
+            logger.error(f"Batched rate limit check failed: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, rule, future), reply in zip(batch, replies):
+            if future.done():
+                continue
+            if isinstance(reply, Exception):
+                future.set_exception(reply)
+            else:
+                future.set_result(self.limiter.limiter_for(rule).parse(reply, rule))
+
+    async def _run(self, batch: list) -> list:
+        if not self._scripts_loaded:
+            await self._load_scripts()
+        async with self.limiter.redis_adapter.pipeline() as pipe:
+            for client_id, rule, _ in batch:
+                scripted = self.limiter.limiter_for(rule)
+                pipe.evalsha(scripted.script.sha, 1, scripted.key(client_id, rule), *scripted.args(rule))
+            return await pipe.execute(raise_on_error=False)
+
+    async def _load_scripts(self) -> None:
+        for scripted in self.limiter.limiters.values():
+            scripted.script.sha = await self.limiter.redis_adapter.script_load(scripted.script_source)
+        self._scripts_loaded = True
+
+    def _record(self, size: int) -> None:
+        bucket = 1 << (size - 1).bit_length()
+        self.batch_size_buckets[bucket] = self.batch_size_buckets.get(bucket, 0) + 1
+        self.stats["batches"] += 1
+        self.stats["checks"] += size
+        self.stats["max_batch_size"] = max(self.stats["max_batch_size"], size)
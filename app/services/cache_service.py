@@ -3,9 +3,23 @@ Caching service for storing and retrieving responses.
 """
 
 
+import asyncio
+import math
+import random
+import time
+import uuid
 from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
 
-from app.adapters.redis_adapter import RedisAdapter
+from app.adapters.redis_adapter import UNDECODED, RedisAdapter
+from app.utils.compression import compress_async, decompress_async, is_compressed
+from app.utils.distributed_lock import RedisLock
+from app.utils.logger import logger
+from app.utils.lru_cache import LRUCache
+from app.utils.resilience import DEPENDENCY_ERRORS
+
+
+Loader = Callable[[], Awaitable[str]]
 
 
 class CacheService(ABC):
@@ -17,12 +31,364 @@ class CacheService(ABC):
     async def get_cached_response(self, key: str) -> str:
         pass
 
+    @abstractmethod
+    async def invalidate(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def get_or_compute(self, key: str, compute: Loader, ttl: int = 300) -> str:
+        pass
+
+    async def start(self) -> None:
+        """
+        Start background work (no-op unless a subclass needs it).
+        """
+
+    async def close(self) -> None:
+        """
+        Stop background work started by ``start``.
+        """
+
 class RedisCacheService(CacheService):
-    def __init__(self, redis_adapter: RedisAdapter):
+    """
+    Redis-backed cache.
+
+    ``get_or_compute`` protects hot keys from stampedes: concurrent misses in a
+    worker share one computation, a Redis lock lets one worker recompute at a
+    time, values stay readable for ``stale_ttl`` seconds after they expire while
+    a single caller refreshes them in the background, and XFetch probabilistic
+    early expiration spreads refreshes out before the deadline. Its entries
+    carry a small header, so read them only through ``get_or_compute``.
+
+    With a ``last_known`` LRU, every value ``get_or_compute`` returns is also
+    kept in process so it can still be served (stale-if-error) while Redis
+    is unavailable.
+
+    Values of at least ``compress_min_bytes`` are stored zlib-compressed
+    (see app.utils.compression) and decompressed on read. ``cache_response``
+    does not store values still larger than ``max_entry_bytes``, so a few
+    huge responses cannot push many small hot entries out of Redis.
+    """
+
+    def __init__(self, redis_adapter: RedisAdapter, stale_ttl: int = 60, beta: float = 1.0,
+                 lock_timeout: float = 5.0, lock_poll_interval: float = 0.05,
+                 last_known: Optional[LRUCache] = None, compress_min_bytes: int = 1024,
+                 compress_level: int = 1, max_entry_bytes: int = 0):
         self.redis_adapter = redis_adapter
+        self.last_known = last_known
+        self.stale_ttl = stale_ttl
+        self.beta = beta
+        self.lock_timeout = lock_timeout
+        self.lock_poll_interval = lock_poll_interval
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+        self.max_entry_bytes = max_entry_bytes
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._refreshes: set[asyncio.Task] = set()
+        self.stampede_stats = {"computes": 0, "coalesced": 0, "stale_served": 0, "early_refreshes": 0,
+                               "served_on_error": 0}
+        # Writes by how they were stored, and their bytes before and after compression
+        self.write_stats = {"plain": 0, "compressed": 0, "rejected": 0}
+        self.write_bytes = {"raw": 0, "stored": 0}
 
     async def cache_response(self, key: str, value: str, expire_time: int = 300) -> None:
-        self.redis_adapter.set(key, value, expire=expire_time)
+        data = await self._pack(value)
+        if self.max_entry_bytes and len(data) > self.max_entry_bytes:
+            self.write_stats["rejected"] += 1
+            # An older, smaller version must not be served in its place
+            await self.redis_adapter.delete(key)
+            return
+        await self.redis_adapter.set(key, data, expire=expire_time)
+
+    async def get_cached_response(self, key: str) -> str:
+        return await self._unpack(await self.redis_adapter.get_bytes(key))
+
+    async def get_with_ttl(self, key: str) -> tuple[str, float]:
+        """
+        Return the value and its remaining TTL in seconds (-1 if it has none)
+        in a single round trip.
+        """
+        async with self.redis_adapter.pipeline() as pipe:
+            pipe.execute_command("GET", key, **UNDECODED)
+            pipe.pttl(key)
+            data, ttl_ms = await pipe.execute()
+        return await self._unpack(data), ttl_ms / 1000 if ttl_ms >= 0 else -1
+
+    async def _pack(self, value: str) -> bytes:
+        raw = value.encode()
+        data = await compress_async(raw, self.compress_min_bytes, self.compress_level)
+        self.write_stats["compressed" if is_compressed(data) else "plain"] += 1
+        self.write_bytes["raw"] += len(raw)
+        self.write_bytes["stored"] += len(data)
+        return data
+
+    @staticmethod
+    async def _unpack(data: Optional[bytes]) -> Optional[str]:
+        if data is None:
+            return None
+        return (await decompress_async(data)).decode()
+
+    async def invalidate(self, key: str) -> None:
+        await self.redis_adapter.delete(key)
+
+    async def get_or_compute(self, key: str, compute: Loader, ttl: int = 300,
+                             stale_ttl: Optional[int] = None) -> str:
+        value, _ = await self.get_or_compute_with_hit(key, compute, ttl, stale_ttl)
+        return value
+
+    async def get_or_compute_with_hit(self, key: str, compute: Loader, ttl: int = 300,
+                                      stale_ttl: Optional[int] = None) -> tuple[str, bool]:
+        """
+        Like ``get_or_compute``, also returning whether the value was read
+        from Redis (fresh or stale) rather than computed, waited for or
+        served from the last known values.
+        """
+        if self.last_known is None:
+            return await self._get_or_compute(key, compute, ttl, stale_ttl)
+        try:
+            value, hit = await self._get_or_compute(key, compute, ttl, stale_ttl)
+        except DEPENDENCY_ERRORS as e:
+            value = self.last_known.get(key)
+            if value is None:
+                raise
+            self.stampede_stats["served_on_error"] += 1
+            logger.warning("Serving last known value of cache key %s: %r", key, e)
+            return value, False
+        self.last_known.set(key, value)
+        return value, hit
+
+    async def _get_or_compute(self, key: str, compute: Loader, ttl: int,
+                              stale_ttl: Optional[int]) -> tuple[str, bool]:
+        raw = await self._unpack(await self.redis_adapter.get_bytes(key))
+        if raw is not None:
+            expires_at, delta, value = self._decode(raw)
+            now = time.time()
+            # XFetch: recompute early with a probability that grows near expiry
+            if now - delta * self.beta * math.log(1.0 - random.random()) < expires_at:
+                return value, True
+            if now < expires_at:
+                self.stampede_stats["early_refreshes"] += 1
+            else:
+                self.stampede_stats["stale_served"] += 1
+            self._refresh_in_background(key, compute, ttl, stale_ttl)
+            return value, True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stampede_stats["coalesced"] += 1
+            value = await asyncio.shield(inflight)
+            if value is not None:
+                return value, False
+            # A background refresh lost the lock race or the leader was cancelled; compute below instead
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._compute_locked(key, compute, ttl, stale_ttl, wait=True)
+            future.set_result(value)
+            return value, False
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            if not future.done():
+                # Cancelled: release the followers to compute for themselves
+                future.set_result(None)
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def close(self) -> None:
+        # Refreshes still running would write through an adapter that is closing
+        refreshes = list(self._refreshes)
+        for task in refreshes:
+            task.cancel()
+        await asyncio.gather(*refreshes, return_exceptions=True)
+
+    def _refresh_in_background(self, key: str, compute: Loader, ttl: int, stale_ttl: Optional[int]) -> None:
+        if key in self._inflight:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        async def refresh() -> None:
+            try:
+                value = await self._compute_locked(key, compute, ttl, stale_ttl, wait=False)
+                future.set_result(value)
+            except Exception as e:
+                logger.error(f"Background refresh of cache key {key} failed: {e}")
+                future.set_result(None)
+
+        def settle(task: asyncio.Task) -> None:
+            # Also runs when close() cancels the refresh, even before it started
+            self._refreshes.discard(task)
+            if not future.done():
+                future.set_result(None)
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+        task = asyncio.create_task(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(settle)
+
+    async def _compute_locked(self, key: str, compute: Loader, ttl: int, stale_ttl: Optional[int],
+                              wait: bool) -> Optional[str]:
+        """
+        Recompute under the cross-worker lock. When another worker holds it,
+        either give up (``wait=False``) or poll for its result and fall back to
+        computing locally once the lock timeout has passed.
+        """
+        lock = RedisLock(self.redis_adapter, f"lock:{key}", ttl=self.lock_timeout)
+        if not await lock.acquire():
+            if not wait:
+                return None
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.lock_poll_interval)
+                raw = await self._unpack(await self.redis_adapter.get_bytes(key))
+                if raw is not None:
+                    return self._decode(raw)[2]
+            logger.warning(f"Timed out waiting for cache key {key}; computing it locally")
+
+        try:
+            started = time.time()
+            value = await compute()
+            self.stampede_stats["computes"] += 1
+            finished = time.time()
+            stale = self.stale_ttl if stale_ttl is None else stale_ttl
+            entry = await self._pack(self._encode(finished + ttl, finished - started, value))
+            await self.redis_adapter.set(key, entry, expire=ttl + stale)
+            return value
+        finally:
+            await lock.release()
+
+    @staticmethod
+    def _encode(expires_at: float, delta: float, value: str) -> str:
+        return f"{expires_at:.3f}:{delta:.4f}:{value}"
+
+    @staticmethod
+    def _decode(raw: str) -> tuple[float, float, str]:
+        expires_at, delta, value = raw.split(":", 2)
+        return float(expires_at), float(delta), value
+
+class TieredCacheService(CacheService):
+    """
+    In-process LRU (L1) in front of Redis (L2).
+
+    L1 entries live at most ``l1.default_ttl`` seconds and never outlive the
+    Redis entry they were copied from. Writes and invalidations are published
+    on ``channel`` so other workers drop their L1 copy; if the subscription is
+    lost, the whole L1 is cleared on reconnect because messages may be missed.
+    """
+
+    def __init__(self, redis_adapter: RedisAdapter, l1: LRUCache, channel: str = "cache:invalidate",
+                 l2: Optional[RedisCacheService] = None):
+        self.redis_adapter = redis_adapter
+        self.l1 = l1
+        self.l2 = l2 or RedisCacheService(redis_adapter)
+        self.channel = channel
+        self.worker_id = uuid.uuid4().hex
+        self._listener: asyncio.Task = None
+        # Bumped on every remote invalidation so a racing L2 read is not copied into L1
+        self._generation = 0
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
 
     async def get_cached_response(self, key: str) -> str:
-        return self.redis_adapter.get(key)
+        value = self.l1.get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+
+        generation = self._generation
+        value, ttl = await self.l2.get_with_ttl(key)
+        if value is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["l2_hits"] += 1
+        if generation == self._generation:
+            self.l1.set(key, value, ttl=self._l1_ttl(ttl))
+        return value
+
+    async def cache_response(self, key: str, value: str, expire_time: int = 300) -> None:
+        await self.l2.cache_response(key, value, expire_time=expire_time)
+        self.l1.set(key, value, ttl=self._l1_ttl(expire_time))
+        await self._publish(key)
+
+    async def get_or_compute(self, key: str, compute: Loader, ttl: int = 300,
+                             stale_ttl: Optional[int] = None) -> str:
+        value = self.l1.get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+
+        generation = self._generation
+        value, hit = await self.l2.get_or_compute_with_hit(key, compute, ttl=ttl, stale_ttl=stale_ttl)
+        # A value the Redis tier had to compute is a miss of both tiers
+        self.stats["l2_hits" if hit else "misses"] += 1
+        if generation == self._generation:
+            self.l1.set(key, value, ttl=self._l1_ttl(ttl))
+        return value
+
+    async def invalidate(self, key: str) -> None:
+        self.l1.delete(key)
+        await self.l2.invalidate(key)
+        await self._publish(key)
+
+    def tier_stats(self) -> dict:
+        lookups = sum(self.stats.values())
+        return {
+            **self.stats,
+            "l1_hit_ratio": self.stats["l1_hits"] / lookups if lookups else 0.0,
+            "l2_hit_ratio": self.stats["l2_hits"] / lookups if lookups else 0.0,
+            "l1_entries": len(self.l1),
+            "l1_bytes": self.l1.bytes,
+            "l1_evictions": self.l1.evictions,
+        }
+
+    def _l1_ttl(self, l2_ttl: float) -> float:
+        if l2_ttl is None or l2_ttl < 0:
+            return self.l1.default_ttl
+        return min(self.l1.default_ttl, l2_ttl)
+
+    async def _publish(self, key: str) -> None:
+        try:
+            await self.redis_adapter.publish(self.channel, f"{self.worker_id}:{key}")
+        except Exception as e:
+            logger.error(f"Failed to publish cache invalidation for {key}: {e}")
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.l2.close()
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis_adapter.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._generation += 1
+                self.l1.clear()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    origin, _, key = message["data"].partition(":")
+                    if origin != self.worker_id:
+                        self._generation += 1
+                        self.l1.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed, retrying: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
@@ -0,0 +1,94 @@
+"""
+Rate limiting that degrades instead of failing when Redis is unavailable.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Literal, Optional
+
+from app.models.rate_limit import RateLimitResult, RateLimitRule
+from app.services.rate_limit_service import RateLimiter
+from app.utils.logger import logger
+from app.utils.resilience import DEPENDENCY_ERRORS, DeadlineExceeded
+
+
+FailureMode = Literal["open", "closed", "local"]
+
+class LocalRateLimiter(RateLimiter):
+    """
+    In-process token bucket per client and rule scope, holding at most
+    ``max_clients`` buckets (least recently used ones are dropped). Each
+    worker counts on its own, so across ``n`` workers a client may get up to
+    ``n`` times its limit.
+    """
+
+    def __init__(self, default_rule: Optional[RateLimitRule] = None, max_clients: int = 100_000):
+        self.default_rule = default_rule or RateLimitRule()
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+
+    async def check_rate_limit(self, client_id: str, rule: Optional[RateLimitRule] = None) -> RateLimitResult:
+        rule = rule or self.default_rule
+        now = time.monotonic()
+        rate = rule.limit / rule.period
+        key = (rule.scope, client_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(rule.capacity), now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        tokens = min(rule.capacity, bucket[0] + (now - bucket[1]) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        bucket[0], bucket[1] = tokens, now
+        return RateLimitResult(
+            allowed=allowed,
+            limit=rule.limit,
+            remaining=math.floor(tokens),
+            reset_after=(rule.capacity - tokens) / rate,
+            retry_after=0.0 if allowed else (1 - tokens) / rate,
+        )
+
+class FallbackRateLimiter(RateLimiter):
+    """
+    Wraps a Redis-backed limiter and answers from ``mode`` when Redis fails
+    (including while its circuit breaker is open, but not when the request's
+    own deadline passed):
+
+    - ``open`` allows the request,
+    - ``closed`` denies it with a short Retry-After,
+    - ``local`` falls back to a per-worker LocalRateLimiter.
+    """
+
+    def __init__(self, limiter: RateLimiter, mode: FailureMode = "open",
+                 default_rule: Optional[RateLimitRule] = None, retry_after: float = 1.0):
+        self.limiter = limiter
+        self.mode = mode
+        self.default_rule = default_rule or RateLimitRule()
+        self.retry_after = retry_after
+        self.local = LocalRateLimiter(self.default_rule) if mode == "local" else None
+        self.stats = {"fallbacks": 0}
+
+    async def check_rate_limit(self, client_id: str, rule: Optional[RateLimitRule] = None) -> RateLimitResult:
+        try:
+            return await self.limiter.check_rate_limit(client_id, rule)
+        except DeadlineExceeded:
+            # The request is out of time either way
+            raise
+        except DEPENDENCY_ERRORS as e:
+            self.stats["fallbacks"] += 1
+            if self.stats["fallbacks"] == 1 or self.stats["fallbacks"] % 1000 == 0:
+                logger.warning(f"Rate limiting failed {self.mode} ({self.stats['fallbacks']} times so far): {e!r}")
+            return await self.fallback(client_id, rule or self.default_rule)
+
+    async def fallback(self, client_id: str, rule: RateLimitRule) -> RateLimitResult:
+        if self.mode == "local":
+            return await self.local.check_rate_limit(client_id, rule)
+        if self.mode == "closed":
+            return RateLimitResult(allowed=False, limit=rule.limit, remaining=0,
+                                   reset_after=self.retry_after, retry_after=self.retry_after)
+        return RateLimitResult(allowed=True, limit=rule.limit, remaining=rule.limit, reset_after=0.0)
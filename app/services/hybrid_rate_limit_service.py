@@ -0,0 +1,154 @@
+"""
+Hybrid local+Redis rate limiting service.
+
+Each worker leases blocks of tokens from a token bucket kept in Redis and spends
+them from an in-process counter, so most checks never leave the process. The
+lease size is the accuracy/latency knob: a lease of 1 is exact and pays one
+Redis call per request; larger leases cut Redis calls roughly by the lease size
+but let tokens parked in other workers be spent late (up to
+``workers * lease_size`` over the limit in any interval) or expire unused.
+"""
+
+import time
+import asyncio
+from typing import Optional
+
+from app.adapters.redis_adapter import RedisAdapter
+from app.models.rate_limit import RateLimitResult, RateLimitRule
+from app.services.rate_limit_service import RateLimiter
+
+
+# Replies {granted, tokens_left, reset_after_ms, retry_after_ms}
+LEASE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local capacity, limit, period = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local rate = limit / period
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local granted = math.min(requested, math.floor(tokens))
+local retry = 0
+if granted > 0 then
+    tokens = tokens - granted
+else
+    granted = 0
+    retry = math.ceil((1 - tokens) / rate)
+end
+local reset = math.ceil((capacity - tokens) / rate)
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.max(reset, 1))
+return {granted, math.floor(tokens), reset, retry}
+"""
+
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at", "denied_until", "remote_remaining", "reset_at")
+
+    def __init__(self):
+        self.tokens = 0
+        self.expires_at = 0.0
+        self.denied_until = 0.0
+        self.remote_remaining = 0
+        self.reset_at = 0.0
+
+class HybridRateLimiter(RateLimiter):
+    """
+    Token bucket limiter that serves checks from locally leased tokens.
+
+    The rule's algorithm is ignored: Redis always holds a token bucket of
+    ``rule.capacity`` refilled at ``rule.limit`` per ``rule.period``.
+    Unused leased tokens are dropped after ``lease_ttl`` seconds, and a denied
+    client is answered locally until its retry time instead of re-asking Redis.
+    """
+
+    def __init__(self, redis_adapter: RedisAdapter, default_rule: Optional[RateLimitRule] = None,
+                 lease_size: int = 10, lease_ttl: float = 1.0, max_clients: int = 100_000):
+        self.redis_adapter = redis_adapter
+        self.default_rule = default_rule or RateLimitRule(algorithm="token_bucket")
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl
+        self.max_clients = max_clients
+        self.script = redis_adapter.register_script(LEASE_SCRIPT)
+        self._leases: dict[str, _Lease] = {}
+        self._pending: dict[str, asyncio.Future] = {}
+        self.stats = {"local_hits": 0, "local_denials": 0, "redis_calls": 0}
+
+    async def check_rate_limit(self, client_id: str, rule: Optional[RateLimitRule] = None) -> RateLimitResult:
+        rule = rule or self.default_rule
+        key = f"rate_limit:lease:{rule.scope}:{{{client_id}}}"
+
+        while True:
+            now = time.monotonic()
+            lease = self._leases.get(key)
+            if lease is not None:
+                if lease.tokens > 0 and lease.expires_at > now:
+                    lease.tokens -= 1
+                    self.stats["local_hits"] += 1
+                    return self._result(rule, lease, now, allowed=True)
+                if lease.denied_until > now:
+                    self.stats["local_denials"] += 1
+                    return self._result(rule, lease, now, allowed=False)
+
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            # Another coroutine is already renewing this client's lease
+            await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            lease = await self._renew(key, rule)
+        finally:
+            del self._pending[key]
+            future.set_result(None)
+
+        now = time.monotonic()
+        if lease.tokens > 0:
+            lease.tokens -= 1
+            return self._result(rule, lease, now, allowed=True)
+        return self._result(rule, lease, now, allowed=False)
+
+    async def _renew(self, key: str, rule: RateLimitRule) -> _Lease:
+        requested = max(1, min(self.lease_size, rule.capacity))
+        self.stats["redis_calls"] += 1
+        granted, remaining, reset_ms, retry_ms = await self.script(
+            keys=[key], args=[rule.capacity, rule.limit, rule.period_ms, requested]
+        )
+
+        now = time.monotonic()
+        lease = self._leases.get(key)
+        if lease is None:
+            if len(self._leases) >= self.max_clients:
+                self._prune(now)
+            lease = self._leases[key] = _Lease()
+        lease.tokens = granted
+        lease.expires_at = now + self.lease_ttl
+        lease.denied_until = now + retry_ms / 1000 if not granted else 0.0
+        lease.remote_remaining = remaining
+        lease.reset_at = now + reset_ms / 1000
+        return lease
+
+    def _prune(self, now: float) -> None:
+        """
+        Drop expired leases; if that is not enough, drop the oldest half.
+        """
+        for key in [k for k, lease in self._leases.items()
+                    if lease.expires_at <= now and lease.denied_until <= now]:
+            del self._leases[key]
+        if len(self._leases) >= self.max_clients:
+            for key in list(self._leases)[: len(self._leases) // 2]:
+                del self._leases[key]
+
+    @staticmethod
+    def _result(rule: RateLimitRule, lease: _Lease, now: float, allowed: bool) -> RateLimitResult:
+        return RateLimitResult(
+            allowed=allowed,
+            limit=rule.limit,
+            remaining=lease.tokens + lease.remote_remaining,
+            reset_after=max(0.0, lease.reset_at - now),
+            retry_after=0.0 if allowed else max(0.0, lease.denied_until - now),
+        )
@@ -0,0 +1,137 @@
+"""
+Upstream servers and the strategies that pick one for each proxied request.
+"""
+
+import itertools
+import math
+import random
+from abc import ABC, abstractmethod
+
+from app.utils.logger import logger
+from app.utils.resilience import CircuitBreaker
+
+
+# Share of traffic a server gets at the very start of its slow start
+MIN_SLOW_START_WEIGHT = 0.1
+
+class UpstreamServer:
+    """
+    Live state of one upstream server, shared by the balancer and the
+    passive and active health checks. Times are ``time.monotonic()`` values.
+
+    Passive health is a circuit breaker: consecutive failures eject the
+    server, and once its recovery time has passed one probe request is let
+    through to decide whether it comes back.
+    """
+
+    __slots__ = ("url", "decay", "slow_start", "breaker", "outstanding", "latency", "_observed_at", "healthy",
+                 "recovered_at")
+
+    def __init__(self, url: str, decay: float = 10.0, slow_start: float = 10.0, max_failures: int = 3,
+                 eject_seconds: float = 10.0):
+        self.url = url.rstrip("/")
+        self.decay = decay
+        self.slow_start = slow_start
+        self.breaker = CircuitBreaker(self.url, failure_threshold=max_failures, recovery_time=eject_seconds)
+        self.outstanding = 0
+        self.latency = 0.0
+        self._observed_at = 0.0
+        self.healthy = True
+        self.recovered_at = -math.inf
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.breaker.available()
+
+    def weight(self, now: float) -> float:
+        """
+        Share of a full server's traffic: ramps linearly from
+        ``MIN_SLOW_START_WEIGHT`` to 1 over ``slow_start`` seconds after recovery.
+        """
+        elapsed = now - self.recovered_at
+        if elapsed >= self.slow_start:
+            return 1.0
+        return max(MIN_SLOW_START_WEIGHT, elapsed / self.slow_start)
+
+    def observe(self, rtt: float, now: float) -> None:
+        """
+        Peak EWMA: a slower response is adopted at once, faster ones pull the
+        estimate down exponentially with the time since the last observation.
+        """
+        if rtt > self.latency:
+            self.latency = rtt
+        else:
+            keep = math.exp(-(now - self._observed_at) / self.decay)
+            self.latency = self.latency * keep + rtt * (1 - keep)
+        self._observed_at = now
+
+    def record_success(self, now: float) -> None:
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            # Traffic comes back gradually after an ejection
+            self.recovered_at = now
+        self.breaker.record_success()
+
+    def record_failure(self) -> None:
+        self.breaker.record_failure()
+
+    def set_healthy(self, healthy: bool, now: float) -> None:
+        if healthy and not self.healthy:
+            self.recovered_at = now
+            logger.info(f"Upstream {self.url} passed its health check, slow-starting")
+        elif not healthy and self.healthy:
+            logger.warning(f"Upstream {self.url} failed its health check")
+        self.healthy = healthy
+
+class LoadBalancer(ABC):
+    @abstractmethod
+    def choose(self, servers: list[UpstreamServer], now: float) -> UpstreamServer:
+        """
+        Pick one of ``servers`` (never empty) for the next request.
+        """
+
+class RoundRobinBalancer(LoadBalancer):
+    """
+    Servers in turn; a slow-starting server keeps its turn with probability
+    equal to its weight.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def choose(self, servers: list[UpstreamServer], now: float) -> UpstreamServer:
+        for _ in range(len(servers)):
+            server = servers[next(self._counter) % len(servers)]
+            if random.random() < server.weight(now):
+                return server
+        return server
+
+class LeastOutstandingBalancer(LoadBalancer):
+    """
+    The server with the fewest requests in flight relative to its weight,
+    ties broken at random.
+    """
+
+    def choose(self, servers: list[UpstreamServer], now: float) -> UpstreamServer:
+        return min(servers, key=lambda server: ((server.outstanding + 1) / server.weight(now), random.random()))
+
+class PeakEwmaBalancer(LoadBalancer):
+    """
+    Power of two choices on ``latency * (outstanding + 1) / weight``: two
+    random servers, the cheaper one wins. Sampling instead of scanning keeps
+    every worker from herding onto the same momentarily fastest server.
+    """
+
+    def choose(self, servers: list[UpstreamServer], now: float) -> UpstreamServer:
+        if len(servers) == 1:
+            return servers[0]
+        first, second = random.sample(servers, 2)
+        return min(first, second, key=lambda server: self.cost(server, now))
+
+    @staticmethod
+    def cost(server: UpstreamServer, now: float) -> float:
+        return server.latency * (server.outstanding + 1) / server.weight(now)
+
+BALANCERS = {
+    "round_robin": RoundRobinBalancer,
+    "least_outstanding": LeastOutstandingBalancer,
+    "peak_ewma": PeakEwmaBalancer,
+}
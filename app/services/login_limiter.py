@@ -0,0 +1,50 @@
+"""
+Per-username limit on failed login attempts, shared across workers via Redis.
+"""
+
+from app.adapters.redis_adapter import RedisAdapter
+
+
+# Count a failure; the window starts at the first failure
+RECORD_FAILURE_SCRIPT = """
+local failures = redis.call('INCR', KEYS[1])
+if failures == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[1])
+end
+return failures
+"""
+
+class FailedLoginLimiter:
+    """
+    Locks a username out after ``max_failures`` wrong passwords within
+    ``window`` seconds, until the window ends. The check runs before the
+    password hash so locked-out guessing costs no bcrypt work.
+    """
+
+    def __init__(self, redis_adapter: RedisAdapter, max_failures: int = 5, window: float = 300):
+        self.redis_adapter = redis_adapter
+        self.max_failures = max_failures
+        self.window = window
+        self._record = redis_adapter.register_script(RECORD_FAILURE_SCRIPT)
+
+    @staticmethod
+    def key(username: str) -> str:
+        return f"login:failures:{username.lower()}"
+
+    async def blocked_for(self, username: str) -> float:
+        """
+        Seconds until ``username`` may try again, 0 if it is not locked out.
+        """
+        async with self.redis_adapter.pipeline() as pipe:
+            pipe.get(self.key(username))
+            pipe.pttl(self.key(username))
+            failures, ttl_ms = await pipe.execute()
+        if failures is None or int(failures) < self.max_failures:
+            return 0
+        return max(ttl_ms, 0) / 1000
+
+    async def record_failure(self, username: str) -> int:
+        return await self._record(keys=[self.key(username)], args=[int(self.window * 1000)])
+
+    async def reset(self, username: str) -> None:
+        await self.redis_adapter.delete(self.key(username))
@@ -0,0 +1,134 @@
+"""
+Secondary indexes over products and the server-side query that uses them.
+"""
+
+import uuid
+from datetime import date
+
+from redis.asyncio.client import Pipeline
+
+from app.adapters.redis_adapter import RedisAdapter
+from app.models.product import ProductQuery
+
+
+# Set per value of each categorical field, sorted set scored by each numeric field
+SET_FIELDS = ("category", "brand", "color", "material")
+SCORE_FIELDS = ("id", "price", "rating", "stock", "release_date")
+
+# Intersect the filters, then page through the result in sort order.
+# KEYS: result, sort index, set indexes..., range sources..., range copies...
+# ARGV: set count, range count, offset, limit, descending, sort min, sort max, (min, max) per range
+QUERY_SCRIPT = """
+local n_sets, n_ranges = tonumber(ARGV[1]), tonumber(ARGV[2])
+local offset, limit, descending = tonumber(ARGV[3]), tonumber(ARGV[4]), ARGV[5] == '1'
+local inputs, weights = {KEYS[2]}, {1}
+for i = 1, n_sets do
+    table.insert(inputs, KEYS[2 + i])
+    table.insert(weights, 0)
+end
+for i = 1, n_ranges do
+    local copy = KEYS[2 + n_sets + n_ranges + i]
+    redis.call('ZRANGESTORE', copy, KEYS[2 + n_sets + i], ARGV[6 + 2 * i], ARGV[7 + 2 * i], 'BYSCORE')
+    table.insert(inputs, copy)
+    table.insert(weights, 0)
+end
+
+local source = KEYS[2]
+if #inputs > 1 then
+    local args = {'ZINTERSTORE', KEYS[1], #inputs}
+    for _, key in ipairs(inputs) do table.insert(args, key) end
+    table.insert(args, 'WEIGHTS')
+    for _, weight in ipairs(weights) do table.insert(args, weight) end
+    redis.call(unpack(args))
+    source = KEYS[1]
+end
+
+local total = redis.call('ZCOUNT', source, ARGV[6], ARGV[7])
+local ids
+if descending then
+    ids = redis.call('ZREVRANGEBYSCORE', source, ARGV[7], ARGV[6], 'LIMIT', offset, limit)
+else
+    ids = redis.call('ZRANGEBYSCORE', source, ARGV[6], ARGV[7], 'LIMIT', offset, limit)
+end
+
+local temporary = {KEYS[1]}
+for i = 1, n_ranges do table.insert(temporary, KEYS[2 + n_sets + n_ranges + i]) end
+redis.call('DEL', unpack(temporary))
+return {total, ids}
+"""
+
+class ProductIndex:
+    """
+    Maintains ``idx:{product}:*`` keys and answers ``ProductQuery`` with one
+    script call that returns only the ids of the requested page.
+
+    Filters intersect server-side: set indexes enter ``ZINTERSTORE`` with
+    weight 0 and range filters on fields other than the sort field are first
+    copied out with ``ZRANGESTORE``, so the result keeps the sort field's
+    scores. Temporary keys never outlive the (atomic) script.
+    """
+
+    # The {product} hash tag keeps every index key (and the search index) on one Redis node
+    prefix = "idx:{product}"
+
+    def __init__(self, redis_adapter: RedisAdapter):
+        self.redis_adapter = redis_adapter
+        self._query = redis_adapter.register_script(QUERY_SCRIPT)
+
+    def set_key(self, field: str, value: str) -> str:
+        return f"{self.prefix}:{field}:{value.strip().lower()}"
+
+    def score_key(self, field: str) -> str:
+        return f"{self.prefix}:{field}"
+
+    @staticmethod
+    def score(field: str, value) -> float:
+        if field == "release_date":
+            return (value if isinstance(value, date) else date.fromisoformat(value)).toordinal()
+        return float(value)
+
+    def add(self, pipe: Pipeline, pid: int, fields: dict) -> None:
+        """
+        Queue the index updates for product ``pid`` on ``pipe``.
+        """
+        for field in SET_FIELDS:
+            pipe.sadd(self.set_key(field, fields[field]), pid)
+        for field in SCORE_FIELDS:
+            value = pid if field == "id" else fields[field]
+            pipe.zadd(self.score_key(field), {pid: self.score(field, value)})
+
+    def remove(self, pipe: Pipeline, pid: int, fields: dict) -> None:
+        """
+        Queue the removal of product ``pid`` from the set indexes of its
+        previous ``fields``; score indexes are overwritten by ``add``.
+        """
+        for field in SET_FIELDS:
+            pipe.srem(self.set_key(field, fields[field]), pid)
+
+    async def query(self, query: ProductQuery, offset: int = 0) -> tuple[int, list[int]]:
+        """
+        Return the number of matching products and the ids of one page.
+        """
+        sets = [self.set_key(field, getattr(query, field)) for field in SET_FIELDS
+                if getattr(query, field) is not None]
+        sort_range = ("-inf", "+inf")
+        ranges = []
+        for field, (low, high) in query.ranges().items():
+            if low is None and high is None:
+                continue
+            bounds = ("-inf" if low is None else repr(self.score(field, low)),
+                      "+inf" if high is None else repr(self.score(field, high)))
+            if field == query.sort:
+                sort_range = bounds
+            else:
+                ranges.append((field, bounds))
+
+        tag = uuid.uuid4().hex
+        keys = [f"{self.prefix}:tmp:{tag}", self.score_key(query.sort), *sets,
+                *(self.score_key(field) for field, _ in ranges),
+                *(f"{self.prefix}:tmp:{tag}:{field}" for field, _ in ranges)]
+        args = [len(sets), len(ranges), offset, query.limit, int(query.order == "desc"), *sort_range]
+        for _, bounds in ranges:
+            args.extend(bounds)
+        total, ids = await self._query(keys=keys, args=args)
+        return int(total), [int(pid) for pid in ids]
@@ -1,71 +1,359 @@
 """
 Service for managing product-related operations, including seeding fake data.
+
+Each product is stored under ``product:{id}`` as a compact binary record
+(see app.utils.product_codec) and, unless disabled, as its pre-serialized
+JSON under ``product:{id}:json`` for pages that need no encoding at all.
 """
 
-from faker import Faker
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Optional, Sequence
+
+from redis.asyncio.client import Pipeline
 
-from app.models.product import Product
+from app.models.product import Product, ProductPage, ProductQuery
 from app.adapters.redis_adapter import RedisAdapter
+from app.db.fake_products import generate_product_rows
+from app.services.product_index import ProductIndex
+from app.services.search_service import SearchIndex
+from app.utils.json_codec import dumps
+from app.utils.metrics import STAGE_SECONDS
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.product_codec import decode_product, encode_product
+from app.utils.resilience import renewed_deadline
+
+
+PRODUCTS_SECONDS = STAGE_SECONDS.labels("products")
+QUERY_SECONDS = STAGE_SECONDS.labels("product_query")
+SEARCH_SECONDS = STAGE_SECONDS.labels("product_search")
 
+# Raise the id counter to ARGV[1] unless it is already past it
+RESERVE_IDS_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local wanted = tonumber(ARGV[1])
+if current < wanted then
+    redis.call('SET', KEYS[1], wanted)
+    return wanted
+end
+return current
+"""
 
-fake = Faker()
+# Replace a product's legacy hash with its record, unless it was saved as a record in the meantime
+CONVERT_HASH_SCRIPT = """
+if redis.call('TYPE', KEYS[1]).ok == 'hash' then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+"""
 
 class ProductService:
-    def __init__(self, redis_adapter: RedisAdapter):
+    def __init__(self, redis_adapter: RedisAdapter, search_index: Optional[SearchIndex] = None,
+                 json_copy: bool = True):
+        """
+        Without ``json_copy`` only the records are stored, about half the
+        memory, and pages are encoded from them on every read.
+        """
         self.redis_adapter = redis_adapter
+        self.index = ProductIndex(redis_adapter)
+        self.search_index = search_index
+        self.json_copy = json_copy
+        self._convert_hash = redis_adapter.register_script(CONVERT_HASH_SCRIPT)
 
-    async def get_products(self, limit: int = 10) -> list[Product]:
-        products = []
-        for pid in range(limit):
-            product_data = self.redis_adapter.hgetall(f"product:{pid}")
-            if product_data:
-                product_data["id"] = pid                 
-                if 'product_name' in product_data:
-                    product_data['name'] = product_data.pop('product_name')
+    async def start(self) -> None:
+        if self.search_index is not None:
+            await self.search_index.start()
 
-                products.append(Product(**product_data))
+    async def close(self) -> None:
+        if self.search_index is not None:
+            await self.search_index.close()
+
+    async def warm_up(self) -> None:
+        """
+        Read the first page (opening a Redis connection and backfilling its
+        JSON if needed) and wait for the search index to be built.
+        """
+        await self.get_products_json()
+        if self.search_index is not None:
+            await self.search_index.warm_up()
+
+    async def get_products(self, limit: int = 10, cursor: Optional[str] = None) -> ProductPage:
+        """
+        Return one page of products starting at ``cursor`` (the first page when
+        omitted). The whole page is fetched in a single MGET.
+        Raises ValueError for a cursor that was not issued by this method.
+        """
+        start = decode_cursor(cursor) if cursor else 0
+        products = await self._products(range(start, start + limit))
+        # Ids are allocated densely, so a full last slot means there may be more
+        next_cursor = encode_cursor(start + limit) if products and products[-1] is not None else None
+        return ProductPage(products=[product for product in products if product is not None], next_cursor=next_cursor)
+
+    async def get_products_json(self, limit: int = 10, cursor: Optional[str] = None) -> bytes:
+        """
+        Same page as ``get_products``, already encoded as the JSON response body.
+
+        Each product's JSON is stored next to its record when it is written,
+        so a page is one MGET plus byte concatenation with no model building.
+        """
+        with PRODUCTS_SECONDS.time():
+            start = decode_cursor(cursor) if cursor else 0
+            items = await self._json_items(range(start, start + limit))
+            next_cursor = encode_cursor(start + limit) if items and items[-1] is not None else None
+            return self.assemble_page([item for item in items if item is not None], next_cursor)
+
+    async def export_json(self, batch_size: int = 1000, batch_timeout: Optional[float] = None) -> AsyncIterator[bytes]:
+        """
+        Every product as NDJSON (one JSON object per line, in id order), one
+        chunk per ``batch_size`` products, each read with one MGET.
+
+        Ids are dense up to the id counter, so the catalog is walked by id
+        range rather than SCAN: no duplicates, and on a sharded store each
+        MGET is split by node. The next batch is fetched while the caller
+        handles the current one, and no further: a slow consumer holds back
+        the reads, so memory stays at about two batches whatever the catalog
+        size. Each batch gets ``batch_timeout`` seconds instead of sharing
+        the request's deadline.
+        """
+        with renewed_deadline(batch_timeout):
+            end = int(await self.redis_adapter.get("product_id_counter") or 0)
+        batches = (range(start, min(start + batch_size, end)) for start in range(0, end, batch_size))
+
+        def fetch(pids: range) -> asyncio.Task:
+            with renewed_deadline(batch_timeout):
+                # The task keeps the deadline set here
+                return asyncio.create_task(self._json_items(pids))
+
+        pending = None
+        try:
+            pids = next(batches, None)
+            pending = fetch(pids) if pids is not None else None
+            while pending is not None:
+                items = await pending
+                pids = next(batches, None)
+                pending = fetch(pids) if pids is not None else None
+                lines = [item for item in items if item is not None]
+                if lines:
+                    yield ("\n".join(lines) + "\n").encode()
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def _json_items(self, pids: Sequence[int]) -> list[Optional[str]]:
+        """
+        JSON of each product in ``pids`` (None where there is none): the
+        stored copies, or encoded from the records without ``json_copy``.
+        Products written before their JSON copy existed are encoded once and
+        backfilled.
+        """
+        if not self.json_copy:
+            return [self.serialize(product) if product is not None else None
+                    for product in await self._products(pids)]
+        items = await self.redis_adapter.mget([self.json_key(pid) for pid in pids])
+        missing = [i for i, item in enumerate(items) if item is None]
+        if missing:
+            backfill = {}
+            for i, product in zip(missing, await self._products([pids[i] for i in missing])):
+                if product is not None:
+                    items[i] = self.serialize(product)
+                    backfill[self.json_key(pids[i])] = items[i]
+            if backfill:
+                await self.redis_adapter.mset(backfill)
+        return items
+
+    async def _products(self, pids: Sequence[int]) -> list[Optional[Product]]:
+        """
+        Each product in ``pids`` (None where there is none), decoded from
+        its record in one MGET.
+        """
+        records = await self.redis_adapter.mget_bytes([self.record_key(pid) for pid in pids])
+        products = [Product(id=pid, **decode_product(record)) if record is not None else None
+                    for pid, record in zip(pids, records)]
+        # MGET answers nil for a hash as for a missing key
+        missing = [i for i, product in enumerate(products) if product is None]
+        if missing:
+            await self._convert_hashes(pids, missing, products)
         return products
 
+    async def _convert_hashes(self, pids: Sequence[int], missing: list[int], products: list[Optional[Product]]) -> None:
+        """
+        Fill in ``products[i]`` for each ``i`` in ``missing`` still stored as
+        a hash, from before records, and replace those hashes with records.
+        """
+        keys = [self.record_key(pids[i]) for i in missing]
+        async with self.redis_adapter.pipeline() as pipe:
+            for key in keys:
+                pipe.hgetall(key)
+            # A hash another request converted since the MGET answers WRONGTYPE
+            rows = await pipe.execute(raise_on_error=False)
+        converted = []
+        for i, key, row in zip(missing, keys, rows):
+            if isinstance(row, Exception):
+                record = await self.redis_adapter.get_bytes(key)
+                if record is not None:
+                    products[i] = Product(id=pids[i], **decode_product(record))
+            elif row:
+                products[i] = self._to_product(pids[i], row)
+                converted.append((key, products[i]))
+        if converted:
+            async with self.redis_adapter.pipeline() as pipe:
+                for key, product in converted:
+                    await self._convert_hash(keys=[key], args=[encode_product(product.model_dump())], client=pipe)
+                await pipe.execute()
+
+    async def query_products_json(self, query: ProductQuery, cursor: Optional[str] = None) -> bytes:
+        """
+        One page of the products matching ``query``, as a JSON body with the
+        total match count. The indexes yield just the page's ids, which are
+        then fetched in a single MGET. Raises ValueError for a bad cursor.
+        """
+        with QUERY_SECONDS.time():
+            offset = decode_cursor(cursor) if cursor else 0
+            total, pids = await self.index.query(query, offset=offset)
+            items = await self._json_items(pids) if pids else []
+            next_cursor = encode_cursor(offset + query.limit) if offset + query.limit < total else None
+            return self.assemble_page([item for item in items if item is not None], next_cursor, total=total)
+
+    async def search_products_json(self, text: str, limit: int = 10) -> bytes:
+        """
+        The best ``limit`` products for the free-text query ``text``, as a JSON
+        body of ``{"score", "product"}`` results, best first.
+        """
+        with SEARCH_SECONDS.time():
+            if self.search_index is None:
+                raise RuntimeError("Search is not configured")
+            hits = await self.search_index.search(text, limit=limit)
+            items = await self._json_items([pid for pid, _ in hits]) if hits else []
+            results = [b'{"score":' + dumps(round(score, 4)) + b',"product":' + item.encode() + b"}"
+                       for (_, score), item in zip(hits, items) if item is not None]
+            return b'{"results":[' + b",".join(results) + b"]}"
+
+    async def suggest_terms(self, prefix: str, limit: int = 10) -> list[str]:
+        if self.search_index is None:
+            raise RuntimeError("Search is not configured")
+        return await self.search_index.suggest(prefix, limit=limit)
+
+    @staticmethod
+    def assemble_page(items: list[str], next_cursor: Optional[str], total: Optional[int] = None) -> bytes:
+        """
+        Build the ``ProductPage`` JSON body from already serialized products,
+        plus ``total`` when given.
+        """
+        body = b'{"products":[' + ",".join(items).encode() + b'],"next_cursor":' + dumps(next_cursor)
+        if total is not None:
+            body += b',"total":' + dumps(total)
+        return body + b"}"
+
+    @staticmethod
+    def record_key(pid: int) -> str:
+        return f"product:{pid}"
+
+    @staticmethod
+    def json_key(pid: int) -> str:
+        return f"product:{pid}:json"
+
+    @staticmethod
+    def serialize(product: Product) -> str:
+        # Pydantic's compiled serializer; matches what FastAPI emits for the model
+        return product.model_dump_json()
+
+    @staticmethod
+    def _to_product(pid: int, product_data: dict) -> Product:
+        # A legacy hash: every field as a string, the name possibly under its old key
+        product_data["id"] = pid
+        if 'product_name' in product_data:
+            product_data['name'] = product_data.pop('product_name')
+        return Product(**product_data)
+
+    async def _save(self, pid: int, product_data: dict) -> Product:
+        """
+        Validate ``product_data`` and store it as a record, its pre-serialized
+        JSON and its index (and search index) entries in one transaction, so
+        readers of a single Redis never see them disagree. Under REDIS_NODES the
+        record, the JSON copy and the ``{product}`` index keys can sit on
+        different nodes, and each node's share is atomic only on that node.
+        """
+        product = Product.model_validate({**product_data, "id": pid})
+        fields = product.model_dump(mode="json")
+        previous, = await self._stored_fields([pid])
+        async with self.redis_adapter.pipeline(transaction=True) as pipe:
+            pipe.set(self.record_key(pid), encode_product(fields))
+            self._store_json(pipe, pid, self.serialize(product))
+            self._index(pipe, pid, fields, previous)
+            await pipe.execute()
+        return product
+
     async def create_product(self, product: Product) -> None:
-        product_id = self.redis_adapter.incr("product_id_counter")
+        # The counter holds the number of ids handed out, so ids stay dense from 0
+        product_id = await self.redis_adapter.incr("product_id_counter") - 1
         product.id = product_id
-        self.redis_adapter.hmset(f"product:{product_id}", product.model_dump())
-
-    def generate_fake_product(self) -> dict:
-        """
-        Generate a fake product with random attributes.
-        """
-        categories = ["Smartphone", "Laptop", "Tablet", "Smartwatch", "Camera", "Speaker", "Headphones", "Monitor", "Printer"]
-        colors = ["Black", "White", "Silver", "Gold", "Blue", "Red"]
-        materials = ["Plastic", "Metal", "Glass", "Aluminum", "Carbon Fiber"]
-
-        return {
-            "name": f"{fake.company()} {fake.word()}",  # Correct key
-            "brand": fake.company(),
-            "category": fake.random_element(categories),
-            "price": round(fake.random_number(digits=3, fix_len=False) + fake.random_number(digits=2) / 100, 2),
-            "stock": fake.random_int(min=0, max=500),
-            "sku": fake.uuid4(),
-            "release_date": str(fake.date_this_decade()),
-            "description": fake.sentence(nb_words=10),
-            "features": ', '.join(fake.sentences(nb=3)),
-            "warranty": f"{fake.random_int(min=1, max=3)} years",
-            "rating": round(fake.random_number(digits=1, fix_len=False) / 2 + 2.5, 1),
-            "dimensions": f"{fake.random_int(min=5, max=50)}x{fake.random_int(min=5, max=50)}x{fake.random_int(min=1, max=10)} cm",
-            "weight": f"{fake.random_int(min=100, max=5000)} grams",
-            "color": fake.random_element(colors),
-            "material": fake.random_element(materials),
-        }
-
-    async def seed_fake_products(self, num_products: int = 1000) -> None:
-        """
-        Seed the database with fake products.
-        This function resets the product_id_counter and overwrites existing data.
-        """
-        self.redis_adapter.set("product_id_counter", 0)
-
-        for i in range(num_products):
-            product_data = self.generate_fake_product()
-            self.redis_adapter.hmset(f"product:{i}", product_data)
-        
-        print(f"{num_products} fake products seeded into Redis")
\ No newline at end of file
+        await self._save(product_id, product.model_dump())
+
+    async def seed_products(self, count: int, seed: int = 0, chunk_size: int = 5000, processes: int = 0,
+                            progress: Optional[Callable[[int], None]] = None) -> None:
+        """
+        Write products 0..count-1, generated deterministically from ``seed``.
+
+        The id counter is raised to ``count`` first, so products created while
+        seeding get ids after the seeded range instead of overwriting it. Each
+        chunk is written in one pipelined round trip. With ``processes`` the
+        chunks are generated in a process pool, a few chunks ahead of the
+        writer. ``progress`` is called with the number of products written.
+        """
+        await self.redis_adapter.register_script(RESERVE_IDS_SCRIPT)(keys=["product_id_counter"], args=[count])
+        chunks = deque((start, min(chunk_size, count - start)) for start in range(0, count, chunk_size))
+        written = 0
+
+        if not processes:
+            for start, size in chunks:
+                written += await self._write_rows(generate_product_rows(seed, start, size))
+                if progress is not None:
+                    progress(written)
+            return
+
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(processes) as executor:
+            pending = deque()
+            while chunks or pending:
+                while chunks and len(pending) < processes * 2:
+                    start, size = chunks.popleft()
+                    pending.append(loop.run_in_executor(executor, generate_product_rows, seed, start, size))
+                written += await self._write_rows(await pending.popleft())
+                if progress is not None:
+                    progress(written)
+
+    async def _write_rows(self, rows: list[tuple[int, dict, str, bytes]]) -> int:
+        previous = await self._stored_fields([pid for pid, _, _, _ in rows])
+        async with self.redis_adapter.pipeline() as pipe:
+            for (pid, fields, product_json, record), stored in zip(rows, previous):
+                pipe.set(self.record_key(pid), record)
+                self._store_json(pipe, pid, product_json)
+                self._index(pipe, pid, fields, stored)
+            await pipe.execute()
+        return len(rows)
+
+    async def _stored_fields(self, pids: Sequence[int]) -> list[Optional[dict]]:
+        # A product still stored as a legacy hash reads as missing, like in _products
+        return [decode_product(record) if record is not None else None
+                for record in await self.redis_adapter.mget_bytes([self.record_key(pid) for pid in pids])]
+
+    def _index(self, pipe: Pipeline, pid: int, fields: dict, previous: Optional[dict]) -> None:
+        """
+        Queue the index entries of product ``pid``, first dropping those of
+        the ``previous`` fields it overwrites (a seed over existing ids), so
+        it is no longer found under its old category or terms.
+        """
+        if previous is not None:
+            self.index.remove(pipe, pid, previous)
+            if self.search_index is not None:
+                self.search_index.remove(pipe, pid, previous)
+        self.index.add(pipe, pid, fields)
+        if self.search_index is not None:
+            self.search_index.add(pipe, pid, fields)
+
+    def _store_json(self, pipe: Pipeline, pid: int, product_json: str) -> None:
+        if self.json_copy:
+            pipe.set(self.json_key(pid), product_json)
+        else:
+            # A copy left from before would be stale once the copies are turned back on
+            pipe.delete(self.json_key(pid))
@@ -0,0 +1,294 @@
+"""
+Reverse proxy to upstream server pools, selected by path prefix.
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+from fastapi import Request, Response
+from starlette.responses import StreamingResponse
+
+from app.models.upstream import UpstreamPoolConfig
+from app.services.load_balancer import BALANCERS, UpstreamServer
+from app.utils.logger import logger
+from app.utils.metrics import metrics
+from app.utils.resilience import RetryBudget, time_remaining
+
+
+# Headers that describe one connection, not the message (RFC 9110 section 7.6.1), plus
+# Host, which httpx sets for the upstream
+HOP_BY_HOP_HEADERS = frozenset({
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization", b"proxy-connection",
+    b"te", b"trailer", b"transfer-encoding", b"upgrade", b"host",
+})
+
+# Methods safe to send twice (RFC 9110 section 9.2.2) that carry no body in practice
+HEDGEABLE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Tells the upstream how long the gateway will still wait, so it can stop early
+DEADLINE_HEADER = b"x-request-timeout-ms"
+
+UPSTREAM_SECONDS = metrics.histogram("gateway_upstream_seconds", "Time until an upstream pool's response headers "
+                                     "arrived, retries and hedges included", ("pool",))
+
+class UpstreamPool:
+    """
+    The servers behind one route prefix, their balancer and one pooled
+    keep-alive HTTP client shared by every request to them.
+    """
+
+    def __init__(self, prefix: str, config: UpstreamPoolConfig,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.prefix = prefix.rstrip("/")
+        self.config = config
+        self.servers = [UpstreamServer(url, decay=config.ewma_decay, slow_start=config.slow_start,
+                                       max_failures=config.max_failures, eject_seconds=config.eject_seconds)
+                        for url in config.servers]
+        self.balancer = BALANCERS[config.strategy]()
+        self.retry_budget = RetryBudget(config.retry_budget)
+        self.latency = UPSTREAM_SECONDS.labels(self.prefix or "/")
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            limits=httpx.Limits(max_connections=config.max_connections,
+                                max_keepalive_connections=config.max_keepalive),
+            transport=transport,
+            trust_env=False,
+        )
+
+    def matches(self, path: str) -> bool:
+        return path == self.prefix or path.startswith(self.prefix + "/")
+
+    def upstream_path(self, path: str) -> str:
+        if not self.config.strip_prefix:
+            return path
+        return path[len(self.prefix):] or "/"
+
+    def choose(self, exclude: Optional[UpstreamServer] = None) -> UpstreamServer:
+        """
+        Pick a server among the available ones (reserving the probe of a
+        half-open server). When every server is ejected or unhealthy, all of
+        them are considered rather than failing outright.
+        """
+        now = time.monotonic()
+        candidates = [server for server in self.servers if server is not exclude and server.available(now)]
+        if not candidates:
+            candidates = [server for server in self.servers if server is not exclude] or self.servers
+            return self.balancer.choose(candidates, now)
+        server = self.balancer.choose(candidates, now)
+        server.breaker.before_call()
+        return server
+
+    async def check_health(self) -> None:
+        """
+        Probe every server's ``health_path`` once; any 2xx counts as healthy.
+        """
+        async def probe(server: UpstreamServer) -> None:
+            try:
+                response = await self.client.get(server.url + self.config.health_path,
+                                                 timeout=self.config.health_timeout)
+                healthy = response.is_success
+            except httpx.HTTPError:
+                healthy = False
+            server.set_healthy(healthy, time.monotonic())
+
+        await asyncio.gather(*(probe(server) for server in self.servers))
+
+    async def run_health_checks(self) -> None:
+        while True:
+            try:
+                await self.check_health()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Health check of {self.prefix or '/'} upstreams failed: {e}")
+            await asyncio.sleep(self.config.health_interval)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+class ProxyService:
+    """
+    Forwards requests to the pool with the longest matching prefix.
+
+    Request and response bodies are streamed in both directions, never
+    buffered. Each server's in-flight count and response-time EWMA feed the
+    balancer; transport errors and 5xx responses trip the server's circuit
+    breaker, and pools with a ``health_path`` are also probed actively.
+
+    Within the pool's retry budget, a request that failed to connect (so
+    nothing was sent) is retried once on another server when it has no body
+    to replay, and idempotent requests can be hedged. Upstream timeouts are
+    capped by the request's deadline, which is forwarded as
+    ``X-Request-Timeout-Ms``.
+    """
+
+    def __init__(self, routes: dict[str, UpstreamPoolConfig],
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        pools = [UpstreamPool(prefix, config, transport=transport) for prefix, config in routes.items()]
+        self.pools = sorted(pools, key=lambda pool: len(pool.prefix), reverse=True)
+        self._health_checks: list[asyncio.Task] = []
+
+    def match(self, path: str) -> Optional[UpstreamPool]:
+        for pool in self.pools:
+            if pool.matches(path):
+                return pool
+        return None
+
+    async def forward(self, request: Request, pool: UpstreamPool) -> Response:
+        remaining = time_remaining()
+        if remaining is not None and remaining <= 0:
+            return Response(content="Upstream timed out", status_code=504)
+        url = pool.upstream_path(request.url.path)
+        if request.url.query:
+            url += "?" + request.url.query
+        has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+        headers = self._request_headers(request)
+        timeout = pool.client.timeout
+        if remaining is not None:
+            # Never wait on the upstream past the request's deadline, and tell it so
+            timeout = httpx.Timeout(min(pool.config.timeout, remaining),
+                                    connect=min(pool.config.connect_timeout, remaining))
+            headers.append((DEADLINE_HEADER, str(int(remaining * 1000)).encode()))
+
+        def build(server: UpstreamServer) -> httpx.Request:
+            return pool.client.build_request(request.method, server.url + url, headers=headers, timeout=timeout,
+                                             content=request.stream() if has_body else None)
+
+        pool.retry_budget.deposit()
+        try:
+            with pool.latency.time():
+                server, upstream = await self._exchange(pool, build, replayable=not has_body,
+                                                        hedge=not has_body and request.method in HEDGEABLE_METHODS)
+        except httpx.TimeoutException:
+            return Response(content="Upstream timed out", status_code=504)
+        except httpx.HTTPError as e:
+            logger.warning(f"Proxying {request.url.path} failed: {e}")
+            return Response(content="Bad gateway", status_code=502)
+
+        response = StreamingResponse(self._relay(upstream, server), status_code=upstream.status_code)
+        response.raw_headers = [(name.lower(), value) for name, value in upstream.headers.raw
+                                if name.lower() not in HOP_BY_HOP_HEADERS]
+        return response
+
+    async def _exchange(self, pool: UpstreamPool, build, replayable: bool,
+                        hedge: bool) -> tuple[UpstreamServer, httpx.Response]:
+        server = pool.choose()
+        try:
+            if hedge and pool.config.hedge_delay_ms is not None:
+                return await self._hedged(pool, server, build)
+            return server, await self._send(pool.client, server, build(server))
+        except httpx.ConnectError as e:
+            # Nothing reached the server, so a request without a body can go elsewhere
+            if not replayable or not pool.retry_budget.try_withdraw():
+                raise
+            logger.warning(f"Could not connect to upstream {server.url}, retrying on another server: {e}")
+            server = pool.choose(exclude=server)
+            return server, await self._send(pool.client, server, build(server))
+
+    async def _hedged(self, pool: UpstreamPool, server: UpstreamServer,
+                      build) -> tuple[UpstreamServer, httpx.Response]:
+        attempts = {asyncio.ensure_future(self._send(pool.client, server, build(server))): server}
+        winner = None
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=pool.config.hedge_delay_ms / 1000)
+            if not done and pool.retry_budget.try_withdraw():
+                backup = pool.choose(exclude=server)
+                if backup is not server:
+                    attempts[asyncio.ensure_future(self._send(pool.client, backup, build(backup)))] = backup
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        winner = attempt
+                        return attempts[attempt], attempt.result()
+            # Every attempt failed: report the first one's error
+            return server, next(iter(attempts)).result()
+        finally:
+            for attempt, attempt_server in attempts.items():
+                if attempt is winner:
+                    continue
+                if not attempt.done():
+                    attempt.cancel()
+                elif not attempt.cancelled() and attempt.exception() is None:
+                    # Answered too late: drop the losing response
+                    attempt_server.outstanding -= 1
+                    await attempt.result().aclose()
+
+    @staticmethod
+    async def _send(client: httpx.AsyncClient, server: UpstreamServer, upstream_request: httpx.Request) -> httpx.Response:
+        """
+        Send the request headers (and body) and wait for the response headers.
+        On success the server's in-flight count stays raised until the body
+        has been relayed.
+        """
+        server.outstanding += 1
+        started = time.monotonic()
+        try:
+            upstream = await client.send(upstream_request, stream=True)
+        except httpx.HTTPError as e:
+            server.outstanding -= 1
+            remaining = time_remaining()
+            if isinstance(e, httpx.TimeoutException) and remaining is not None and remaining <= 0:
+                # Cut short by the request's deadline, not the pool's timeouts
+                server.breaker.release()
+            else:
+                server.record_failure()
+            raise
+        except asyncio.CancelledError:
+            server.outstanding -= 1
+            server.breaker.release()
+            raise
+        now = time.monotonic()
+        server.observe(now - started, now)
+        if upstream.status_code >= 500:
+            server.record_failure()
+        else:
+            server.record_success(now)
+        return upstream
+
+    @staticmethod
+    def _request_headers(request: Request) -> list[tuple[bytes, bytes]]:
+        # The client's deadline header is already part of the request's deadline, which forward sends instead
+        headers = [(name, value) for name, value in request.headers.raw
+                   if name not in HOP_BY_HOP_HEADERS and name not in (b"x-forwarded-for", DEADLINE_HEADER)]
+        client = request.client.host if request.client else ""
+        forwarded_for = request.headers.get("x-forwarded-for")
+        headers.append((b"x-forwarded-for", (f"{forwarded_for}, {client}" if forwarded_for else client).encode()))
+        headers.append((b"x-forwarded-proto", request.url.scheme.encode()))
+        if "host" in request.headers:
+            headers.append((b"x-forwarded-host", request.headers["host"].encode()))
+        return headers
+
+    @staticmethod
+    async def _relay(upstream: httpx.Response, server: UpstreamServer) -> AsyncIterator[bytes]:
+        # Runs until the body is fully sent, the upstream fails or the client goes away
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        except httpx.HTTPError as e:
+            server.record_failure()
+            logger.warning(f"Upstream {server.url} failed mid-response: {e}")
+            raise
+        finally:
+            server.outstanding -= 1
+            await upstream.aclose()
+
+    async def start(self) -> None:
+        for pool in self.pools:
+            if pool.config.health_path is not None:
+                self._health_checks.append(asyncio.create_task(pool.run_health_checks()))
+
+    async def close(self) -> None:
+        for task in self._health_checks:
+            task.cancel()
+        for task in self._health_checks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._health_checks = []
+        for pool in self.pools:
+            await pool.close()
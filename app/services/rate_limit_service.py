@@ -1,24 +1,239 @@
 """
 Rate limiting service for controlling request frequency.
+
+Every algorithm is a single Lua script, so a check costs exactly one atomic
+round trip and never leaves a counter without a TTL. Time is read from the
+Redis server clock so workers with skewed clocks still agree.
 """
 
 from abc import ABC, abstractmethod
+from typing import Optional
 
 from app.adapters.redis_adapter import RedisAdapter
+from app.models.rate_limit import RateLimitResult, RateLimitRule
+
+
+# Every script replies {allowed, remaining, reset_after_ms, retry_after_ms}
+_NOW_MS = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+"""
+
+FIXED_WINDOW_SCRIPT = _NOW_MS + """
+local limit, period = tonumber(ARGV[1]), tonumber(ARGV[2])
+local count = redis.call('INCR', KEYS[1])
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl < 0 then
+    redis.call('PEXPIRE', KEYS[1], period)
+    ttl = period
+end
+if count <= limit then
+    return {1, limit - count, ttl, 0}
+end
+return {0, 0, ttl, ttl}
+"""
+
+SLIDING_WINDOW_SCRIPT = _NOW_MS + """
+local limit, period = tonumber(ARGV[1]), tonumber(ARGV[2])
+local window = math.floor(now / period)
+local state = redis.call('HMGET', KEYS[1], 'window', 'current', 'previous')
+local current, previous = tonumber(state[2]) or 0, tonumber(state[3]) or 0
+local stored = tonumber(state[1])
+if stored ~= window then
+    previous = (stored == window - 1) and current or 0
+    current = 0
+end
+local elapsed = now - window * period
+local estimate = previous * (period - elapsed) / period + current
+if estimate + 1 > limit then
+    -- Time until the weighted previous window has decayed enough for one more request
+    local retry
+    if current + 1 <= limit then
+        retry = period - elapsed - (limit - current - 1) * period / previous
+    else
+        retry = period - elapsed + period * (1 - (limit - 1) / current)
+    end
+    return {0, 0, 2 * period - elapsed, math.max(1, math.ceil(retry))}
+end
+current = current + 1
+redis.call('HSET', KEYS[1], 'window', window, 'current', current, 'previous', previous)
+redis.call('PEXPIRE', KEYS[1], 2 * period)
+return {1, math.floor(limit - estimate - 1), 2 * period - elapsed, 0}
+"""
+
+SLIDING_LOG_SCRIPT = _NOW_MS + """
+local limit, period = tonumber(ARGV[1]), tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - period)
+local count = redis.call('ZCARD', KEYS[1])
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, now .. ':' .. count)
+    redis.call('PEXPIRE', KEYS[1], period)
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return {1, limit - count - 1, tonumber(oldest[2]) + period - now, 0}
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local retry = math.max(1, tonumber(oldest[2]) + period - now)
+return {0, 0, period, retry}
+"""
+
+TOKEN_BUCKET_SCRIPT = _NOW_MS + """
+local capacity, limit, period = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local rate = limit / period
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local allowed, retry = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = math.ceil((1 - tokens) / rate)
+end
+local reset = math.ceil((capacity - tokens) / rate)
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.max(reset, 1))
+return {allowed, math.floor(tokens), reset, retry}
+"""
+
+GCRA_SCRIPT = _NOW_MS + """
+local capacity, limit, period = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local interval = period / limit
+local tat = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now)
+local new_tat = tat + interval
+local allow_at = new_tat - capacity * interval
+if now < allow_at then
+    return {0, 0, math.ceil(tat - now), math.ceil(allow_at - now)}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, math.floor((now - allow_at) / interval), math.ceil(new_tat - now), 0}
+"""
 
 
 class RateLimiter(ABC):
     @abstractmethod
-    async def check_rate_limit(self, client_id: str) -> bool:
+    async def check_rate_limit(self, client_id: str, rule: Optional[RateLimitRule] = None) -> RateLimitResult:
         pass
 
+class ScriptedRateLimiter(RateLimiter):
+    """
+    Base class for algorithms implemented as one Lua script per check.
+    """
+    algorithm: str = None
+    script_source: str = None
+
+    def __init__(self, redis_adapter: RedisAdapter, default_rule: Optional[RateLimitRule] = None):
+        self.redis_adapter = redis_adapter
+        self.default_rule = default_rule or RateLimitRule(algorithm=self.algorithm)
+        self.script = redis_adapter.register_script(self.script_source)
+
+    def key(self, client_id: str, rule: RateLimitRule) -> str:
+        # The client id is the hash tag: all of a client's counters live on one Redis node
+        return f"rate_limit:{self.algorithm}:{rule.scope}:{{{client_id}}}"
+
+    def args(self, rule: RateLimitRule) -> list:
+        return [rule.limit, rule.period_ms]
+
+    @staticmethod
+    def parse(reply: list, rule: RateLimitRule) -> RateLimitResult:
+        allowed, remaining, reset_after_ms, retry_after_ms = reply
+        return RateLimitResult(
+            allowed=bool(allowed),
+            limit=rule.limit,
+            remaining=remaining,
+            reset_after=reset_after_ms / 1000,
+            retry_after=retry_after_ms / 1000,
+        )
+
+    async def check_rate_limit(self, client_id: str, rule: Optional[RateLimitRule] = None) -> RateLimitResult:
+        rule = rule or self.default_rule
+        reply = await self.script(keys=[self.key(client_id, rule)], args=self.args(rule))
+        return self.parse(reply, rule)
+
+class FixedWindowRateLimiter(ScriptedRateLimiter):
+    algorithm = "fixed_window"
+    script_source = FIXED_WINDOW_SCRIPT
+
+class SlidingWindowRateLimiter(ScriptedRateLimiter):
+    """
+    Sliding-window counter: weights the previous window's count by how much of
+    it still overlaps the sliding period, which smooths fixed-window edge bursts.
+    """
+    algorithm = "sliding_window"
+    script_source = SLIDING_WINDOW_SCRIPT
+
+class SlidingLogRateLimiter(ScriptedRateLimiter):
+    """
+    Exact sliding window backed by a sorted set of request timestamps.
+    Memory grows with the limit, so prefer it for small limits.
+    """
+    algorithm = "sliding_log"
+    script_source = SLIDING_LOG_SCRIPT
+
+class TokenBucketRateLimiter(ScriptedRateLimiter):
+    algorithm = "token_bucket"
+    script_source = TOKEN_BUCKET_SCRIPT
+
+    def args(self, rule: RateLimitRule) -> list:
+        return [rule.capacity, rule.limit, rule.period_ms]
+
+class GCRARateLimiter(ScriptedRateLimiter):
+    """
+    Generic cell rate algorithm: stores a single theoretical arrival time per client.
+    """
+    algorithm = "gcra"
+    script_source = GCRA_SCRIPT
+
+    def args(self, rule: RateLimitRule) -> list:
+        return [rule.capacity, rule.limit, rule.period_ms]
+
 class RedisRateLimiter(RateLimiter):
-    def __init__(self, redis_adapter: RedisAdapter):
+    """
+    Dispatches each check to the algorithm named by its rule.
+    """
+    ALGORITHMS = {
+        limiter.algorithm: limiter
+        for limiter in (FixedWindowRateLimiter, SlidingWindowRateLimiter, SlidingLogRateLimiter,
+                        TokenBucketRateLimiter, GCRARateLimiter)
+    }
+
+    def __init__(self, redis_adapter: RedisAdapter, default_rule: Optional[RateLimitRule] = None):
         self.redis_adapter = redis_adapter
+        self.default_rule = default_rule or RateLimitRule()
+        self.limiters = {name: cls(redis_adapter) for name, cls in self.ALGORITHMS.items()}
+
+    def limiter_for(self, rule: RateLimitRule) -> ScriptedRateLimiter:
+        return self.limiters[rule.algorithm]
+
+    async def check_rate_limit(self, client_id: str, rule: Optional[RateLimitRule] = None) -> RateLimitResult:
+        rule = rule or self.default_rule
+        return await self.limiter_for(rule).check_rate_limit(client_id, rule)
+
+class RateLimitPolicy:
+    """
+    Resolves the rule for a route and client tier from ``RATE_LIMIT_RULES``.
+
+    Lookup order: ``rules[route][tier]``, ``rules[route]["default"]``,
+    ``rules["*"][tier]``, ``rules["*"]["default"]``, then the default rule.
+    Route-specific rules count per route; ``"*"`` rules share one quota.
+    """
+
+    def __init__(self, default_rule: RateLimitRule, rules: dict[str, dict[str, RateLimitRule]] = None):
+        self.default_rule = default_rule
+        self.rules = rules or {}
+        self._resolved: dict[tuple[str, str], RateLimitRule] = {}
+
+    def resolve(self, route: str = "*", tier: str = "default") -> RateLimitRule:
+        resolved = self._resolved.get((route, tier))
+        if resolved is None:
+            resolved = self._lookup(route, tier)
+            self._resolved[(route, tier)] = resolved
+        return resolved
 
-    async def check_rate_limit(self, client_id: str) -> bool:
-        key = f"rate_limit:{client_id}"
-        count = self.redis_adapter.incr(key)
-        if count == 1:
-            self.redis_adapter.expire(key, 60)  # 1 minute window
-        return count <= 3  # 3 requests per minute
\ No newline at end of file
+    def _lookup(self, route: str, tier: str) -> RateLimitRule:
+        for scope in (route, "*"):
+            tiers = self.rules.get(scope, {})
+            rule = tiers.get(tier) or tiers.get("default")
+            if rule is not None:
+                return rule.model_copy(update={"scope": scope})
+        return self.default_rule
@@ -0,0 +1,435 @@
+"""
+Full-text product search: inverted indexes ranked with BM25, plus prefix autocomplete.
+"""
+
+import asyncio
+import bisect
+import heapq
+import json
+import math
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import defaultdict
+from itertools import chain
+from operator import itemgetter
+from typing import Optional
+
+from redis.asyncio.client import Pipeline
+
+from app.adapters.redis_adapter import RedisAdapter
+from app.utils.logger import logger
+from app.utils.product_codec import decode_product
+from app.utils.text import TOKEN_PATTERN, tokenize, weighted_terms
+
+
+K1 = 1.2
+B = 0.75
+# Expected weighted length of a product; fixed so stored weights never need rescoring
+AVERAGE_LENGTH = 40.0
+
+def term_weight(tf: int, length: int, average_length: float = AVERAGE_LENGTH) -> float:
+    """
+    BM25 term-frequency part, stored in the postings. The IDF factor depends
+    on the whole collection and is applied at query time.
+    """
+    return tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average_length))
+
+def idf(docs: int, df: int) -> float:
+    return math.log(1 + (docs - df + 0.5) / (df + 0.5))
+
+def normalize_prefix(prefix: str) -> str:
+    return "".join(TOKEN_PATTERN.findall(prefix.lower()))
+
+class SearchIndex(ABC):
+    @abstractmethod
+    def add(self, pipe: Pipeline, pid: int, fields: dict) -> None:
+        """
+        Index product ``pid``. Redis-backed indexes queue their writes on
+        ``pipe`` so they commit with the product itself.
+        """
+
+    @abstractmethod
+    def remove(self, pipe: Pipeline, pid: int, fields: dict) -> None:
+        """
+        Drop product ``pid`` from the postings of its previous ``fields``,
+        before it is indexed again with new ones.
+        """
+
+    @abstractmethod
+    async def search(self, text: str, limit: int = 10) -> list[tuple[int, float]]:
+        """
+        Ids and scores of the best ``limit`` matches, best first.
+        """
+
+    @abstractmethod
+    async def suggest(self, prefix: str, limit: int = 10) -> list[str]:
+        """
+        Indexed terms starting with ``prefix``, most frequent first.
+        """
+
+    async def start(self) -> None:
+        """
+        Start background work (no-op unless a subclass needs it).
+        """
+
+    async def close(self) -> None:
+        """
+        Stop background work started by ``start``.
+        """
+
+    async def warm_up(self) -> None:
+        """
+        Wait until the index can answer queries (immediately unless a subclass builds it first).
+        """
+
+class Postings:
+    """
+    One term's postings in impact order (highest weight first), as parallel
+    arrays of 4-byte ids and weights. New postings land in an unsorted tail
+    that is merged in lazily, once it outgrows ``1 / merge_ratio`` of the
+    sorted part, so indexing stays O(1) per posting.
+    """
+
+    __slots__ = ("ids", "weights", "tail_ids", "tail_weights")
+
+    merge_ratio = 16
+    merge_min = 1024
+
+    def __init__(self):
+        self.ids, self.weights = array("I"), array("f")
+        self.tail_ids, self.tail_weights = array("I"), array("f")
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.tail_ids)
+
+    def append(self, pid: int, weight: float) -> None:
+        self.tail_ids.append(pid)
+        self.tail_weights.append(weight)
+
+    def top(self, n: int) -> list[tuple[float, int]]:
+        """
+        The ``n`` highest ``(weight, id)`` postings, best first.
+        """
+        if len(self.tail_ids) > max(self.merge_min, len(self.ids) // self.merge_ratio):
+            self._merge()
+        best = list(zip(self.weights[:n], self.ids[:n]))
+        if self.tail_ids:
+            best = heapq.nlargest(n, chain(best, zip(self.tail_weights, self.tail_ids)))
+        return best
+
+    def remove(self, pid: int) -> None:
+        # Linear in the postings, but only products overwritten in this process get here
+        for ids, weights in ((self.ids, self.weights), (self.tail_ids, self.tail_weights)):
+            if pid in ids:
+                i = ids.index(pid)
+                del ids[i], weights[i]
+                return
+
+    def _merge(self) -> None:
+        # Both parts are runs Timsort merges in linear time once the tail is sorted
+        tail = sorted(zip(self.tail_weights, self.tail_ids), reverse=True)
+        merged = sorted(chain(zip(self.weights, self.ids), tail), key=itemgetter(0), reverse=True)
+        self.weights = array("f", map(itemgetter(0), merged))
+        self.ids = array("I", map(itemgetter(1), merged))
+        self.tail_ids, self.tail_weights = array("I"), array("f")
+
+class InMemorySearchIndex(SearchIndex):
+    """
+    Per-worker inverted index with compact impact-ordered ``Postings`` and a
+    sorted vocabulary for prefixes.
+
+    A one-term query reads just the head of its postings. Longer queries
+    score the union of each term's ``depth`` best postings (its champion
+    list), so their cost does not grow with the catalog; a product outside
+    a term's champion list gets no credit for that term.
+
+    Product ids are dense, so ``start`` catches up on products written by
+    the seed or by other workers by polling the id counter every
+    ``sync_interval`` seconds and indexing the new ids' stored records. Ids
+    are reserved before their products are written, so it stops at the first
+    id with nothing stored and resumes there; an id still missing after
+    ``gap_timeout`` seconds (a create_product whose write failed) is skipped.
+    Ids already synced are not read again, so a seed over existing products
+    reaches a worker's index only when the worker restarts.
+    """
+
+    def __init__(self, redis_adapter: Optional[RedisAdapter] = None, depth: int = 1000,
+                 sync_interval: float = 5.0, sync_chunk_size: int = 1000, gap_timeout: float = 60.0):
+        self.redis_adapter = redis_adapter
+        self.depth = depth
+        self.sync_interval = sync_interval
+        self.sync_chunk_size = sync_chunk_size
+        self.gap_timeout = gap_timeout
+        self._gap: Optional[tuple[int, float]] = None
+        self._postings: dict[str, Postings] = {}
+        self._terms: list[str] = []
+        self._new_terms: list[str] = []
+        self._indexed = bytearray()
+        self._synced = 0
+        self._sync_task: Optional[asyncio.Task] = None
+        self._caught_up = asyncio.Event()
+        self.docs = 0
+
+    def add(self, pipe: Optional[Pipeline], pid: int, fields: dict) -> None:
+        if pid < len(self._indexed) and self._indexed[pid]:
+            return
+        if pid >= len(self._indexed):
+            self._indexed.extend(bytes(max(pid + 1 - len(self._indexed), len(self._indexed))))
+        self._indexed[pid] = 1
+        terms, length = weighted_terms(fields)
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = Postings()
+                self._new_terms.append(term)
+            postings.append(pid, term_weight(tf, length))
+        self.docs += 1
+
+    def remove(self, pipe: Optional[Pipeline], pid: int, fields: dict) -> None:
+        if pid >= len(self._indexed) or not self._indexed[pid]:
+            return
+        self._indexed[pid] = 0
+        terms, _ = weighted_terms(fields)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.remove(pid)
+        self.docs -= 1
+
+    async def search(self, text: str, limit: int = 10) -> list[tuple[int, float]]:
+        matched = [self._postings[term] for term in set(tokenize(text)) if term in self._postings]
+        if len(matched) == 1:
+            postings = matched[0]
+            factor = idf(self.docs, len(postings))
+            return [(pid, weight * factor) for weight, pid in postings.top(limit)]
+        scores = defaultdict(float)
+        for postings in matched:
+            factor = idf(self.docs, len(postings))
+            for weight, pid in postings.top(max(limit, self.depth)):
+                scores[pid] += weight * factor
+        return heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+
+    async def suggest(self, prefix: str, limit: int = 10, max_candidates: int = 1000) -> list[str]:
+        prefix = normalize_prefix(prefix)
+        if not prefix:
+            return []
+        if self._new_terms:
+            self._terms = sorted(chain(self._terms, self._new_terms))
+            self._new_terms = []
+        start = bisect.bisect_left(self._terms, prefix)
+        end = bisect.bisect_left(self._terms, prefix + "\uffff", lo=start)
+        # Terms whose products were all overwritten keep empty postings
+        candidates = [term for term in self._terms[start:min(end, start + max_candidates)] if self._postings[term]]
+        return heapq.nlargest(limit, candidates, key=lambda term: len(self._postings[term]))
+
+    async def start(self) -> None:
+        if self.redis_adapter is not None and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync())
+
+    async def close(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+    async def warm_up(self) -> None:
+        if self._sync_task is not None:
+            await self._caught_up.wait()
+
+    async def _sync(self) -> None:
+        while True:
+            try:
+                count = int(await self.redis_adapter.get("product_id_counter") or 0)
+                while self._synced < count and await self._sync_chunk(min(self._synced + self.sync_chunk_size,
+                                                                          count)):
+                    # Let requests run between chunks of a large initial build
+                    await asyncio.sleep(0)
+                self._caught_up.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Search index sync failed, retrying: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    async def _sync_chunk(self, end: int) -> bool:
+        """
+        Index the stored products from ``_synced`` to ``end``; returns False
+        when it stopped early at an id reserved but not written yet.
+        """
+        pids = range(self._synced, end)
+        records = await self.redis_adapter.mget_bytes([f"product:{pid}" for pid in pids])
+        # Products still stored as a hash, from before records, have a JSON copy
+        legacy = [pid for pid, record in zip(pids, records) if record is None]
+        items = await self.redis_adapter.mget([f"product:{pid}:json" for pid in legacy]) if legacy else []
+        copies = {pid: item for pid, item in zip(legacy, items) if item is not None}
+        for pid, record in zip(pids, records):
+            if record is not None:
+                self.add(None, pid, decode_product(record))
+            elif pid in copies:
+                self.add(None, pid, json.loads(copies[pid]))
+            elif self._awaiting(pid):
+                return False
+            self._synced = pid + 1
+        return True
+
+    def _awaiting(self, pid: int) -> bool:
+        """
+        Whether to wait for missing ``pid`` rather than skip it.
+        """
+        now = time.monotonic()
+        if self._gap is None or self._gap[0] != pid:
+            self._gap = (pid, now)
+        if now - self._gap[1] < self.gap_timeout:
+            return True
+        logger.warning(f"Product {pid} was reserved but not written after {self.gap_timeout:g}s; not indexing it")
+        return False
+
+# Score the union of each term's ``depth`` best postings, weighted by IDF.
+# KEYS: document id index, term postings...  ARGV: limit, depth
+SEARCH_SCRIPT = """
+local docs = redis.call('ZCARD', KEYS[1])
+local limit, depth = tonumber(ARGV[1]), tonumber(ARGV[2])
+local scores, pids = {}, {}
+for i = 2, #KEYS do
+    local df = redis.call('ZCARD', KEYS[i])
+    if df > 0 then
+        local factor = math.log(1 + (docs - df + 0.5) / (df + 0.5))
+        local top = redis.call('ZREVRANGE', KEYS[i], 0, depth - 1, 'WITHSCORES')
+        for j = 1, #top, 2 do
+            local pid = top[j]
+            if scores[pid] == nil then
+                scores[pid] = 0
+                table.insert(pids, pid)
+            end
+            scores[pid] = scores[pid] + tonumber(top[j + 1]) * factor
+        end
+    end
+end
+table.sort(pids, function(a, b) return scores[a] > scores[b] end)
+local result = {}
+for i = 1, math.min(limit, #pids) do
+    table.insert(result, pids[i])
+    table.insert(result, tostring(scores[pids[i]]))
+end
+return result
+"""
+
+# Terms in a lexicographic range, most frequent first.
+# KEYS: vocabulary, document frequencies  ARGV: min, max, limit, candidates
+SUGGEST_SCRIPT = """
+local terms = redis.call('ZRANGEBYLEX', KEYS[1], ARGV[1], ARGV[2], 'LIMIT', 0, tonumber(ARGV[4]))
+if #terms == 0 then
+    return {}
+end
+local counts = redis.call('HMGET', KEYS[2], unpack(terms))
+local ranked = {}
+for i, term in ipairs(terms) do
+    table.insert(ranked, {term, tonumber(counts[i]) or 0})
+end
+table.sort(ranked, function(a, b) return a[2] > b[2] end)
+local result = {}
+for i = 1, math.min(tonumber(ARGV[3]), #ranked) do
+    table.insert(result, ranked[i][1])
+end
+return result
+"""
+
+# Post a document under each of its terms; a term's frequency grows only when the document is new to it.
+# KEYS: vocabulary, document frequencies, term postings...  ARGV: id, then each posting's term and weight
+ADD_SCRIPT = """
+local pid = ARGV[1]
+for i = 3, #KEYS do
+    local term = ARGV[2 * i - 4]
+    if redis.call('ZADD', KEYS[i], ARGV[2 * i - 3], pid) == 1 then
+        redis.call('HINCRBY', KEYS[2], term, 1)
+    end
+    redis.call('ZADD', KEYS[1], 0, term)
+end
+return 0
+"""
+
+# Undo ADD_SCRIPT for a document's previous terms, dropping terms no document uses any more.
+# KEYS: vocabulary, document frequencies, term postings...  ARGV: id, then each posting's term
+REMOVE_SCRIPT = """
+local pid = ARGV[1]
+for i = 3, #KEYS do
+    local term = ARGV[i - 1]
+    if redis.call('ZREM', KEYS[i], pid) == 1 and redis.call('HINCRBY', KEYS[2], term, -1) <= 0 then
+        redis.call('HDEL', KEYS[2], term)
+        redis.call('ZREM', KEYS[1], term)
+    end
+end
+return 0
+"""
+
+class RedisSearchIndex(SearchIndex):
+    """
+    Inverted index shared by all workers: one sorted set of ``id -> weight``
+    per term, which keeps postings in impact order for free. A script reads
+    the head of each query term's set and ranks them like
+    ``InMemorySearchIndex`` does, in one round trip. The vocabulary is a
+    sorted set searched with ``ZRANGEBYLEX`` and document frequencies live in
+    a hash for ranking suggestions, counted once per document however often
+    it is written. The collection size comes from ``docs_key`` (the product
+    id index).
+    """
+
+    # Same hash tag as the product indexes, whose id index the search script reads
+    prefix = "search:{product}"
+
+    def __init__(self, redis_adapter: RedisAdapter, depth: int = 1000, docs_key: str = "idx:{product}:id"):
+        self.redis_adapter = redis_adapter
+        self.depth = depth
+        self.docs_key = docs_key
+        self._search = redis_adapter.register_script(SEARCH_SCRIPT)
+        self._suggest = redis_adapter.register_script(SUGGEST_SCRIPT)
+        self._add = redis_adapter.register_script(ADD_SCRIPT)
+        self._remove = redis_adapter.register_script(REMOVE_SCRIPT)
+
+    def term_key(self, term: str) -> str:
+        return f"{self.prefix}:term:{term}"
+
+    @property
+    def vocabulary_key(self) -> str:
+        return f"{self.prefix}:terms"
+
+    @property
+    def frequency_key(self) -> str:
+        return f"{self.prefix}:df"
+
+    def add(self, pipe: Pipeline, pid: int, fields: dict) -> None:
+        terms, length = weighted_terms(fields)
+        if not terms:
+            return
+        args = [pid]
+        for term, tf in terms.items():
+            args += [term, term_weight(tf, length)]
+        self._add(keys=[self.vocabulary_key, self.frequency_key, *(self.term_key(term) for term in terms)],
+                  args=args, client=pipe)
+
+    def remove(self, pipe: Pipeline, pid: int, fields: dict) -> None:
+        terms, _ = weighted_terms(fields)
+        if not terms:
+            return
+        self._remove(keys=[self.vocabulary_key, self.frequency_key, *(self.term_key(term) for term in terms)],
+                     args=[pid, *terms], client=pipe)
+
+    async def search(self, text: str, limit: int = 10) -> list[tuple[int, float]]:
+        terms = sorted(set(tokenize(text)))
+        if not terms:
+            return []
+        depth = limit if len(terms) == 1 else max(limit, self.depth)
+        reply = await self._search(keys=[self.docs_key, *(self.term_key(term) for term in terms)], args=[limit, depth])
+        return [(int(reply[i]), float(reply[i + 1])) for i in range(0, len(reply), 2)]
+
+    async def suggest(self, prefix: str, limit: int = 10, max_candidates: int = 200) -> list[str]:
+        prefix = normalize_prefix(prefix)
+        if not prefix:
+            return []
+        # Terms are [a-z0-9], so every term with the prefix sorts before prefix + "\xff"
+        return await self._suggest(keys=[self.vocabulary_key, self.frequency_key],
+                                   args=[f"[{prefix}", f"[{prefix}\xff", limit, max_candidates])
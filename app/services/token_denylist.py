@@ -0,0 +1,93 @@
+"""
+Denylist of revoked access tokens, stored in Redis and mirrored in each worker.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from app.adapters.redis_adapter import RedisAdapter
+from app.utils.logger import logger
+
+
+class TokenDenylist:
+    """
+    Revoked token digests, kept until the token would have expired anyway.
+
+    The authoritative copy is a Redis sorted set scored by expiry. Every
+    worker keeps the full (small) set in memory so checks cost no round trip;
+    revocations are published on ``channel`` and the mirror is reloaded from
+    Redis whenever the subscription is (re)established.
+    """
+
+    def __init__(self, redis_adapter: RedisAdapter, key: str = "auth:denylist", channel: str = "auth:revoked"):
+        self.redis_adapter = redis_adapter
+        self.key = key
+        self.channel = channel
+        self._revoked: dict[str, float] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def is_revoked(self, digest: str) -> bool:
+        expires_at = self._revoked.get(digest)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self._revoked[digest]
+            return False
+        return True
+
+    async def revoke(self, digest: str, expires_at: float) -> None:
+        self._revoked[digest] = expires_at
+        async with self.redis_adapter.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.key, {digest: expires_at})
+            pipe.zremrangebyscore(self.key, "-inf", time.time())
+            pipe.publish(self.channel, f"{digest}:{expires_at}")
+            await pipe.execute()
+
+    async def load(self) -> None:
+        """
+        Replace the local mirror with the live entries stored in Redis.
+        """
+        now = time.time()
+        async with self.redis_adapter.pipeline() as pipe:
+            pipe.zremrangebyscore(self.key, "-inf", now)
+            pipe.zrangebyscore(self.key, now, "+inf", withscores=True)
+            _, entries = await pipe.execute()
+        self._revoked = dict(entries)
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis_adapter.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Revocations may have been missed while unsubscribed
+                await self.load()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    digest, _, expires_at = message["data"].partition(":")
+                    self._revoked[digest] = float(expires_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Token denylist listener failed, retrying: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
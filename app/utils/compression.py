@@ -0,0 +1,47 @@
+"""
+Transparent compression of cached values.
+"""
+
+import asyncio
+import zlib
+
+
+# Values at least this large are (de)compressed in a thread, zlib releasing the GIL, not on the event loop
+OFFLOAD_MIN_BYTES = 64 * 1024
+# First byte of a compressed value. 0xFF never occurs in UTF-8, so plain text values need no marker
+# and entries written before compression existed still read back unchanged.
+COMPRESSED = b"\xff"
+
+def compress(data: bytes, min_bytes: int = 1024, level: int = 1) -> bytes:
+    """
+    ``data`` zlib-compressed behind the COMPRESSED marker when it is at
+    least ``min_bytes`` long (0 never compresses) and that makes it smaller,
+    ``data`` itself otherwise.
+    """
+    if min_bytes and len(data) >= min_bytes:
+        packed = COMPRESSED + zlib.compress(data, level)
+        if len(packed) < len(data):
+            return packed
+    return data
+
+def decompress(data: bytes) -> bytes:
+    """
+    The bytes ``compress`` was given.
+    """
+    if data[:1] == COMPRESSED:
+        return zlib.decompress(data[1:])
+    return data
+
+def is_compressed(data: bytes) -> bool:
+    return data[:1] == COMPRESSED
+
+async def compress_async(data: bytes, min_bytes: int = 1024, level: int = 1) -> bytes:
+    if len(data) >= OFFLOAD_MIN_BYTES and min_bytes:
+        return await asyncio.to_thread(compress, data, min_bytes, level)
+    return compress(data, min_bytes, level)
+
+async def decompress_async(data: bytes) -> bytes:
+    # Compressed entries expand about threefold
+    if len(data) >= OFFLOAD_MIN_BYTES // 4 and is_compressed(data):
+        return await asyncio.to_thread(decompress, data)
+    return decompress(data)
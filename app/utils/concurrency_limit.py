@@ -0,0 +1,118 @@
+"""
+Adaptive limits on the number of requests a process handles at once.
+"""
+
+import math
+import time
+from typing import Optional
+
+
+class GradientLimit:
+    """
+    Compares each window's mean latency with the uncongested latency (the
+    best recent window, drifting up over ``baseline_windows``). While
+    latency stays within ``tolerance`` times the baseline the limit grows
+    towards limit + sqrt(limit); once requests start queueing (latency rising
+    above it) it shrinks in proportion, by at most half per window. A window
+    in which a request failed or timed out takes that largest step down.
+    ``smoothing`` is the share of that step taken each window.
+    """
+
+    def __init__(self, initial: int = 20, min_limit: int = 4, max_limit: int = 500, tolerance: float = 1.5,
+                 smoothing: float = 0.2, baseline_windows: int = 600):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.baseline_decay = 2 / (baseline_windows + 1)
+        self.baseline: Optional[float] = None
+
+    def update(self, latency: float, max_inflight: int, dropped: bool) -> float:
+        # The baseline follows faster windows at once and slower ones only gradually,
+        # so a sustained overload cannot pass itself off as the new normal
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += self.baseline_decay * (latency - self.baseline)
+        # Not using half of the limit says nothing about a higher one
+        if max_inflight < self.limit / 2 and not dropped:
+            return self.limit
+
+        gradient = 0.5 if dropped else max(0.5, min(1.0, self.tolerance * self.baseline / latency))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = max(self.min_limit, min(self.max_limit, self.limit + self.smoothing * (target - self.limit)))
+        return self.limit
+
+class AIMDLimit:
+    """
+    Adds one per window while the window's mean latency stays under
+    ``latency_target`` and multiplies by ``backoff`` when it does not or a
+    request timed out.
+    """
+
+    def __init__(self, initial: int = 20, min_limit: int = 4, max_limit: int = 500, latency_target: float = 0.1,
+                 backoff: float = 0.9):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+
+    def update(self, latency: float, max_inflight: int, dropped: bool) -> float:
+        if dropped or latency > self.latency_target:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif max_inflight >= self.limit / 2:
+            self.limit = min(self.max_limit, self.limit + 1)
+        return self.limit
+
+class ConcurrencyLimiter:
+    """
+    Admits a request while fewer than its priority's share of the current
+    limit are in flight, so low priorities are refused first as the limit
+    shrinks. The limit is recomputed every ``window`` seconds (once at least
+    ``min_samples`` requests completed) from their mean latency.
+    """
+
+    ALGORITHMS = {"gradient": GradientLimit, "aimd": AIMDLimit}
+
+    def __init__(self, limit: GradientLimit | AIMDLimit, shares: dict[str, float], window: float = 0.1,
+                 min_samples: int = 10):
+        self.limit = limit
+        self.shares = shares
+        self.window = window
+        self.min_samples = min_samples
+        self.inflight = 0
+        self._window_started = time.monotonic()
+        self._latency_sum = 0.0
+        self._samples = 0
+        self._dropped = False
+        self._max_inflight = 0
+        self.stats = {"admitted": 0, "rejected": 0}
+
+    def try_acquire(self, priority: str) -> bool:
+        if self.inflight >= self.limit.limit * self.shares[priority]:
+            self.stats["rejected"] += 1
+            return False
+        self.inflight += 1
+        self.stats["admitted"] += 1
+        if self.inflight > self._max_inflight:
+            self._max_inflight = self.inflight
+        return True
+
+    def release(self, latency: float, dropped: bool = False) -> None:
+        self.inflight -= 1
+        self._latency_sum += latency
+        self._samples += 1
+        self._dropped |= dropped
+
+        now = time.monotonic()
+        if now - self._window_started < self.window or self._samples < self.min_samples:
+            return
+        self.limit.update(self._latency_sum / self._samples, self._max_inflight, self._dropped)
+        self._window_started = now
+        self._latency_sum = 0.0
+        self._samples = 0
+        self._dropped = False
+        self._max_inflight = self.inflight
+
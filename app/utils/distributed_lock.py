@@ -0,0 +1,102 @@
+"""
+Redis-based distributed lock, and one-time initialization across workers built on it.
+"""
+
+import asyncio
+import uuid
+from typing import Awaitable, Callable
+
+from app.adapters.redis_adapter import RedisAdapter
+from app.utils.logger import logger
+
+
+# Delete the lock only if we still own it
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+# Extend the lock only if we still own it
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+class RedisLock:
+    """
+    Best-effort mutual exclusion across workers using ``SET NX PX``.
+
+    The lock expires after ``ttl`` seconds so a crashed holder cannot block
+    others forever; keep the guarded work shorter than that, or ``renew`` it.
+    """
+
+    def __init__(self, redis_adapter: RedisAdapter, name: str, ttl: float = 10.0):
+        self.redis_adapter = redis_adapter
+        self.name = name
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+        self.owned = False
+        self._release = redis_adapter.register_script(RELEASE_SCRIPT)
+        self._renew = redis_adapter.register_script(RENEW_SCRIPT)
+
+    async def acquire(self) -> bool:
+        self.owned = await self.redis_adapter.set_nx(self.name, self.token, expire_ms=int(self.ttl * 1000))
+        return self.owned
+
+    async def renew(self) -> bool:
+        """
+        Restart the lock's ``ttl``; returns False when it is no longer ours.
+        """
+        self.owned = bool(await self._renew(keys=[self.name], args=[self.token, int(self.ttl * 1000)]))
+        return self.owned
+
+    async def release(self) -> None:
+        if self.owned:
+            await self._release(keys=[self.name], args=[self.token])
+            self.owned = False
+
+    async def __aenter__(self) -> bool:
+        return await self.acquire()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.release()
+
+async def run_once(redis_adapter: RedisAdapter, name: str, init: Callable[[], Awaitable[None]],
+                   is_done: Callable[[], Awaitable[bool]], ttl: float = 60.0, poll_interval: float = 0.2) -> bool:
+    """
+    Run ``init`` in one worker of many starting together: whoever takes the
+    ``name`` lock runs it, the others wait until ``is_done`` reports it
+    finished. Returns whether this worker ran it. The holder renews the lock
+    while ``init`` runs, however long that takes; if the holder dies, its
+    lock expires after ``ttl`` seconds and another worker takes over, so
+    ``init`` must be safe to run again.
+    """
+    while not await is_done():
+        lock = RedisLock(redis_adapter, name, ttl=ttl)
+        async with lock as owned:
+            if owned:
+                # The previous holder may have finished between the check and the lock
+                if not await is_done():
+                    logger.info(f"Running one-time initialization {name}")
+                    keep_alive = asyncio.create_task(_keep_alive(lock))
+                    try:
+                        await init()
+                    finally:
+                        keep_alive.cancel()
+                return True
+        await asyncio.sleep(poll_interval)
+    return False
+
+async def _keep_alive(lock: RedisLock) -> None:
+    while True:
+        await asyncio.sleep(lock.ttl / 3)
+        try:
+            if not await lock.renew():
+                logger.warning(f"Lost lock {lock.name}; another worker may run the same initialization")
+                return
+        except Exception as e:
+            # Retried on the next tick, well before the lock expires
+            logger.warning(f"Could not renew lock {lock.name}: {e!r}")
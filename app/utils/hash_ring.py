@@ -0,0 +1,61 @@
+"""
+Consistent hashing of keys onto nodes.
+"""
+
+import bisect
+import hashlib
+from typing import Iterable
+
+
+def hash_tag(key: str) -> str:
+    """
+    The part of ``key`` that decides its node: the text between the first
+    ``{`` and the next ``}`` when it is not empty (as in Redis Cluster),
+    otherwise the whole key. Keys sharing a tag always land on one node.
+    """
+    start = key.find("{")
+    if start >= 0:
+        end = key.find("}", start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+class HashRing:
+    """
+    Each node owns ``vnodes`` points on a 64-bit ring and a key belongs to the
+    first point at or after its hash. Adding or removing one of N nodes only
+    moves the keys of that node's points, about 1/N of them.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 160):
+        self.vnodes = vnodes
+        self.nodes: list[str] = []
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            raise ValueError(f"Node {node} is already on the ring")
+        self.nodes.append(node)
+        self._rebuild()
+
+    def remove(self, node: str) -> None:
+        self.nodes.remove(node)
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        points = sorted((self.hash(f"{node}#{i}"), node) for node in self.nodes for i in range(self.vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        if not self._points:
+            raise LookupError("The hash ring has no nodes")
+        index = bisect.bisect_left(self._points, self.hash(hash_tag(key)))
+        return self._owners[index if index < len(self._owners) else 0]
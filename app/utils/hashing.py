@@ -2,6 +2,13 @@
 Utility functions for password hashing and verification.
 """
 
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Literal
+
 from passlib.context import CryptContext
 
 
@@ -11,4 +18,66 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+def _lower_priority() -> None:
+    # Let the serving event loop win the CPU when hashing competes with it
+    os.nice(10)
+
+class HasherSaturated(Exception):
+    """
+    Raised instead of queueing when too many hash operations are pending.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hasher saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class PasswordHasher:
+    """
+    Runs bcrypt off the event loop on a dedicated, size-limited executor.
+
+    Threads are enough because bcrypt releases the GIL; a process pool
+    isolates the work completely (its workers also run at a lower CPU
+    priority than the event loop) at the cost of pickling each call. At most
+    ``max_pending`` operations may be running or queued; beyond that calls
+    fail fast with ``HasherSaturated`` carrying a Retry-After estimate.
+    """
+
+    def __init__(self, executor: Literal["thread", "process"] = "thread", max_workers: int = 4,
+                 max_pending: int = 64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Executor = (ProcessPoolExecutor(max_workers, initializer=_lower_priority) if executor == "process"
+                                    else ThreadPoolExecutor(max_workers, thread_name_prefix="password-hasher"))
+        self._pending = 0
+        # Moving average of one operation, used to estimate Retry-After
+        self._average_seconds = 0.1
+        self.stats = {"completed": 0, "rejected": 0}
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            backlog = self._pending / self.max_workers
+            raise HasherSaturated(max(1, math.ceil(backlog * self._average_seconds)))
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+            self.stats["completed"] += 1
+            self._average_seconds += 0.2 * (time.perf_counter() - started - self._average_seconds)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
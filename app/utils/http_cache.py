@@ -0,0 +1,133 @@
+"""
+Utility functions for HTTP response caching: cache keys, Cache-Control
+parsing, ETags and the stored entry format.
+"""
+
+import base64
+import hashlib
+import json
+import time
+from typing import Iterable, Optional
+from urllib.parse import parse_qsl, urlencode
+
+
+# Headers that describe the connection rather than the response, or must never be replayed
+UNCACHED_HEADERS = frozenset({
+    b"connection", b"keep-alive", b"transfer-encoding", b"upgrade", b"set-cookie", b"date", b"age", b"x-cache",
+})
+
+def normalize_query(query_string: str) -> str:
+    """
+    Sort query parameters so ``?b=2&a=1`` and ``?a=1&b=2`` share an entry.
+    """
+    return urlencode(sorted(parse_qsl(query_string, keep_blank_values=True)))
+
+def digest(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+def build_cache_key(method: str, path: str, query_string: str = "", vary: Optional[dict[str, str]] = None,
+                    namespace: str = "http") -> str:
+    """
+    Key for a response to ``method path?query``. ``vary`` maps each Vary
+    dimension (such as the user or tenant) to the request's value for it;
+    values are hashed so credentials never appear in Redis keys.
+    """
+    # HEAD is answered from the GET entry
+    method = "GET" if method == "HEAD" else method
+    parts = [normalize_query(query_string)]
+    for name in sorted(vary or ()):
+        parts.append(f"{name}={vary[name]}")
+    return f"{namespace}:{method}:{path}:{digest('&'.join(parts))}"
+
+def parse_cache_control(value: Optional[str]) -> dict[str, Optional[str]]:
+    """
+    Parse a Cache-Control header into ``{directive: argument or None}``.
+    """
+    directives = {}
+    for item in (value or "").split(","):
+        name, _, argument = item.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+def max_age(directives: dict[str, Optional[str]]) -> Optional[int]:
+    """
+    Freshness lifetime a response grants shared caches, if it states one.
+    """
+    for name in ("s-maxage", "max-age"):
+        argument = directives.get(name)
+        if argument is not None and argument.isdigit():
+            return int(argument)
+    return None
+
+def strong_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison as required for If-None-Match (RFC 9110 section 13.1.2).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+class CachedResponse:
+    """
+    A stored response: status, headers and body bytes plus its ETag.
+
+    Encoded as a one-line JSON header followed by the body, so a revalidation
+    only parses the header line and never touches the body.
+    """
+
+    __slots__ = ("status", "headers", "body", "etag", "stored_at")
+
+    def __init__(self, status: int, headers: list[tuple[bytes, bytes]], body: bytes, etag: str,
+                 stored_at: Optional[float] = None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    @classmethod
+    def from_parts(cls, status: int, headers: Iterable[tuple[bytes, bytes]], body: bytes) -> "CachedResponse":
+        kept = [(name.lower(), value) for name, value in headers if name.lower() not in UNCACHED_HEADERS]
+        etag = next((value.decode("latin-1") for name, value in kept if name == b"etag"), None)
+        if etag is None:
+            etag = strong_etag(body)
+            kept.append((b"etag", etag.encode("latin-1")))
+        return cls(status, kept, body, etag)
+
+    def encode(self) -> str:
+        try:
+            body, encoding = self.body.decode(), "utf-8"
+        except UnicodeDecodeError:
+            body, encoding = base64.b64encode(self.body).decode(), "base64"
+        meta = {
+            "s": self.status,
+            "h": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in self.headers],
+            "e": self.etag,
+            "t": round(self.stored_at, 3),
+            "b": encoding,
+        }
+        return json.dumps(meta, separators=(",", ":")) + "\n" + body
+
+    @classmethod
+    def decode(cls, raw: str, with_body: bool = True) -> "CachedResponse":
+        """
+        Rebuild an entry; ``with_body=False`` skips the body (for 304 replies).
+        """
+        end = raw.index("\n")
+        meta = json.loads(raw[:end])
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in meta["h"]]
+        body = b""
+        if with_body:
+            body = raw[end + 1:]
+            body = base64.b64decode(body) if meta["b"] == "base64" else body.encode()
+        return cls(meta["s"], headers, body, meta["e"], stored_at=meta["t"])
+
+    def age(self) -> int:
+        return max(0, int(time.time() - self.stored_at))
@@ -2,6 +2,7 @@
 Utility functions for JWT token creation and verification.
 """
 
+import hashlib
 from datetime import datetime, timedelta, timezone
 
 from jose import jwt
@@ -24,4 +25,10 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     return encoded_jwt
 
 def decode_jwt_token(token: str):
-    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
\ No newline at end of file
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+def token_digest(token: str) -> str:
+    """
+    Stable identifier of a token that is safe to store and log.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
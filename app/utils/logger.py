@@ -1,23 +1,253 @@
 """
 Logging configuration for the FastAPI application.
 
-This file sets up logging for critical application events and errors.
+Log calls on the request path only append the record to an in-memory
+buffer; a background thread formats the records as JSON lines (or plain
+text) and writes them to ``LOG_FILE_PATH`` in batches, rotating the file by
+size.
+Records carry the id of the request that logged them, and high-volume
+levels can be sampled before they are queued.
+
+Prefer %-style arguments (``logger.info("User %s logged in", name)``) over
+f-strings on hot paths: the message is then only built for records that
+pass the level check and sampling, and on the writer thread.
 """
 
 import os
+import time
+import queue
+import atexit
+import random
 import logging
+from collections import deque
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 
 from app.config.settings import env_settings
+from app.utils.json_codec import dumps
 
 
-if not os.path.exists('logs'):
-    os.makedirs('logs')
+# Id of the request being handled, set by RequestIdMiddleware
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
 
-logging.basicConfig(
-    filename=env_settings.LOG_FILE_PATH, 
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s", 
-)
+# Logged in place of the request id outside of a request
+NO_REQUEST_ID = "-"
 
-logger = logging.getLogger(__name__)
+# Argument types that cannot change between the log call and the writer thread
+IMMUTABLE_ARG_TYPES = (str, int, float, bool, type(None), bytes)
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "request_id"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message, request id, any
+    ``extra=`` fields and the formatted exception, if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", NO_REQUEST_ID) != NO_REQUEST_ID:
+            entry["request_id"] = record.request_id
+        for name, value in vars(record).items():
+            if name not in RESERVED_ATTRS:
+                entry[name] = value if isinstance(value, IMMUTABLE_ARG_TYPES) else repr(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return dumps(entry).decode()
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z"
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep records of a level with the probability configured for it (levels
+    without a rate are always kept).
+    """
+
+    def __init__(self, rates: dict[int, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        return rate is None or random.random() < rate
+
+class BatchingRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that can write many records with one write and one
+    flush, rotating before a batch that would overflow ``maxBytes``.
+    """
+
+    def emit_batch(self, records: list[logging.LogRecord]) -> None:
+        try:
+            text = "".join(self.format(record) + self.terminator for record in records)
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes and self.stream.tell() and self.stream.tell() + len(text) >= self.maxBytes:
+                self.doRollover()
+            self.stream.write(text)
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
+
+class LogBuffer:
+    """
+    Bounded FIFO of log records. Appending takes no lock and wakes no
+    thread (the writer polls), which keeps a log call on the event loop to
+    a few microseconds.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._records = deque()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def put_nowait(self, record) -> None:
+        if len(self._records) >= self.maxsize:
+            raise queue.Full
+        self._records.append(record)
+
+    def put(self, record) -> None:
+        self._records.append(record)
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def drain(self, limit: int) -> list:
+        records = []
+        try:
+            while len(records) < limit:
+                records.append(self._records.popleft())
+        except IndexError:
+            pass
+        return records
 
+class AsyncQueueHandler(QueueHandler):
+    """
+    Puts records on a LogBuffer without formatting them; when it is full
+    the record is dropped (and counted) rather than blocking.
+    """
+
+    def __init__(self, buffer: LogBuffer):
+        super().__init__(buffer)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id.get() or NO_REQUEST_ID
+        args = record.args
+        if args and not all(isinstance(arg, IMMUTABLE_ARG_TYPES)
+                            for arg in (args.values() if isinstance(args, dict) else args)):
+            # Mutable arguments could change before the writer formats them
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class BatchingQueueListener(QueueListener):
+    """
+    Every ``flush_interval`` seconds, writes the records waiting in the
+    buffer in batches of up to ``batch_size``, one write call per batch.
+    ``stop`` writes whatever is left first.
+    """
+
+    def __init__(self, buffer: LogBuffer, handler: logging.Handler, batch_size: int = 256,
+                 flush_interval: float = 0.05):
+        super().__init__(buffer, handler, respect_handler_level=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            super().stop()
+
+    def enqueue_sentinel(self) -> None:
+        # Never dropped, even when the buffer is full
+        self.queue.put(self._sentinel)
+
+    def _monitor(self) -> None:
+        while True:
+            records = self.queue.drain(self.batch_size)
+            if not records:
+                time.sleep(self.flush_interval)
+                continue
+            if self._sentinel in records:
+                self.write(records[:records.index(self._sentinel)])
+                return
+            self.write(records)
+
+    def write(self, records: list[logging.LogRecord]) -> None:
+        if not records:
+            return
+        for handler in self.handlers:
+            accepted = [record for record in records if record.levelno >= handler.level]
+            if not accepted:
+                continue
+            if isinstance(handler, BatchingRotatingFileHandler):
+                handler.emit_batch(accepted)
+            else:
+                for record in accepted:
+                    handler.handle(record)
+
+def configure_logging() -> tuple[AsyncQueueHandler, BatchingQueueListener]:
+    """
+    Route the root logger through the queue and start the writer thread
+    (stopped, after draining the queue, at interpreter exit).
+    """
+    directory = os.path.dirname(env_settings.LOG_FILE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    file_handler = BatchingRotatingFileHandler(env_settings.LOG_FILE_PATH, maxBytes=env_settings.LOG_MAX_BYTES,
+                                               backupCount=env_settings.LOG_BACKUP_COUNT, encoding="utf-8",
+                                               delay=True)
+    if env_settings.LOG_FORMAT == "json":
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(request_id)s - %(message)s"))
+
+    buffer = LogBuffer(env_settings.LOG_QUEUE_SIZE)
+    queue_handler = AsyncQueueHandler(buffer)
+    if env_settings.LOG_SAMPLE_RATES:
+        queue_handler.addFilter(SamplingFilter({logging.getLevelName(level): rate
+                                                for level, rate in env_settings.LOG_SAMPLE_RATES.items()}))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(env_settings.LOG_LEVEL)
+    # httpx logs every proxied request at INFO
+    logging.getLogger("httpx").setLevel(max(logging.WARNING, root.level))
+
+    listener = BatchingQueueListener(buffer, file_handler, batch_size=env_settings.LOG_BATCH_SIZE,
+                                     flush_interval=env_settings.LOG_FLUSH_INTERVAL)
+    listener.start()
+    atexit.register(listener.stop)
+    return queue_handler, listener
+
+def restart_after_fork() -> None:
+    """
+    Give a forked worker its own writer thread (threads do not survive a
+    fork). Records the parent had not written yet are dropped here; the
+    parent still writes them.
+    """
+    listener.queue.clear()
+    listener.start()
+
+handler, listener = configure_logging()
+
+logger = logging.getLogger(__name__)
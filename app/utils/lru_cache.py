@@ -0,0 +1,92 @@
+"""
+Bounded in-process LRU cache with per-entry TTL.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+# Rough per-entry bookkeeping cost (tuple, OrderedDict node, key object)
+ENTRY_OVERHEAD_BYTES = 120
+
+def estimate_size(key: str, value: Any) -> int:
+    size = ENTRY_OVERHEAD_BYTES + len(key)
+    if isinstance(value, (str, bytes, bytearray)):
+        size += len(value)
+    return size
+
+class LRUCache:
+    """
+    Least-recently-used cache bounded by an approximate byte budget.
+
+    Entries expire ``ttl`` seconds after they were set. Expired entries are
+    dropped lazily on access or when space is needed. Entries larger than
+    ``max_entry_bytes`` are not admitted: one of them would evict many small
+    entries that are each likelier to be read again.
+    """
+
+    def __init__(self, max_bytes: int, default_ttl: float = 5.0, max_entry_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes or max_bytes, max_bytes)
+        self.default_ttl = default_ttl
+        self._entries: OrderedDict[str, tuple[Any, float, int]] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        # A membership test: unlike get, not counted as a hit or miss and not a use
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Store ``value``; returns False when it is larger than ``max_entry_bytes``.
+        """
+        size = estimate_size(key, value)
+        if size > self.max_entry_bytes:
+            self.delete(key)
+            self.rejections += 1
+            return False
+        if key in self._entries:
+            self._remove(key)
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        return True
+
+    def delete(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
@@ -0,0 +1,266 @@
+"""
+In-process metrics: latency histograms, counters and gauges, exported in
+the Prometheus text format.
+
+Recording is plain attribute and list arithmetic (well under a microsecond
+per observation), with no locks: every metric is updated from the event
+loop thread. Values that services already count in their ``stats`` dicts
+are read only when ``/metrics`` is scraped, through collectors.
+"""
+
+import math
+import time
+from typing import Callable, Iterable, Optional
+
+
+# Each power of two is split into this many linear sub-buckets (HDR-style, ~12% relative error)
+SUB_BUCKETS = 4
+# Largest power of two tracked, in microseconds (2 ** 28 us is about 4.5 minutes)
+MAX_EXPONENT = 28
+BUCKET_COUNT = (MAX_EXPONENT + 1) * SUB_BUCKETS
+# Exported bucket bounds: every power of two from 16 us up, in microseconds
+EXPORTED_EXPONENTS = range(4, MAX_EXPONENT + 1)
+
+# One sample: metric name suffix, labels and value
+Sample = tuple[str, dict[str, str], float]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+class HistogramValues:
+    """
+    Log-linear latency histogram: the bucket of a value is its power of two
+    plus a linear sub-bucket, found with one ``frexp``.
+    """
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.sum += seconds
+        mantissa, exponent = math.frexp(seconds * 1e6)
+        if exponent <= 0:
+            index = 0
+        elif exponent > MAX_EXPONENT:
+            index = BUCKET_COUNT - 1
+        else:
+            index = exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+        self.counts[index] += 1
+
+    @staticmethod
+    def upper_bound(index: int) -> float:
+        """
+        Upper bound of bucket ``index`` in seconds.
+        """
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        return (0.5 + (sub + 1) / (2 * SUB_BUCKETS)) * 2.0 ** exponent / 1e6
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the ``q`` quantile (0..1), in seconds.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.upper_bound(index)
+        return self.upper_bound(BUCKET_COUNT - 1)
+
+    def time(self) -> "Timer":
+        """
+        Context manager observing the time spent in its block.
+        """
+        return Timer(self)
+
+    def samples(self) -> Iterable[Sample]:
+        cumulative = 0
+        index = 0
+        for exponent in EXPORTED_EXPONENTS:
+            # Values below 2 ** exponent us have a frexp exponent of at most ``exponent``
+            while index < (exponent + 1) * SUB_BUCKETS:
+                cumulative += self.counts[index]
+                index += 1
+            yield "_bucket", {"le": _format_value(2.0 ** exponent / 1e6)}, cumulative
+        yield "_bucket", {"le": "+Inf"}, self.count
+        yield "_sum", {}, self.sum
+        yield "_count", {}, self.count
+
+class Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: HistogramValues):
+        self.histogram = histogram
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started)
+
+class CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def samples(self) -> Iterable[Sample]:
+        yield "", {}, self.value
+
+class GaugeValue(CounterValue):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+class Metric:
+    """
+    A metric family. Without ``labelnames`` it records directly; otherwise
+    ``labels(...)`` returns (and keeps) one child per label combination,
+    which hot paths should bind once and reuse.
+    """
+
+    kind: str = None
+    value_class: type = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        if not self.labelnames:
+            # observe/inc/set on an unlabelled metric go straight to its only child
+            child = self._children[()] = self.value_class()
+            for method in ("observe", "time", "inc", "set", "dec"):
+                if hasattr(child, method):
+                    setattr(self, method, getattr(child, method))
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[values] = self.value_class()
+        return child
+
+    def collect(self) -> Iterable[Sample]:
+        for values, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, values))
+            for suffix, extra, value in child.samples():
+                yield suffix, {**labels, **extra}, value
+
+class Histogram(Metric):
+    kind = "histogram"
+    value_class = HistogramValues
+
+class Counter(Metric):
+    kind = "counter"
+    value_class = CounterValue
+
+class Gauge(Metric):
+    kind = "gauge"
+    value_class = GaugeValue
+
+class Collected:
+    """
+    A metric family whose samples are computed at scrape time.
+    """
+
+    def __init__(self, name: str, kind: str, documentation: str, samples: Iterable[tuple[dict[str, str], float]]):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self._samples = samples
+
+    def collect(self) -> Iterable[Sample]:
+        for labels, value in self._samples:
+            yield "", labels, value
+
+Collector = Callable[[], Iterable[Collected]]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: dict[str, Collector] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames))
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def register_collector(self, key: str, collector: Collector) -> None:
+        """
+        Add (or replace, for the same ``key``) a function called on every
+        scrape that returns Collected families.
+        """
+        self._collectors[key] = collector
+
+    def unregister_collector(self, key: str) -> None:
+        self._collectors.pop(key, None)
+
+    def render(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        families = list(self._metrics.values())
+        for collector in list(self._collectors.values()):
+            families.extend(collector())
+        lines = []
+        for family in families:
+            lines.append(f"# HELP {family.name} {family.documentation}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for suffix, labels, value in family.collect():
+                lines.append(f"{family.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+# The process-wide registry served at /metrics
+metrics = MetricsRegistry()
+
+# Shared by the services; each binds its own stage once
+STAGE_SECONDS = metrics.histogram("gateway_stage_seconds", "Time spent in each stage of a request", ("stage",))
+
+def stats_family(name: str, documentation: str, kind: str, stats: dict, label: str,
+                 keys: Optional[Iterable[str]] = None, **labels: str) -> Collected:
+    """
+    Expose the numeric entries of a service's ``stats`` dict as one family,
+    labelled by ``label``.
+    """
+    return Collected(name, kind, documentation,
+                     [({**labels, label: key}, stats[key]) for key in (keys or stats)])
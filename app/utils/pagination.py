@@ -0,0 +1,27 @@
+"""
+Utility functions for opaque pagination cursors.
+"""
+
+import base64
+import binascii
+
+
+CURSOR_VERSION = "v1"
+
+def encode_cursor(position: int) -> str:
+    raw = f"{CURSOR_VERSION}:{position}".encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Return the position stored in ``cursor``; raises ValueError if it was not
+    produced by ``encode_cursor``.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        version, position = base64.urlsafe_b64decode(padded).decode().split(":", 1)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Malformed cursor") from e
+    if version != CURSOR_VERSION or not position.isdigit():
+        raise ValueError("Malformed cursor")
+    return int(position)
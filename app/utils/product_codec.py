@@ -0,0 +1,212 @@
+"""
+Compact binary encoding of a product's fields, the way products are stored.
+
+A record is one fixed-width block followed by length-prefixed UTF-8 text:
+
+    version      B       RECORD_VERSION
+    as_text      H       bit i set: typed field i did not fit its slot and is stored as text
+    category     B       index in CATEGORIES
+    price        i b     unscaled value and exponent: Decimal("12.50") is (1250, -2)
+    stock        i
+    sku          16s     UUID bytes
+    release_date H       days since 1970-01-01
+    warranty     B       N of "N years"
+    rating       H       tenths
+    dimensions   B B B   A, B and C of "AxBxC cm"
+    weight       H       N of "N grams"
+    color        B       index in COLORS
+    material     B       index in MATERIALS
+
+then name, brand, description and features, then the text of each typed
+field flagged in ``as_text``, in slot order. Lengths are varints (one byte
+below 128). A value that does not round-trip through its slot exactly (an
+unknown color, "1 year", a price with more digits than fit) falls back to
+text, so every product decodes to what was encoded. The product id is not
+stored; it is the key's.
+"""
+
+import math
+import re
+import struct
+import uuid
+from datetime import date
+from decimal import Decimal
+from typing import Any, Callable, Optional
+
+
+RECORD_VERSION = 1
+
+# Records store positions in these tuples: only ever append to them
+CATEGORIES = ("Smartphone", "Laptop", "Tablet", "Smartwatch", "Camera", "Speaker", "Headphones", "Monitor", "Printer")
+COLORS = ("Black", "White", "Silver", "Gold", "Blue", "Red")
+MATERIALS = ("Plastic", "Metal", "Glass", "Aluminum", "Carbon Fiber")
+
+TEXT_FIELDS = ("name", "brand", "description", "features")
+EPOCH = date(1970, 1, 1).toordinal()
+DIMENSIONS = re.compile(r"(\d+)x(\d+)x(\d+) cm")
+
+class Slot:
+    """
+    Fixed-width slot of a typed field. ``parse`` turns the field's value (or
+    its text) into the typed value, ``pack`` gives the struct values that
+    store it (None when they cannot) and ``unpack`` reverses ``pack``.
+    """
+
+    __slots__ = ("name", "fmt", "parse", "pack", "unpack", "width", "empty")
+
+    def __init__(self, name: str, fmt: str, parse: Callable[[Any], Any], pack: Callable[[Any], Optional[tuple]],
+                 unpack: Callable[[tuple], Any]):
+        self.name = name
+        self.fmt = fmt
+        self.parse = parse
+        self.pack = pack
+        self.unpack = unpack
+        # What the slot holds when its field is stored as text
+        self.empty = struct.unpack("<" + fmt, bytes(struct.calcsize("<" + fmt)))
+        self.width = len(self.empty)
+
+def _in_range(value: int, bits: int, signed: bool = False) -> bool:
+    low = -(1 << bits - 1) if signed else 0
+    return low <= value < low + (1 << bits)
+
+def _enum(name: str, values: tuple[str, ...]) -> Slot:
+    positions = {value: i for i, value in enumerate(values)}
+    return Slot(name, "B", str, lambda value: (positions[value],) if value in positions else None,
+                lambda packed: values[packed[0]])
+
+def _pack_price(price: Decimal) -> Optional[tuple]:
+    exponent = price.as_tuple().exponent
+    if not isinstance(exponent, int) or not _in_range(exponent, 8, signed=True):
+        return None
+    unscaled = int(price.scaleb(-exponent))
+    return (unscaled, exponent) if _in_range(unscaled, 32, signed=True) else None
+
+def _pack_count(pattern: str, bits: int) -> Callable[[str], Optional[tuple]]:
+    """
+    Pack text like ``"3 years"`` (``pattern`` ``"{} years"``) as its number.
+    """
+    prefix, suffix = pattern.split("{}")
+
+    def pack(value: str) -> Optional[tuple]:
+        number = value.removeprefix(prefix).removesuffix(suffix)
+        if not number.isdigit() or not _in_range(int(number), bits):
+            return None
+        return (int(number),)
+
+    return pack
+
+def _pack_dimensions(value: str) -> Optional[tuple]:
+    match = DIMENSIONS.fullmatch(value)
+    if match is None:
+        return None
+    sizes = tuple(int(size) for size in match.groups())
+    return sizes if all(_in_range(size, 8) for size in sizes) else None
+
+def _pack_date(value: str) -> Optional[tuple]:
+    try:
+        days = date.fromisoformat(value).toordinal() - EPOCH
+    except ValueError:
+        return None
+    return (days,) if _in_range(days, 16) else None
+
+def _pack_rating(rating: float) -> Optional[tuple]:
+    if not math.isfinite(rating):
+        return None
+    tenths = round(rating * 10)
+    return (tenths,) if _in_range(tenths, 16) else None
+
+def _pack_sku(value: str) -> Optional[tuple]:
+    try:
+        return (uuid.UUID(value).bytes,)
+    except ValueError:
+        return None
+
+def _unpack_sku(packed: tuple) -> str:
+    # str(uuid.UUID(bytes=...)) without building the UUID, several times faster
+    digits = packed[0].hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+SLOTS = (
+    _enum("category", CATEGORIES),
+    Slot("price", "ib", lambda value: Decimal(str(value)), _pack_price,
+         lambda packed: Decimal(packed[0]).scaleb(packed[1])),
+    Slot("stock", "i", int, lambda stock: (stock,) if _in_range(stock, 32, signed=True) else None,
+         lambda packed: packed[0]),
+    Slot("sku", "16s", str, _pack_sku, _unpack_sku),
+    Slot("release_date", "H", str, _pack_date, lambda packed: date.fromordinal(EPOCH + packed[0]).isoformat()),
+    Slot("warranty", "B", str, _pack_count("{} years", 8), lambda packed: f"{packed[0]} years"),
+    Slot("rating", "H", float, _pack_rating, lambda packed: packed[0] / 10),
+    Slot("dimensions", "BBB", str, _pack_dimensions, lambda packed: "{}x{}x{} cm".format(*packed)),
+    Slot("weight", "H", str, _pack_count("{} grams", 16), lambda packed: f"{packed[0]} grams"),
+    _enum("color", COLORS),
+    _enum("material", MATERIALS),
+)
+BLOCK = struct.Struct("<BH" + "".join(slot.fmt for slot in SLOTS))
+
+def _put_text(out: bytearray, text: str) -> None:
+    data = text.encode()
+    length = len(data)
+    while length >= 0x80:
+        out.append(length & 0x7F | 0x80)
+        length >>= 7
+    out.append(length)
+    out += data
+
+def _take_text(data: bytes, offset: int) -> tuple[str, int]:
+    length = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        length |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    end = offset + length
+    return data[offset:end].decode(), end
+
+def encode_product(fields: dict) -> bytes:
+    """
+    Encode a product's fields (typed, or as ``model_dump(mode="json")``
+    gives them); ``id`` and unknown keys are ignored.
+    """
+    as_text = 0
+    packed = []
+    texts = []
+    for bit, slot in enumerate(SLOTS):
+        value = slot.parse(fields[slot.name])
+        values = slot.pack(value)
+        # Anything the slot would not give back exactly is kept as text
+        if values is None or repr(slot.unpack(values)) != repr(value):
+            as_text |= 1 << bit
+            values = slot.empty
+            texts.append(str(value))
+        packed.extend(values)
+    out = bytearray(BLOCK.pack(RECORD_VERSION, as_text, *packed))
+    for name in TEXT_FIELDS:
+        _put_text(out, fields[name])
+    for text in texts:
+        _put_text(out, text)
+    return bytes(out)
+
+def decode_product(data: bytes) -> dict:
+    """
+    The typed fields ``encode_product`` stored (without ``id``). Raises
+    ValueError for data that is not a record of a known version.
+    """
+    if not data or data[0] != RECORD_VERSION:
+        raise ValueError(f"Not a product record of version {RECORD_VERSION}")
+    values = BLOCK.unpack_from(data)
+    as_text = values[1]
+    fields = {}
+    offset = BLOCK.size
+    for name in TEXT_FIELDS:
+        fields[name], offset = _take_text(data, offset)
+    position = 2
+    for bit, slot in enumerate(SLOTS):
+        if as_text & 1 << bit:
+            text, offset = _take_text(data, offset)
+            fields[slot.name] = slot.parse(text)
+        else:
+            fields[slot.name] = slot.unpack(values[position:position + slot.width])
+        position += slot.width
+    return fields
@@ -0,0 +1,297 @@
+"""
+Circuit breakers, retry budgets, deadlines and hedging for calls to dependencies.
+"""
+
+import asyncio
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+from app.utils.logger import logger
+
+
+T = TypeVar("T")
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a dependency whose circuit is open.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit {name} is open")
+        self.name = name
+        self.retry_after = retry_after
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when the current request's deadline passes before a call completes.
+    """
+
+# Errors meaning the dependency itself is unavailable, as opposed to a bad request
+DEPENDENCY_ERRORS = (CircuitOpenError, TimeoutError, OSError, RedisConnectionError, RedisTimeoutError)
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+@contextlib.contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Bound every call made inside the block (in this task and the tasks it
+    starts) to ``seconds`` from now. Never extends an enclosing deadline.
+    """
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+@contextlib.contextmanager
+def renewed_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Like ``deadline``, but replacing the enclosing deadline (removing it for
+    None), for long responses bounded step by step rather than as a whole.
+    """
+    token = _deadline.set(None if seconds is None else time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def time_remaining() -> Optional[float]:
+    """
+    Seconds left before the current deadline, or None without one.
+    """
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    remaining = time_remaining()
+    if remaining is None:
+        return await awaitable
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("Deadline exceeded")
+    if not hasattr(asyncio, "timeout"):
+        # Python 3.10: wait_for, which runs the awaitable in a task of its own
+        try:
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            if time_remaining() <= 0:
+                raise DeadlineExceeded("Deadline exceeded") from None
+            raise
+    try:
+        async with asyncio.timeout(remaining) as scope:
+            return await awaitable
+    except TimeoutError:
+        if scope.expired():
+            raise DeadlineExceeded("Deadline exceeded") from None
+        raise
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is down.
+
+    Closed, calls go through and consecutive failures are counted; at
+    ``failure_threshold`` the circuit opens and calls raise CircuitOpenError
+    for ``recovery_time`` seconds. Then it turns half-open and lets
+    ``half_open_calls`` probes through: a success closes it, a failure opens
+    it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_time: float = 5.0,
+                 half_open_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def available(self) -> bool:
+        """
+        Whether a call would be let through now (without reserving a probe).
+        """
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.recovery_time
+        return self._probes < self.half_open_calls
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_time - time.monotonic())
+
+    def before_call(self) -> None:
+        """
+        Reserve a call, raising CircuitOpenError when none is allowed.
+        """
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_time:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.name, self.retry_after())
+            self.state = self.HALF_OPEN
+            self._probes = 0
+            logger.info(f"Circuit {self.name} half-open, probing")
+        if self._probes >= self.half_open_calls:
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(self.name, self.recovery_time)
+        self._probes += 1
+
+    def release(self) -> None:
+        """
+        Give back a call that ended without telling anything about the
+        dependency (it was cancelled).
+        """
+        if self.state == self.HALF_OPEN and self._probes:
+            self._probes -= 1
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit {self.name} closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probes = 0
+
+    def record_failure(self) -> None:
+        if self.state == self.OPEN:
+            # A call that started before the circuit opened
+            return
+        if self.state == self.HALF_OPEN:
+            logger.warning(f"Circuit {self.name} probe failed, reopening")
+            self._open()
+            return
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            logger.warning(f"Circuit {self.name} opened after {self.failures} consecutive failures")
+            self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.failures = 0
+        self._probes = 0
+        self.stats["opened"] += 1
+
+class RetryBudget:
+    """
+    Caps retries (and hedges) to a fraction of traffic: every request
+    deposits ``ratio`` of a token, every retry withdraws a whole one. A
+    floor of ``min_per_second`` tokens keeps low traffic retryable, and the
+    balance never exceeds ``max_tokens`` so a quiet period cannot save up
+    for a retry storm.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 5.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._balance = min_per_second
+        self._refilled_at = time.monotonic()
+        self.stats = {"withdrawn": 0, "exhausted": 0}
+
+    def deposit(self) -> None:
+        self._balance = min(self.max_tokens, self._balance + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        now = time.monotonic()
+        self._balance = min(self.max_tokens, self._balance + (now - self._refilled_at) * self.min_per_second)
+        self._refilled_at = now
+        if self._balance < 1:
+            self.stats["exhausted"] += 1
+            return False
+        self._balance -= 1
+        self.stats["withdrawn"] += 1
+        return True
+
+class ResiliencePolicy:
+    """
+    Runs calls to one dependency through its circuit breaker and the
+    current deadline. A call cut short by the deadline does not count
+    against the breaker (only the client's own timeouts do), so keep
+    request deadlines longer than the client timeouts. Idempotent calls
+    that fail with a dependency error are retried up to ``max_retries``
+    times while the retry budget allows, and with ``hedge_delay`` a second
+    attempt is started when the first has not answered after that many
+    seconds; the first success wins.
+    """
+
+    def __init__(self, breaker: CircuitBreaker, budget: Optional[RetryBudget] = None, max_retries: int = 1,
+                 hedge_delay: Optional[float] = None):
+        self.breaker = breaker
+        self.budget = budget
+        self.max_retries = max_retries
+        self.hedge_delay = hedge_delay
+        self.stats = {"retries": 0, "hedges": 0}
+
+    async def call(self, operation: Callable[[], Awaitable[T]], idempotent: bool = False) -> T:
+        if self.budget is not None:
+            self.budget.deposit()
+        retries = 0
+        while True:
+            try:
+                if idempotent and self.hedge_delay is not None:
+                    return await self._hedged(operation)
+                return await self._attempt(operation)
+            except (CircuitOpenError, DeadlineExceeded):
+                raise
+            except DEPENDENCY_ERRORS:
+                if not idempotent or retries >= self.max_retries or not self._may_retry():
+                    raise
+                retries += 1
+                self.stats["retries"] += 1
+
+    def _may_retry(self) -> bool:
+        return self.budget is None or self.budget.try_withdraw()
+
+    async def _attempt(self, operation: Callable[[], Awaitable[T]]) -> T:
+        self.breaker.before_call()
+        try:
+            result = await within_deadline(operation())
+        except (DeadlineExceeded, asyncio.CancelledError):
+            # Says nothing about the dependency: the caller ran out of time or gave up
+            self.breaker.release()
+            raise
+        except DEPENDENCY_ERRORS:
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            # The dependency answered; the request itself was bad
+            self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _hedged(self, operation: Callable[[], Awaitable[T]]) -> T:
+        tasks = [asyncio.ensure_future(self._attempt(operation))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done and self.breaker.available() and self._may_retry():
+                self.stats["hedges"] += 1
+                tasks.append(asyncio.ensure_future(self._attempt(operation)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Every attempt failed: report the first one's error
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,50 @@
+"""
+Helpers for streamed response bodies.
+"""
+
+import asyncio
+import zlib
+from typing import AsyncIterable, AsyncIterator, Optional
+
+
+def accepts_encoding(accept_encoding: Optional[str], coding: str) -> bool:
+    """
+    Whether an ``Accept-Encoding`` header allows ``coding`` (listed, or
+    covered by ``*``, without ``q=0``). A q-value that does not parse counts
+    as absent.
+    """
+    allowed = False
+    for entry in (accept_encoding or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        name = name.strip().lower()
+        if name not in (coding, "*"):
+            continue
+        rejected = _quality(params) == 0
+        if name == coding:
+            return not rejected
+        allowed = not rejected
+    return allowed
+
+def _quality(params: str) -> Optional[float]:
+    params = params.strip()
+    if not params.startswith("q="):
+        return None
+    try:
+        return float(params[2:] or 0)
+    except ValueError:
+        return None
+
+async def gzip_chunks(chunks: AsyncIterable[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """
+    Gzip a stream chunk by chunk. Each chunk is flushed, so the client can
+    decode everything received so far; compression runs in a thread (zlib
+    releases the GIL) to keep the event loop free.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(chunk: bytes) -> bytes:
+        return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    async for chunk in chunks:
+        yield await asyncio.to_thread(compress, chunk)
+    yield compressor.flush()
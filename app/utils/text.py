@@ -0,0 +1,31 @@
+"""
+Utility functions for tokenizing product text for search.
+"""
+
+import re
+from collections import Counter
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+    "that", "the", "this", "to", "with",
+})
+
+# Terms found in the name count three times, in the brand twice
+FIELD_WEIGHTS = {"name": 3, "brand": 2, "description": 1, "features": 1}
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def weighted_terms(fields: dict) -> tuple[Counter, int]:
+    """
+    Weighted term frequencies of a product's searchable fields, and the
+    document length (sum of the weights) used for length normalization.
+    """
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(fields.get(field) or ""):
+            terms[token] += weight
+    return terms, sum(terms.values())
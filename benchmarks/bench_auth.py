@@ -0,0 +1,71 @@
+"""
+Authentication overhead per request.
+
+Compares the previous dependency (decode the JWT, then build ``UserInDB``
+and a fresh ``User`` on every request) with ``AuthService.get_current_user``
+with the verified-token cache disabled and enabled. Each request presents
+one of ``--tokens`` distinct tokens, so the cache also has to hold them all.
+
+    python -m benchmarks.bench_auth --requests 50000 --tokens 100
+"""
+
+import time
+import asyncio
+import argparse
+from datetime import timedelta
+
+import fakeredis
+
+import benchmarks.common  # noqa: F401  (configures the app environment)
+from app.adapters.redis_adapter import RedisAdapter
+from app.models.user import User, UserInDB
+from app.services.auth_service import AuthService
+from app.services.token_denylist import TokenDenylist
+from app.utils.jwt_manager import create_access_token, decode_jwt_token
+from app.utils.lru_cache import LRUCache
+
+
+USER_DB = {
+    "bench@example.com": {
+        "username": "bench@example.com",
+        "full_name": "Bench User",
+        "hashed_password": "not-used",
+        "disabled": False,
+    }
+}
+
+
+async def legacy_get_current_user(token: str) -> User:
+    payload = decode_jwt_token(token)
+    user = UserInDB(**USER_DB[payload.get("sub")])
+    return User(**user.model_dump())
+
+
+async def measure(call, tokens: list[str], requests: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        await call(tokens[i % len(tokens)])
+    return (time.perf_counter() - started) / requests
+
+
+async def main(args: argparse.Namespace) -> None:
+    tokens = [create_access_token({"sub": "bench@example.com", "n": n}, timedelta(minutes=60))
+              for n in range(args.tokens)]
+    denylist = TokenDenylist(RedisAdapter(client=fakeredis.FakeAsyncRedis(decode_responses=True)))
+    uncached = AuthService(USER_DB, denylist=denylist)
+    cached = AuthService(USER_DB, token_cache=LRUCache(4 * 1024 * 1024, default_ttl=60), denylist=denylist)
+
+    print(f"{args.requests} requests over {args.tokens} tokens")
+    print(f"{'dependency':<28} {'us/request':>11}")
+    for name, call in (("previous (decode + rebuild)", legacy_get_current_user),
+                       ("AuthService, no token cache", uncached.get_current_user),
+                       ("AuthService, token cache", cached.get_current_user)):
+        per_request = await measure(call, tokens, args.requests)
+        print(f"{name:<28} {per_request * 1e6:>11.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--tokens", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
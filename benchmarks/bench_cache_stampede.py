@@ -0,0 +1,103 @@
+"""
+Backend calls when 1000 concurrent requests hit an expired cache key.
+
+Compares the naive get-then-set pattern with ``get_or_compute`` for a cold
+key (single worker and several workers sharing Redis) and for a key that has
+expired but is still inside its stale window.
+
+    python -m benchmarks.bench_cache_stampede --requests 1000 --workers 4
+"""
+
+import time
+import asyncio
+import argparse
+
+from benchmarks.common import RedisStandIn, percentile
+from app.adapters.redis_adapter import RedisAdapter
+from app.services.cache_service import RedisCacheService
+
+
+class Backend:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    async def compute(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return '{"products": []}'
+
+
+async def fire(requests: int, workers: list, call) -> list:
+    latencies = []
+
+    async def one(i: int) -> None:
+        started = time.perf_counter()
+        await call(workers[i % len(workers)])
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+async def scenario(name: str, redis_url: str, args: argparse.Namespace, worker_count: int, mode: str) -> None:
+    adapters = [RedisAdapter(redis_url, max_connections=args.max_connections, socket_timeout=10,
+                             socket_connect_timeout=10, pool_timeout=10)
+                for _ in range(worker_count)]
+    services = [RedisCacheService(adapter) for adapter in adapters]
+    backend = Backend(args.backend_ms / 1000)
+    key = f"bench:stampede:{mode}:{worker_count}:{time.monotonic_ns()}"
+
+    if mode == "naive":
+        async def call(service: RedisCacheService) -> str:
+            value = await service.get_cached_response(key)
+            if value is None:
+                value = await backend.compute()
+                await service.cache_response(key, value, expire_time=300)
+            return value
+    else:
+        async def call(service: RedisCacheService) -> str:
+            return await service.get_or_compute(key, backend.compute, ttl=300)
+
+    if mode == "stale":
+        # Expired one second ago but still inside the stale window
+        value = services[0]._encode(time.time() - 1, args.backend_ms / 1000, await backend.compute())
+        await adapters[0].set(key, value, expire=60)
+        backend.calls = 0
+
+    latencies = await fire(args.requests, services, call)
+    await asyncio.sleep(args.backend_ms / 1000 * 2)  # let background refreshes finish
+    print(f"{name:<36} {backend.calls:>13} {percentile(latencies, 50) * 1000:>9.1f} {percentile(latencies, 99) * 1000:>9.1f}")
+    for adapter in adapters:
+        await adapter.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    stand_in = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        stand_in = RedisStandIn(latency_ms=args.latency_ms).start()
+        redis_url = stand_in.url
+
+    print(f"{args.requests} concurrent requests, backend takes {args.backend_ms} ms")
+    print(f"{'scenario':<36} {'backend calls':>13} {'p50 ms':>9} {'p99 ms':>9}")
+    try:
+        await scenario("naive get-then-set", redis_url, args, 1, "naive")
+        await scenario(f"naive get-then-set, {args.workers} workers", redis_url, args, args.workers, "naive")
+        await scenario("get_or_compute, cold key", redis_url, args, 1, "cold")
+        await scenario(f"get_or_compute, cold, {args.workers} workers", redis_url, args, args.workers, "cold")
+        await scenario(f"get_or_compute, stale, {args.workers} workers", redis_url, args, args.workers, "stale")
+    finally:
+        if stand_in is not None:
+            stand_in.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="Benchmark a real Redis instead of the local stand-in")
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="Simulated round trip of the stand-in")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--backend-ms", type=float, default=50)
+    parser.add_argument("--max-connections", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
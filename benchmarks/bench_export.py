@@ -0,0 +1,165 @@
+"""
+Peak memory and time to first byte of a full catalog read: the streamed
+NDJSON export against building the whole response first.
+
+Seeds ``--count`` products into a local Redis stand-in (only the stored JSON
+the reads use, plus the records when the ``list`` mode runs), then, for each
+mode, starts a fresh uvicorn process serving this module's app and reads
+the whole catalog from it over HTTP:
+
+    list         get_products(limit=count): Product models serialized by FastAPI
+    page         get_products_json(limit=count): one pre-serialized body
+    export       ProductService.export_json streamed as NDJSON
+    export-gzip  the same, gzipped chunk by chunk
+
+Reported per mode: time to first byte, total time, bytes received and the
+server's peak RSS above its RSS at startup. ``--slow-mbps`` adds an export
+read by a client capped at that rate, to show backpressure keeping memory
+flat. ``list`` needs several GB at a million products, so it is opt-in; at
+that size ``page`` may fail outright, its single MGET timing out.
+
+    python -m benchmarks.bench_export --count 1000000
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+
+import httpx
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+
+from benchmarks.common import RedisStandIn
+
+
+def build_app() -> FastAPI:
+    """
+    The app each server process runs (``uvicorn --factory``); reads REDIS_URL and EXPORT_COUNT.
+    """
+    from app.adapters.redis_adapter import RedisAdapter
+    from app.services.product_service import ProductService
+    from app.utils.streaming import gzip_chunks
+
+    app = FastAPI()
+    count = int(os.environ["EXPORT_COUNT"])
+    product_service = ProductService(RedisAdapter(os.environ["REDIS_URL"], socket_timeout=60))
+
+    @app.get("/list")
+    async def list_products():
+        return await product_service.get_products(limit=count)
+
+    @app.get("/page")
+    async def page() -> Response:
+        return Response(content=await product_service.get_products_json(limit=count), media_type="application/json")
+
+    @app.get("/export")
+    async def export() -> StreamingResponse:
+        return StreamingResponse(product_service.export_json(), media_type="application/x-ndjson")
+
+    @app.get("/export-gzip")
+    async def export_gzip() -> StreamingResponse:
+        return StreamingResponse(gzip_chunks(product_service.export_json()), media_type="application/x-ndjson",
+                                 headers={"Content-Encoding": "gzip"})
+
+    return app
+
+
+def seed(stand_in: RedisStandIn, args: argparse.Namespace, records: bool) -> None:
+    import redis
+    from app.db.fake_products import generate_product_rows
+
+    client = redis.Redis.from_url(stand_in.url, socket_timeout=60)
+    started = time.perf_counter()
+    for start in range(0, args.count, args.chunk_size):
+        rows = generate_product_rows(0, start, min(args.chunk_size, args.count - start))
+        pipe = client.pipeline(transaction=False)
+        for pid, _, product_json, record in rows:
+            pipe.set(f"product:{pid}:json", product_json)
+            if records:
+                pipe.set(f"product:{pid}", record)
+        pipe.execute()
+    client.set("product_id_counter", args.count)
+    client.close()
+    print(f"Seeded {args.count:,} products in {time.perf_counter() - started:.0f}s")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(mode: str, stand_in: RedisStandIn, args: argparse.Namespace, label: str = None,
+            mbps: float = 0.0) -> None:
+    port = free_port()
+    env = {**os.environ, "REDIS_URL": stand_in.url, "EXPORT_COUNT": str(args.count)}
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "benchmarks.bench_export:build_app", "--factory",
+                               "--port", str(port), "--log-level", "warning"], env=env)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+            while True:
+                try:
+                    client.get("/openapi.json")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.05)
+            startup_rss = memory_kb(server.pid, "VmRSS")
+
+            received = 0
+            first_byte = None
+            started = time.perf_counter()
+            with client.stream("GET", f"/{mode}") as response:
+                status = response.status_code
+                for chunk in response.iter_raw():
+                    first_byte = first_byte or time.perf_counter() - started
+                    received += len(chunk)
+                    if mbps:
+                        # Sleep until this client's capped rate allows the bytes read so far
+                        time.sleep(max(0.0, received / (mbps * 1e6) - (time.perf_counter() - started)))
+            elapsed = time.perf_counter() - started
+            peak = memory_kb(server.pid, "VmHWM")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    if status != 200:
+        print(f"{label or mode:<20} failed with HTTP {status} after {elapsed:.1f}s")
+        return
+    print(f"{label or mode:<20} {first_byte * 1000:>9.0f} {elapsed:>9.1f} {received / 1e6:>10.1f} "
+          f"{(peak - startup_rss) / 1024:>14.0f}")
+
+
+def main(args: argparse.Namespace) -> None:
+    with RedisStandIn(latency_ms=args.latency_ms) as stand_in:
+        seed(stand_in, args, records="list" in args.modes)
+        print(f"{'mode':<20} {'TTFB ms':>9} {'total s':>9} {'MB sent':>10} {'peak RSS +MB':>14}")
+        streamed = [mode for mode in args.modes if mode.startswith("export")]
+        for mode in streamed:
+            measure(mode, stand_in, args)
+        if args.slow_mbps:
+            measure("export", stand_in, args, label=f"export @ {args.slow_mbps:g} MB/s", mbps=args.slow_mbps)
+        # One-shot reads last: one that times out leaves the stand-in busy with its MGET for a while
+        for mode in args.modes:
+            if mode not in streamed:
+                measure(mode, stand_in, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000, help="Products in the catalog")
+    parser.add_argument("--modes", nargs="+", choices=["list", "page", "export", "export-gzip"],
+                        default=["page", "export", "export-gzip"])
+    parser.add_argument("--slow-mbps", type=float, default=0.0, help="Also export to a client reading this fast")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated Redis round trip")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Products written per seeding round trip")
+    main(parser.parse_args())
@@ -0,0 +1,99 @@
+"""
+Accuracy and Redis load of the hybrid local+Redis rate limiter.
+
+Simulates N gateway workers (each with its own limiter and connection pool)
+hammering one client's quota through the local Redis stand-in. For every lease
+size it reports admitted requests versus the token bucket's theoretical
+maximum (overshoot), Redis calls per request and check latency. The exact
+RedisRateLimiter token bucket is the baseline.
+
+    python -m benchmarks.bench_hybrid_rate_limiter --workers 4 --lease-sizes 1 5 20 50
+"""
+
+import time
+import asyncio
+import argparse
+
+from benchmarks.common import RedisStandIn, percentile
+from app.adapters.redis_adapter import RedisAdapter
+from app.models.rate_limit import RateLimitRule
+from app.services.rate_limit_service import RedisRateLimiter
+from app.services.hybrid_rate_limit_service import HybridRateLimiter
+
+
+async def simulate(redis_url: str, make_limiter, rule: RateLimitRule, args: argparse.Namespace) -> dict:
+    adapters = [RedisAdapter(redis_url) for _ in range(args.workers)]
+    limiters = [make_limiter(adapter) for adapter in adapters]
+    # Use a fresh client id per scenario so runs do not share buckets
+    client_id = f"client-{time.monotonic_ns()}"
+    admitted = 0
+    total = 0
+    latencies = []
+    deadline = time.monotonic() + args.duration
+
+    async def requester(limiter) -> None:
+        nonlocal admitted, total
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            result = await limiter.check_rate_limit(client_id, rule)
+            latencies.append(time.perf_counter() - started)
+            total += 1
+            admitted += result.allowed
+            await asyncio.sleep(args.think_ms / 1000)
+
+    started = time.monotonic()
+    await asyncio.gather(*(requester(limiter) for limiter in limiters for _ in range(args.concurrency)))
+    elapsed = time.monotonic() - started
+    for adapter in adapters:
+        await adapter.close()
+
+    redis_calls = sum(getattr(limiter, "stats", {}).get("redis_calls", 0) for limiter in limiters) or total
+    allowed_max = rule.capacity + rule.limit / rule.period * elapsed
+    return {
+        "requests": total,
+        "admitted": admitted,
+        "allowed_max": allowed_max,
+        "overshoot_pct": max(0.0, admitted - allowed_max) / allowed_max * 100,
+        "redis_per_request": redis_calls / total if total else 0.0,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    stand_in = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        stand_in = RedisStandIn(latency_ms=args.latency_ms).start()
+        redis_url = stand_in.url
+
+    rule = RateLimitRule(algorithm="token_bucket", limit=args.limit, period=args.period, scope="bench")
+    scenarios = [("exact token bucket", lambda adapter: RedisRateLimiter(adapter))]
+    for size in args.lease_sizes:
+        scenarios.append((f"hybrid lease={size}", lambda adapter, size=size: HybridRateLimiter(
+            adapter, lease_size=size, lease_ttl=args.lease_ttl)))
+
+    print(f"workers={args.workers} limit={args.limit}/{args.period}s duration={args.duration}s")
+    print(f"{'scenario':<22} {'requests':>9} {'admitted':>9} {'max':>7} {'overshoot %':>12} {'redis/req':>10} {'p99 ms':>8}")
+    try:
+        for name, make_limiter in scenarios:
+            stats = await simulate(redis_url, make_limiter, rule, args)
+            print(f"{name:<22} {stats['requests']:>9} {stats['admitted']:>9} {stats['allowed_max']:>7.0f} "
+                  f"{stats['overshoot_pct']:>12.2f} {stats['redis_per_request']:>10.3f} {stats['p99_ms']:>8.2f}")
+    finally:
+        if stand_in is not None:
+            stand_in.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="Benchmark a real Redis instead of the local stand-in")
+    parser.add_argument("--latency-ms", type=float, default=0.5, help="Simulated round trip of the stand-in")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requesters per worker")
+    parser.add_argument("--think-ms", type=float, default=1.0, help="Pause between requests of one requester")
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--period", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--lease-ttl", type=float, default=1.0)
+    parser.add_argument("--lease-sizes", type=int, nargs="+", default=[1, 5, 20, 50])
+    asyncio.run(main(parser.parse_args()))
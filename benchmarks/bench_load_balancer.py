@@ -0,0 +1,105 @@
+"""
+Proxied request latency and traffic share per balancing strategy.
+
+Starts local upstream servers (uvicorn, in threads) with different response
+times, proxies a concurrent request stream through ``ProxyService`` with each
+strategy, and reports latency percentiles plus the share of requests each
+server received. With ``--dead`` one extra server address refuses
+connections, to show passive ejection and connect retries.
+
+    python -m benchmarks.bench_load_balancer --delays-ms 5 5 50 --requests 2000 --concurrency 8
+"""
+
+import time
+import socket
+import asyncio
+import argparse
+import threading
+from collections import Counter
+
+import httpx
+import uvicorn
+from fastapi import Request
+
+import benchmarks.common  # noqa: F401  (configures the app environment)
+from benchmarks.common import percentile
+from app.models.upstream import UpstreamPoolConfig
+from app.services.proxy_service import ProxyService
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def upstream_app(name: str, delay: float):
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await asyncio.sleep(delay)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": name.encode()})
+    return app
+
+
+def start_upstream(name: str, delay: float) -> str:
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(upstream_app(name, delay), host="127.0.0.1", port=port,
+                                           log_level="error", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run(strategy: str, servers: list[str], args: argparse.Namespace) -> None:
+    proxy = ProxyService({"/": UpstreamPoolConfig(servers=servers, strategy=strategy, eject_seconds=60)})
+    pool = proxy.pools[0]
+
+    async def gateway(scope, receive, send):
+        response = await proxy.forward(Request(scope, receive), pool)
+        await response(scope, receive, send)
+
+    latencies, served = [], Counter()
+    queue = asyncio.Queue()
+    for _ in range(args.requests):
+        queue.put_nowait(None)
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.get("/work")
+            latencies.append(time.perf_counter() - started)
+            served[response.text if response.status_code == 200 else str(response.status_code)] += 1
+
+    transport = httpx.ASGITransport(app=gateway)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    await proxy.close()
+
+    shares = " ".join(f"{name}={count / args.requests:.0%}" for name, count in sorted(served.items()))
+    print(f"{strategy:<18} {percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} "
+          f"{args.requests / elapsed:>8.0f}  {shares}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    servers = [start_upstream(f"s{i}({delay:g}ms)", delay / 1000) for i, delay in enumerate(args.delays_ms)]
+    if args.dead:
+        servers.append(f"http://127.0.0.1:{free_port()}")
+    print(f"{'strategy':<18} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}  share of requests")
+    for strategy in args.strategies:
+        await run(strategy, servers, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delays-ms", type=float, nargs="+", default=[5, 5, 50], help="Response time per upstream")
+    parser.add_argument("--dead", action="store_true", help="Add an upstream that refuses connections")
+    parser.add_argument("--strategies", nargs="+", default=["round_robin", "least_outstanding", "peak_ewma"])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
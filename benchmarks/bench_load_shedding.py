@@ -0,0 +1,169 @@
+"""
+Goodput and latency under overload, with and without LoadSheddingMiddleware.
+
+The app under test spends ``--work-ms`` of CPU per product read and
+``--login-work-ms`` per login, yielding to the event loop between slices,
+so concurrent requests share the worker's CPU the way a real one does. The
+capacity of that app (requests per second for the read/login/health mix) is
+measured first; clients then arrive open loop (Poisson) at ``--load`` times
+that rate and give up after ``--timeout``. Goodput counts responses that
+succeeded within ``--slo-ms``; shed requests get their 503 immediately.
+
+    python -m benchmarks.bench_load_shedding --load 2 --duration 10
+"""
+
+import time
+import random
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI, Response
+
+import benchmarks.common  # noqa: F401  (configures the app environment)
+from benchmarks.common import percentile
+from app.middleware.load_shedding import LoadSheddingMiddleware
+
+
+ROUTES = {"/redis_health_check": "critical", "/token": "low"}
+MIX = [("health", "GET", "/redis_health_check", 0.05), ("products", "GET", "/products/", 0.75),
+       ("login", "POST", "/token", 0.20)]
+# Sent with every request, and taken for a token the gateway already verified, so reads are high priority
+TOKEN = "x"
+
+
+def burn(seconds: float) -> None:
+    until = time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        pass
+
+
+async def work(seconds: float, slice_seconds: float = 0.0005) -> None:
+    while seconds > 0:
+        burn(min(seconds, slice_seconds))
+        seconds -= slice_seconds
+        await asyncio.sleep(0)
+
+
+class VerifiedToken:
+    """
+    Stands in for the gateway's AuthService in the middleware's priority check.
+    """
+
+    @staticmethod
+    def is_verified(token: str) -> bool:
+        return token == TOKEN
+
+
+def build_app(algorithm: str, args: argparse.Namespace) -> FastAPI:
+    app = FastAPI()
+    app.state.gateway = SimpleNamespace(auth_service=VerifiedToken())
+    if algorithm != "off":
+        app.add_middleware(LoadSheddingMiddleware, algorithm=algorithm, latency_target=args.latency_target_ms / 1000,
+                           routes=ROUTES)
+
+    @app.get("/redis_health_check")
+    async def health() -> Response:
+        return Response(content=b'{"status":"ok"}', media_type="application/json")
+
+    @app.get("/products/")
+    async def products() -> Response:
+        await work(args.work_ms / 1000)
+        return Response(content=b'{"products":[]}', media_type="application/json")
+
+    @app.post("/token")
+    async def token() -> Response:
+        await work(args.login_work_ms / 1000)
+        return Response(content=b'{"access_token":"x"}', media_type="application/json")
+
+    return app
+
+
+def pick(rng: random.Random) -> tuple[str, str, str]:
+    roll = rng.random()
+    for name, method, path, share in MIX:
+        if roll < share:
+            return name, method, path
+        roll -= share
+    return MIX[-1][:3]
+
+
+async def capacity(args: argparse.Namespace) -> float:
+    """
+    Requests per second one client in a closed loop gets through the bare app.
+    """
+    rng = random.Random(1)
+    transport = httpx.ASGITransport(app=build_app("off", args))
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway",
+                                 headers={"Authorization": f"Bearer {TOKEN}"}) as client:
+        count = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < 1.0:
+            _, method, path = pick(rng)
+            await client.request(method, path)
+            count += 1
+        return count / (time.perf_counter() - started)
+
+
+async def run(algorithm: str, rate: float, args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=build_app(algorithm, args))
+    results: dict[str, list] = {name: [] for name, *_ in MIX}
+    tasks = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway",
+                                 headers={"Authorization": f"Bearer {TOKEN}"}) as client:
+        async def request(name: str, method: str, path: str) -> None:
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(client.request(method, path), args.timeout)
+                status = response.status_code
+            except TimeoutError:
+                status = None
+            results[name].append((status, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        next_arrival = 0.0
+        while next_arrival < args.duration:
+            # Start every arrival that is due, even when the loop fell behind
+            while next_arrival <= min(time.perf_counter() - started, args.duration):
+                tasks.append(asyncio.create_task(request(*pick(rng))))
+                next_arrival += rng.expovariate(rate)
+            await asyncio.sleep(max(0.0, next_arrival - (time.perf_counter() - started)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    slo = args.slo_ms / 1000
+    for name, outcomes in results.items():
+        ok = [latency for status, latency in outcomes if status == 200]
+        shed = sum(status == 503 for status, _ in outcomes)
+        timed_out = sum(status is None for status, _ in outcomes)
+        good = sum(latency <= slo for latency in ok)
+        print(f"{algorithm:<9} {name:<9} {len(outcomes):>8} {len(ok):>7} {shed:>7} {timed_out:>9} "
+              f"{good / elapsed:>10,.0f} {percentile(ok, 50) * 1000:>9.1f} {percentile(ok, 99) * 1000:>9.1f}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    measured = await capacity(args)
+    rate = measured * args.load
+    print(f"Capacity {measured:,.0f} req/s; offering {rate:,.0f} req/s ({args.load:g}x) for {args.duration:g}s, "
+          f"SLO {args.slo_ms:g} ms, clients give up after {args.timeout:g}s")
+    print(f"{'limit':<9} {'class':<9} {'offered':>8} {'ok':>7} {'shed':>7} {'timed out':>9} "
+          f"{'goodput/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for algorithm in args.algorithms:
+        await run(algorithm, rate, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--load", type=float, default=2.0, help="Offered load as a multiple of the capacity")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--work-ms", type=float, default=1.0, help="CPU time of a product read")
+    parser.add_argument("--login-work-ms", type=float, default=3.0, help="CPU time of a login")
+    parser.add_argument("--slo-ms", type=float, default=250.0, help="Latency a response must meet to count as goodput")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Seconds before a client gives up")
+    parser.add_argument("--latency-target-ms", type=float, default=100.0, help="Latency target of the aimd limit")
+    parser.add_argument("--algorithms", nargs="+", default=["off", "gradient", "aimd"])
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
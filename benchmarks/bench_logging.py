@@ -0,0 +1,112 @@
+"""
+Requests per second of a route that logs like ``/products/``, by logging setup.
+
+Each request writes two INFO lines (as the products route does) through the
+full ASGI stack, with logging disabled, with the previous synchronous
+FileHandler, with the queued JSON pipeline, and with the pipeline sampling
+INFO records. The queued setups are also drained at the end, so the writer
+thread cannot hide a backlog.
+
+    python -m benchmarks.bench_logging --requests 20000 --concurrency 16
+"""
+
+import os
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import httpx
+from fastapi import FastAPI, Response
+
+import benchmarks.common  # noqa: F401  (configures the app environment)
+from app.middleware.request_id import RequestIdMiddleware
+from app.utils.logger import (
+    AsyncQueueHandler, BatchingQueueListener, BatchingRotatingFileHandler, JsonFormatter, LogBuffer, SamplingFilter,
+)
+
+
+route_logger = logging.getLogger("app.routes")
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/products/")
+    async def products() -> Response:
+        username = "gyanranjan@gameopedia.com"
+        route_logger.info("User %s is attempting to access products.", username)
+        route_logger.info("Products successfully fetched for user %s", username)
+        return Response(content=b'{"products":[]}', media_type="application/json")
+
+    return app
+
+
+def sync_file(path: str):
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    return [handler], None
+
+
+def queued(path: str, sample_info: float = None):
+    file_handler = BatchingRotatingFileHandler(path, maxBytes=0, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    buffer = LogBuffer(100_000)
+    handler = AsyncQueueHandler(buffer)
+    if sample_info is not None:
+        handler.addFilter(SamplingFilter({logging.INFO: sample_info}))
+    listener = BatchingQueueListener(buffer, file_handler)
+    listener.start()
+    return [handler], listener
+
+
+async def run(name: str, setup, args: argparse.Namespace) -> None:
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers, root.level
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.log")
+        handlers, listener = setup(path) if setup else ([], None)
+        root.handlers = handlers
+        root.setLevel(logging.INFO if setup else logging.WARNING)
+        try:
+            transport = httpx.ASGITransport(app=build_app())
+            remaining = args.requests
+
+            async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+                async def client_loop() -> None:
+                    nonlocal remaining
+                    while remaining > 0:
+                        remaining -= 1
+                        await client.get("/products/")
+
+                started = time.perf_counter()
+                await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+                served = time.perf_counter() - started
+            if listener is not None:
+                listener.stop()
+            drained = time.perf_counter() - started
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+        finally:
+            for handler in handlers:
+                handler.close()
+            root.handlers, root.level = saved_handlers, saved_level
+    print(f"{name:<24} {args.requests / served:>10,.0f} {args.requests / drained:>14,.0f} {size / 1e6:>9.1f}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"{args.requests} requests, {args.concurrency} concurrent, 2 INFO lines per request")
+    print(f"{'logging':<24} {'req/s':>10} {'req/s drained':>14} {'log MB':>9}")
+    await run("disabled", None, args)
+    await run("sync FileHandler", sync_file, args)
+    await run("queued JSON", queued, args)
+    await run(f"queued JSON, INFO {args.sample:.0%}", lambda path: queued(path, args.sample), args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sample", type=float, default=0.1, help="Share of INFO records kept when sampling")
+    asyncio.run(main(parser.parse_args()))
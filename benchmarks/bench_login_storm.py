@@ -0,0 +1,107 @@
+"""
+/products/ latency while a storm of logins hits /token.
+
+Drives the real FastAPI app in-process (httpx ASGI transport, Redis through
+the local stand-in). Readers page through /products/ continuously; after a
+quiet phase, login clients start posting valid credentials to /token. With
+bcrypt verified inline every login stalls the event loop and the readers'
+p99 explodes; on the executor it stays flat, and logins beyond the
+admission limit are shed with 503 instead of queueing.
+
+    python -m benchmarks.bench_login_storm --modes inline thread process --logins 32
+"""
+
+import os
+import time
+import asyncio
+import argparse
+
+# Let the readers through the rate limiter; must be set before the app is imported
+os.environ.setdefault("RATE_LIMIT_DEFAULT", '{"algorithm": "fixed_window", "limit": 100000000, "period": 60}')
+
+import httpx
+
+from benchmarks.common import RedisStandIn, percentile
+from app.config.settings import env_settings
+from app.core.gateway_factory import GatewayFactory
+from app.db.fake_db import fake_users_db
+from app.main import app
+from app.utils.hashing import PasswordHasher
+from app.utils.jwt_manager import create_access_token
+
+
+USERNAME = "gyanranjan@gameopedia.com"
+PASSWORD = "Gyan@123"
+
+
+async def phase(client: httpx.AsyncClient, token: str, args: argparse.Namespace, logins: int) -> dict:
+    latencies = []
+    login_status: dict[int, int] = {}
+    deadline = time.monotonic() + args.duration
+
+    async def reader() -> None:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            response = await client.get("/products/?limit=10", headers={"Authorization": f"Bearer {token}"})
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    async def login() -> None:
+        while time.monotonic() < deadline:
+            response = await client.post("/token", data={"username": USERNAME, "password": PASSWORD})
+            login_status[response.status_code] = login_status.get(response.status_code, 0) + 1
+            if response.status_code == 503:
+                await asyncio.sleep(0.05)
+
+    await asyncio.gather(*(reader() for _ in range(args.readers)), *(login() for _ in range(logins)))
+    return {"p50": percentile(latencies, 50), "p99": percentile(latencies, 99), "logins": login_status}
+
+
+async def run(mode: str, redis_url: str, args: argparse.Namespace) -> None:
+    gateway = GatewayFactory.create_gateway(user_db=fake_users_db, redis_url=redis_url)
+    gateway.auth_service.hasher.close()
+    gateway.auth_service.hasher = None if mode == "inline" else PasswordHasher(
+        mode, max_workers=args.hash_workers, max_pending=args.max_pending)
+    app.state.gateway = gateway
+    await gateway.start()
+    await gateway.product_service.seed_products(100)
+    token = create_access_token({"sub": USERNAME})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        for name, logins in (("quiet", 0), ("login storm", args.logins)):
+            stats = await phase(client, token, args, logins)
+            outcomes = " ".join(f"{code}:{count}" for code, count in sorted(stats["logins"].items())) or "-"
+            print(f"{mode:<8} {name:<12} {stats['p50'] * 1000:>9.1f} {stats['p99'] * 1000:>9.1f}   {outcomes}")
+    await gateway.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    stand_in = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        stand_in = RedisStandIn(latency_ms=args.latency_ms).start()
+        redis_url = stand_in.url
+
+    print(f"{args.readers} readers on /products/, {args.logins} concurrent logins, "
+          f"{args.hash_workers} hash workers, admission limit {args.max_pending}")
+    print(f"{'mode':<8} {'phase':<12} {'p50 ms':>9} {'p99 ms':>9}   /token status:count")
+    try:
+        for mode in args.modes:
+            await run(mode, redis_url, args)
+    finally:
+        if stand_in is not None:
+            stand_in.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="Benchmark a real Redis instead of the local stand-in")
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="Simulated round trip of the stand-in")
+    parser.add_argument("--modes", nargs="+", choices=["inline", "thread", "process"], default=["inline", "thread"])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--hash-workers", type=int, default=env_settings.PASSWORD_HASH_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=env_settings.PASSWORD_HASH_MAX_PENDING)
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per phase")
+    asyncio.run(main(parser.parse_args()))
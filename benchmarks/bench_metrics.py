@@ -0,0 +1,102 @@
+"""
+Cost of the latency metrics: per observation, per request, and per scrape.
+
+First times a bare histogram observation and a timed block in a tight loop.
+Then serves a route through the full ASGI stack with metrics off and with
+MetricsMiddleware plus the stage timers a ``/products/`` request records
+(auth, rate limit, products), and reports the difference per request. Finally
+renders the registry the way ``/metrics`` does.
+
+    python -m benchmarks.bench_metrics --requests 20000 --concurrency 16
+"""
+
+import time
+import asyncio
+import argparse
+import contextlib
+
+import httpx
+from fastapi import FastAPI, Response
+
+import benchmarks.common  # noqa: F401  (configures the app environment)
+from app.middleware.metrics import MetricsMiddleware
+from app.utils.metrics import STAGE_SECONDS, HistogramValues, metrics
+
+
+STAGES = [STAGE_SECONDS.labels(stage) for stage in ("auth", "rate_limit", "products")]
+
+
+def micro(args: argparse.Namespace) -> None:
+    histogram = HistogramValues()
+    observe = histogram.observe
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        observe(0.0012)
+    observed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        with histogram.time():
+            pass
+    timed = time.perf_counter() - started
+    print(f"observe {observed / args.iterations * 1e6:.2f} us, timed block {timed / args.iterations * 1e6:.2f} us")
+
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+
+    @app.get("/products/")
+    async def products() -> Response:
+        for stage in STAGES:
+            with stage.time() if instrumented else contextlib.nullcontext():
+                pass
+        return Response(content=b'{"products":[]}', media_type="application/json")
+
+    return app
+
+
+async def run(instrumented: bool, args: argparse.Namespace) -> float:
+    transport = httpx.ASGITransport(app=build_app(instrumented))
+    remaining = args.requests
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        async def client_loop() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await client.get("/products/")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed / args.requests
+
+
+async def main(args: argparse.Namespace) -> None:
+    micro(args)
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, best of {args.rounds} rounds")
+    print(f"{'metrics':<10} {'req/s':>10} {'us/request':>11}")
+    best = {}
+    for _ in range(args.rounds):
+        for instrumented in (False, True):
+            cost = await run(instrumented, args)
+            best[instrumented] = min(best.get(instrumented, cost), cost)
+    for instrumented, name in ((False, "off"), (True, "on")):
+        print(f"{name:<10} {1 / best[instrumented]:>10,.0f} {best[instrumented] * 1e6:>11.1f}")
+    print(f"overhead {(best[True] - best[False]) * 1e6:.1f} us per request")
+
+    started = time.perf_counter()
+    text = metrics.render()
+    print(f"render {(time.perf_counter() - started) * 1000:.2f} ms for {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=1_000_000, help="Observations timed in the tight loop")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+"""
+Latency of ProductService.get_products by page size.
+
+Compares the cursor-paginated listing, one MGET per page, with the previous
+one-read-per-id loop. With a simulated round trip the legacy loop grows
+linearly with page size while the pipelined page stays close to one RTT.
+
+    python -m benchmarks.bench_product_listing --latency-ms 0.5 --page-sizes 10 100 1000
+"""
+
+import time
+import asyncio
+import argparse
+
+from benchmarks.common import RedisStandIn, summarize
+from app.adapters.redis_adapter import RedisAdapter
+from app.models.product import Product
+from app.services.product_service import ProductService
+from app.utils.product_codec import decode_product
+
+
+async def seed(adapter: RedisAdapter, count: int) -> None:
+    await ProductService(adapter).seed_products(count)
+
+
+async def legacy_get_products(service: ProductService, limit: int) -> list:
+    products = []
+    for pid in range(limit):
+        record = await service.redis_adapter.get_bytes(service.record_key(pid))
+        if record:
+            products.append(Product(id=pid, **decode_product(record)))
+    return products
+
+
+async def measure(func, repeat: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        call_started = time.perf_counter()
+        await func()
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def main(args: argparse.Namespace) -> None:
+    stand_in = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        stand_in = RedisStandIn(latency_ms=args.latency_ms).start()
+        redis_url = stand_in.url
+
+    adapter = RedisAdapter(redis_url)
+    service = ProductService(adapter)
+    try:
+        await seed(adapter, max(args.page_sizes))
+        print(f"{'page size':>10} {'legacy p50 ms':>15} {'pipelined p50 ms':>18} {'pipelined p99 ms':>18}")
+        for size in args.page_sizes:
+            legacy = await measure(lambda: legacy_get_products(service, size), args.repeat)
+            pipelined = await measure(lambda: service.get_products(limit=size), args.repeat)
+            print(f"{size:>10} {legacy['p50_ms']:>15.2f} {pipelined['p50_ms']:>18.2f} {pipelined['p99_ms']:>18.2f}")
+    finally:
+        await adapter.close()
+        if stand_in is not None:
+            stand_in.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="Benchmark a real Redis instead of the local stand-in")
+    parser.add_argument("--latency-ms", type=float, default=0.5, help="Simulated round trip of the stand-in")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 50, 100, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
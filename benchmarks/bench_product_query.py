@@ -0,0 +1,82 @@
+"""
+Latency of indexed product queries by catalog size.
+
+Seeds catalogs of increasing size (with their secondary indexes) into the
+local Redis stand-in and times ``query_products_json`` for a few filter and
+sort combinations, against the alternative the indexes replace: fetching
+every product record and filtering in Python.
+
+    python -m benchmarks.bench_product_query --catalog-sizes 1000 10000 50000
+"""
+
+import time
+import asyncio
+import argparse
+
+from benchmarks.common import RedisStandIn, percentile
+from app.adapters.redis_adapter import RedisAdapter
+from app.models.product import ProductQuery
+from app.services.product_service import ProductService
+from app.utils.product_codec import decode_product
+
+
+QUERIES = {
+    "category": ProductQuery(category="Laptop", limit=20),
+    "category+color by price": ProductQuery(category="Laptop", color="Red", sort="price", order="desc", limit=20),
+    "price range by rating": ProductQuery(min_price=100, max_price=200, sort="rating", order="desc", limit=20),
+    "rating+date by stock": ProductQuery(min_rating=4.5, released_after="2023-01-01", sort="stock", limit=20),
+}
+
+
+async def scan_query(service: ProductService, count: int) -> list[dict]:
+    """
+    The unindexed equivalent of the "category" query.
+    """
+    records = await service.redis_adapter.mget_bytes([service.record_key(pid) for pid in range(count)])
+    rows = [decode_product(record) for record in records if record is not None]
+    return [row for row in rows if row["category"] == "Laptop"][:20]
+
+
+async def timed(call, repeat: int) -> list[float]:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run(size: int, redis_url: str, args: argparse.Namespace) -> None:
+    adapter = RedisAdapter(redis_url, socket_timeout=60, socket_connect_timeout=60)
+    service = ProductService(adapter)
+    await service.seed_products(size, chunk_size=2000)
+
+    for name, query in QUERIES.items():
+        latencies = await timed(lambda: service.query_products_json(query), args.repeat)
+        print(f"{size:>9} {name:<26} {percentile(latencies, 50) * 1000:>9.2f} {percentile(latencies, 99) * 1000:>9.2f}")
+    if size <= args.max_scan_size:
+        latencies = await timed(lambda: scan_query(service, size), max(1, args.repeat // 10))
+        print(f"{size:>9} {'category, full scan':<26} {percentile(latencies, 50) * 1000:>9.2f} "
+              f"{percentile(latencies, 99) * 1000:>9.2f}")
+    await adapter.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"{'catalog':>9} {'query':<26} {'p50 ms':>9} {'p99 ms':>9}")
+    for size in args.catalog_sizes:
+        if args.redis_url is not None:
+            await run(size, args.redis_url, args)
+            continue
+        # A fresh stand-in per size so earlier catalogs do not linger
+        with RedisStandIn(latency_ms=args.latency_ms) as stand_in:
+            await run(size, stand_in.url, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="Benchmark a real Redis instead of the local stand-in")
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="Simulated round trip of the stand-in")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--max-scan-size", type=int, default=10000, help="Skip the full scan above this size")
+    asyncio.run(main(parser.parse_args()))
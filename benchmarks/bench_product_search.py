@@ -0,0 +1,103 @@
+"""
+Latency of free-text product search and autocomplete by catalog size.
+
+The in-memory index is built straight from generated products (no Redis)
+so large catalogs fit in a quick run; the Redis index is seeded into the
+local stand-in. Queries use terms picked from the built index: the most
+common one, a mid-frequency one and both together.
+
+    python -m benchmarks.bench_product_search --memory-sizes 100000 1000000 --redis-sizes 10000
+"""
+
+import time
+import asyncio
+import argparse
+
+from benchmarks.common import RedisStandIn, percentile
+from app.adapters.redis_adapter import RedisAdapter
+from app.db.fake_products import generate_product_rows
+from app.services.product_service import ProductService
+from app.services.search_service import InMemorySearchIndex, RedisSearchIndex
+
+
+def pick_queries(index: InMemorySearchIndex) -> dict[str, str]:
+    by_frequency = sorted(index._postings, key=lambda term: len(index._postings[term]))
+    common, middle = by_frequency[-1], by_frequency[len(by_frequency) // 2]
+    return {
+        f"common ({common})": common,
+        f"mid ({middle})": middle,
+        "common + mid": f"{common} {middle}",
+        f"suggest ({common[:2]}*)": common[:2],
+    }
+
+
+async def timed(call, repeat: int) -> list[float]:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def report(backend: str, size: int, index, queries: dict[str, str], repeat: int) -> None:
+    for name, text in queries.items():
+        if name.startswith("suggest"):
+            call = lambda: index.suggest(text, limit=10)  # noqa: E731
+        else:
+            call = lambda: index.search(text, limit=10)  # noqa: E731
+        # The first call of a term also merges its freshly indexed postings
+        cold = await timed(call, 1)
+        latencies = await timed(call, repeat)
+        print(f"{backend:<7} {size:>9} {name:<28} {cold[0] * 1000:>9.2f} {percentile(latencies, 50) * 1000:>9.2f} "
+              f"{percentile(latencies, 99) * 1000:>9.2f}")
+
+
+def build_memory_index(size: int, chunk_size: int = 10000) -> InMemorySearchIndex:
+    index = InMemorySearchIndex()
+    started = time.perf_counter()
+    for start in range(0, size, chunk_size):
+        for pid, mapping, _, _ in generate_product_rows(0, start, min(chunk_size, size - start)):
+            index.add(None, pid, mapping)
+    elapsed = time.perf_counter() - started
+    postings = sum(map(len, index._postings.values()))
+    print(f"# memory {size}: built in {elapsed:.1f}s (including generation), {len(index._postings):,} terms, "
+          f"{postings:,} postings, {postings * 8 / 1024 / 1024:.1f} MiB of posting arrays")
+    return index
+
+
+async def run_redis(size: int, redis_url: str, queries: dict[str, str], repeat: int) -> None:
+    adapter = RedisAdapter(redis_url, socket_timeout=60, socket_connect_timeout=60)
+    index = RedisSearchIndex(adapter)
+    await ProductService(adapter, index).seed_products(size, chunk_size=2000)
+    await report("redis", size, index, queries, repeat)
+    await adapter.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    queries = None
+    for size in args.memory_sizes:
+        index = build_memory_index(size)
+        queries = queries or pick_queries(index)
+        if size == args.memory_sizes[0]:
+            print(f"{'backend':<7} {'catalog':>9} {'query':<28} {'cold ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+        await report("memory", size, index, queries, args.repeat)
+        del index
+
+    for size in args.redis_sizes:
+        queries = queries or pick_queries(build_memory_index(size))
+        if args.redis_url is not None:
+            await run_redis(size, args.redis_url, queries, args.repeat)
+            continue
+        with RedisStandIn(latency_ms=args.latency_ms) as stand_in:
+            await run_redis(size, stand_in.url, queries, args.repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="Benchmark a real Redis instead of the local stand-in")
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="Simulated round trip of the stand-in")
+    parser.add_argument("--memory-sizes", type=int, nargs="*", default=[10000, 100000])
+    parser.add_argument("--redis-sizes", type=int, nargs="*", default=[10000])
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
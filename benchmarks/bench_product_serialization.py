@@ -0,0 +1,69 @@
+"""
+CPU time to build one /products/ response body by page size.
+
+Compares the previous path (Redis hash strings -> pydantic ``Product`` with
+Decimal parsing -> ``jsonable_encoder`` -> JSON encoder) with the
+pre-serialized path (stored JSON per product, concatenated into the body).
+Redis is left out so only the per-request CPU work is measured.
+
+    python -m benchmarks.bench_product_serialization --page-sizes 10 100 1000
+"""
+
+import json
+import time
+import argparse
+
+from fastapi.encoders import jsonable_encoder
+
+import benchmarks.common  # noqa: F401  (configures the app environment)
+from app.db.fake_products import generate_product_rows
+from app.services.product_service import ProductService
+from app.utils import json_codec
+
+
+def hash_rows(count: int) -> list[dict]:
+    """
+    Products as HGETALL returns them: every field a string.
+    """
+    return [{name: str(value) for name, value in mapping.items()}
+            for _, mapping, _, _ in generate_product_rows(0, 0, count)]
+
+
+def legacy_body(rows: list[dict]) -> bytes:
+    products = [ProductService._to_product(pid, dict(row)) for pid, row in enumerate(rows)]
+    content = jsonable_encoder({"products": products, "next_cursor": "djE6MTA"})
+    # What JSONResponse.render does
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def fast_body(items: list[str]) -> bytes:
+    return ProductService.assemble_page(items, "djE6MTA")
+
+
+def cpu_per_call(func, arg, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        func(arg)
+    return (time.process_time() - started) / repeat
+
+
+def main(args: argparse.Namespace) -> None:
+    rows = hash_rows(max(args.page_sizes))
+    items = [ProductService.serialize(ProductService._to_product(pid, dict(row))) for pid, row in enumerate(rows)]
+    assert legacy_body(rows[:10]) == fast_body(items[:10]), "both paths must produce the same body"
+
+    encoder = "orjson" if json_codec.orjson is not None else "json"
+    print(f"CPU time per response (envelope encoder: {encoder})")
+    print(f"{'page size':>10} {'legacy us':>12} {'pre-serialized us':>18} {'speedup':>9}")
+    for size in args.page_sizes:
+        repeat = max(1, args.products // size)
+        legacy = cpu_per_call(legacy_body, rows[:size], repeat)
+        fast = cpu_per_call(fast_body, items[:size], repeat)
+        print(f"{size:>10} {legacy * 1e6:>12.1f} {fast * 1e6:>18.1f} {legacy / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--products", type=int, default=100_000, help="Products serialized per page size")
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+"""
+Redis round trips and latency of rate-limit checks with and without batching.
+
+Bursts of concurrent checks (one per simulated request, spread over many
+clients) are issued in the same event-loop iteration, the way a traffic spike
+reaches ``RequestHandler.rate_limit``. Reports checks/s, Redis round trips/s
+and p99 check latency for the direct limiter and for several batch delays.
+
+    python -m benchmarks.bench_rate_limit_batching --burst 200 --delays-ms 0 0.5 2
+"""
+
+import time
+import asyncio
+import argparse
+
+from benchmarks.common import RedisStandIn, percentile
+from app.adapters.redis_adapter import RedisAdapter
+from app.models.rate_limit import RateLimitRule
+from app.services.rate_limit_service import RedisRateLimiter
+from app.services.batching_rate_limit_service import BatchingRateLimiter
+
+
+async def run_bursts(limiter, rule: RateLimitRule, args: argparse.Namespace) -> dict:
+    latencies = []
+
+    async def check(client: int) -> None:
+        started = time.perf_counter()
+        await limiter.check_rate_limit(f"client-{client}", rule)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(args.bursts):
+        await asyncio.gather(*(check(i % args.clients) for i in range(args.burst)))
+    elapsed = time.perf_counter() - started
+
+    stats = getattr(limiter, "stats", None)
+    round_trips = stats["batches"] if stats else len(latencies)
+    return {
+        "checks_per_s": len(latencies) / elapsed,
+        "round_trips_per_s": round_trips / elapsed,
+        "mean_batch": len(latencies) / round_trips,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    stand_in = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        stand_in = RedisStandIn(latency_ms=args.latency_ms).start()
+        redis_url = stand_in.url
+
+    rule = RateLimitRule(algorithm="gcra", limit=1_000_000, period=60, scope="bench")
+    adapter = RedisAdapter(redis_url, max_connections=args.max_connections)
+    limiter = RedisRateLimiter(adapter)
+    scenarios = [("direct", limiter)]
+    for delay in args.delays_ms:
+        scenarios.append((f"batched delay={delay}ms",
+                          BatchingRateLimiter(limiter, max_delay=delay / 1000, max_batch_size=args.max_batch_size)))
+
+    print(f"bursts={args.bursts} x {args.burst} checks over {args.clients} clients")
+    print(f"{'scenario':<24} {'checks/s':>10} {'redis RT/s':>11} {'mean batch':>11} {'p99 ms':>8}")
+    try:
+        for name, scenario in scenarios:
+            stats = await run_bursts(scenario, rule, args)
+            print(f"{name:<24} {stats['checks_per_s']:>10,.0f} {stats['round_trips_per_s']:>11,.0f} "
+                  f"{stats['mean_batch']:>11.1f} {stats['p99_ms']:>8.2f}")
+    finally:
+        await adapter.close()
+        if stand_in is not None:
+            stand_in.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="Benchmark a real Redis instead of the local stand-in")
+    parser.add_argument("--latency-ms", type=float, default=0.5, help="Simulated round trip of the stand-in")
+    parser.add_argument("--max-connections", type=int, default=50)
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=200, help="Concurrent checks per burst")
+    parser.add_argument("--clients", type=int, default=50, help="Distinct client ids in a burst")
+    parser.add_argument("--max-batch-size", type=int, default=128)
+    parser.add_argument("--delays-ms", type=float, nargs="+", default=[0, 0.5, 2])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+"""
+Throughput of the asyncio RedisAdapter versus the previous synchronous adapter.
+
+Both adapters are driven from the same number of concurrent coroutines, the way
+the services call them from ``async def`` request handlers. The synchronous
+client blocks the event loop on every round trip, so its throughput stays flat
+as concurrency grows; the pooled asyncio client overlaps round trips.
+
+    python -m benchmarks.bench_redis_adapter --latency-ms 1 --concurrency 1 10 100
+"""
+
+import time
+import asyncio
+import argparse
+
+import redis
+
+from benchmarks.common import RedisStandIn, format_row, summarize
+from app.adapters.redis_adapter import RedisAdapter
+
+
+class SyncRedisAdapter:
+    """
+    The synchronous adapter this benchmark compares against.
+    """
+    def __init__(self, redis_url: str):
+        self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+
+    async def get(self, key: str) -> str:
+        return self.redis.get(key)
+
+    async def incr(self, key: str) -> int:
+        return self.redis.incr(key)
+
+    async def close(self) -> None:
+        self.redis.close()
+
+
+async def run_load(adapter, concurrency: int, operations: int) -> dict:
+    latencies = []
+    per_worker = max(1, operations // concurrency)
+
+    async def worker(worker_id: int) -> None:
+        key = f"bench:counter:{worker_id}"
+        for _ in range(per_worker):
+            started = time.perf_counter()
+            await adapter.incr(key)
+            await adapter.get(key)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def main(args: argparse.Namespace) -> None:
+    stand_in = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        stand_in = RedisStandIn(latency_ms=args.latency_ms).start()
+        redis_url = stand_in.url
+
+    print(f"target={redis_url} operations={args.operations} (INCR+GET per op)")
+    try:
+        for concurrency in args.concurrency:
+            sync_adapter = SyncRedisAdapter(redis_url)
+            async_adapter = RedisAdapter(redis_url, max_connections=args.max_connections)
+            sync_stats = await run_load(sync_adapter, concurrency, args.operations)
+            async_stats = await run_load(async_adapter, concurrency, args.operations)
+            await sync_adapter.close()
+            await async_adapter.close()
+            print(f"-- concurrency {concurrency}")
+            print(format_row("sync adapter", sync_stats))
+            print(format_row("async pooled adapter", async_stats))
+    finally:
+        if stand_in is not None:
+            stand_in.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="Benchmark a real Redis instead of the local stand-in")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Simulated round trip of the stand-in")
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--max-connections", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100])
+    asyncio.run(main(parser.parse_args()))
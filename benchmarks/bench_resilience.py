@@ -0,0 +1,120 @@
+"""
+Request latency and success rate while Redis hangs, with and without the
+resilience layer.
+
+Each request checks its rate limit and reads a cached value through
+``get_or_compute``, under a per-request deadline. The local Redis stand-in is
+healthy, then stops answering for ``--fault-seconds`` (every call hangs until
+the socket timeout), then recovers. Without the resilience layer every
+request waits out the socket timeout; with it the circuit opens after a few
+failures, rate limiting falls back to ``--failure-mode`` and the cache serves
+last known values, so requests keep succeeding fast and traffic goes back to
+Redis once a probe succeeds. Fault injection needs the stand-in, so there is
+no ``--redis-url``.
+
+    python -m benchmarks.bench_resilience --fault-seconds 3 --concurrency 32
+"""
+
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+
+from benchmarks.common import RedisStandIn, percentile
+from app.adapters.redis_adapter import RedisAdapter
+from app.models.rate_limit import RateLimitRule
+from app.services.cache_service import RedisCacheService
+from app.services.fallback_rate_limit_service import FallbackRateLimiter
+from app.services.rate_limit_service import RedisRateLimiter
+from app.utils.lru_cache import LRUCache
+from app.utils.resilience import CircuitBreaker, ResiliencePolicy, RetryBudget, deadline
+
+
+PHASES = ("healthy", "fault", "recovered")
+
+
+async def run(name: str, stand_in: RedisStandIn, args: argparse.Namespace, resilient: bool) -> None:
+    stand_in.latency = args.latency_ms / 1000
+    resilience = None
+    if resilient:
+        resilience = ResiliencePolicy(CircuitBreaker("redis", failure_threshold=args.breaker_failures,
+                                                     recovery_time=args.breaker_recovery),
+                                      RetryBudget())
+    adapter = RedisAdapter(stand_in.url, max_connections=args.concurrency, socket_timeout=args.socket_timeout,
+                           socket_connect_timeout=args.socket_timeout, pool_timeout=args.socket_timeout,
+                           resilience=resilience)
+    rule = RateLimitRule(algorithm="gcra", limit=1_000_000, period=1)
+    limiter = RedisRateLimiter(adapter, rule)
+    cache = RedisCacheService(adapter, last_known=LRUCache(1024 * 1024, 300) if resilient else None)
+    if resilient:
+        limiter = FallbackRateLimiter(limiter, args.failure_mode, default_rule=rule)
+
+    async def compute() -> str:
+        return '{"products": []}'
+
+    phase = "healthy"
+    results = defaultdict(lambda: {"ok": 0, "failed": 0, "latencies": []})
+
+    async def request(client: int) -> None:
+        started = time.perf_counter()
+        try:
+            with deadline(args.deadline_ms / 1000):
+                limit = await limiter.check_rate_limit(f"client:{client % 100}", rule)
+                if limit.allowed:
+                    await cache.get_or_compute(f"bench:resilience:{client % 10}", compute, ttl=1)
+            results[phase]["ok"] += 1
+        except Exception:
+            results[phase]["failed"] += 1
+        results[phase]["latencies"].append(time.perf_counter() - started)
+
+    async def client_loop(client: int, stop_at: float) -> None:
+        while time.monotonic() < stop_at:
+            await request(client)
+            # Answers served without touching Redis never suspend; let the other clients run
+            await asyncio.sleep(0)
+
+    async def timeline() -> None:
+        nonlocal phase
+        await asyncio.sleep(args.phase_seconds)
+        phase = "fault"
+        stand_in.latency = 3600.0  # Redis stops answering
+        await asyncio.sleep(args.fault_seconds)
+        phase = "recovered"
+        stand_in.latency = args.latency_ms / 1000
+
+    stop_at = time.monotonic() + 2 * args.phase_seconds + args.fault_seconds
+    await asyncio.gather(timeline(), *(client_loop(client, stop_at) for client in range(args.concurrency)))
+    await adapter.close()
+
+    for current in PHASES:
+        stats = results[current]
+        total = stats["ok"] + stats["failed"]
+        latencies = stats["latencies"]
+        print(f"{name:<12} {current:<10} {total:>9} {stats['ok'] / total if total else 0:>8.1%} "
+              f"{percentile(latencies, 50) * 1000:>9.1f} {percentile(latencies, 99) * 1000:>9.1f}")
+    if resilience is not None:
+        print(f"{'':<12} breaker {resilience.breaker.stats}, rate limit fallbacks {limiter.stats['fallbacks']}, "
+              f"served on error {cache.stampede_stats['served_on_error']}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    with RedisStandIn(latency_ms=args.latency_ms) as stand_in:
+        print(f"Redis hangs for {args.fault_seconds:g}s; socket timeout {args.socket_timeout * 1000:g} ms, "
+              f"deadline {args.deadline_ms:g} ms, {args.concurrency} concurrent clients")
+        print(f"{'layer':<12} {'phase':<10} {'requests':>9} {'success':>8} {'p50 ms':>9} {'p99 ms':>9}")
+        await run("none", stand_in, args, resilient=False)
+        await run("resilient", stand_in, args, resilient=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="Simulated round trip of the stand-in")
+    parser.add_argument("--phase-seconds", type=float, default=2.0, help="Healthy time before and after the fault")
+    parser.add_argument("--fault-seconds", type=float, default=3.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--socket-timeout", type=float, default=0.5)
+    parser.add_argument("--deadline-ms", type=float, default=1000)
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    parser.add_argument("--breaker-recovery", type=float, default=1.0)
+    parser.add_argument("--failure-mode", choices=["open", "closed", "local"], default="local")
+    asyncio.run(main(parser.parse_args()))
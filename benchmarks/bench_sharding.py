@@ -0,0 +1,145 @@
+"""
+Key distribution, key movement and throughput of ShardedRedisAdapter.
+
+Distribution: how evenly ``--keys`` client rate-limit keys spread over N
+nodes for each number of virtual nodes (busiest node's share over the fair
+share). Movement: the share of keys that change node when one node is
+added or removed, next to the ideal 1/N and to ``hash % N`` placement.
+Throughput: rate limit checks per second from ``--concurrency`` clients
+against 1, 2, 4... local stand-ins, each modelling Redis's single command
+thread with ``--service-ms`` per command. Throughput needs the stand-ins,
+so there is no ``--redis-url``. Before measuring, each run checks that
+scripts queued on the sharded pipeline run on their key's node, in order
+with the plain commands queued around them.
+
+    python -m benchmarks.bench_sharding --nodes 1 2 4 --service-ms 2
+"""
+
+import time
+import asyncio
+import argparse
+import contextlib
+from collections import Counter
+
+from benchmarks.common import RedisStandIn, percentile
+from app.adapters.redis_adapter import RedisAdapter
+from app.adapters.sharded_redis_adapter import ShardedRedisAdapter
+from app.models.rate_limit import RateLimitRule
+from app.services.rate_limit_service import RedisRateLimiter
+from app.utils.hash_ring import HashRing, hash_tag
+
+
+RULE = RateLimitRule(algorithm="gcra", limit=100_000_000, period=60)
+# Slow enough that the state a check writes outlives the pipeline
+CHECK_RULE = RateLimitRule(algorithm="gcra", limit=10, period=60)
+
+
+def client_keys(count: int) -> list[str]:
+    limiter = RedisRateLimiter.ALGORITHMS["gcra"]
+    return [limiter.key(limiter, f"user-{i}", RULE) for i in range(count)]
+
+
+def distribution(keys: list[str], args: argparse.Namespace) -> None:
+    print(f"Distribution of {len(keys):,} keys: busiest node's share / fair share")
+    print(f"{'vnodes':>8} " + " ".join(f"{f'{n} nodes':>9}" for n in args.node_counts))
+    for vnodes in args.vnodes:
+        cells = []
+        for count in args.node_counts:
+            ring = HashRing([f"node-{i}" for i in range(count)], vnodes=vnodes)
+            load = Counter(ring.node_for(key) for key in keys)
+            cells.append(f"{max(load.values()) / (len(keys) / count):>9.3f}")
+        print(f"{vnodes:>8} " + " ".join(cells))
+
+
+def movement(keys: list[str], args: argparse.Namespace) -> None:
+    print(f"\nKeys moved when the cluster changes ({args.vnodes[-1]} vnodes)")
+    print(f"{'change':<10} {'ring':>8} {'ideal':>8} {'hash % N':>9}")
+    for count in args.node_counts:
+        nodes = [f"node-{i}" for i in range(count)]
+        ring = HashRing(nodes, vnodes=args.vnodes[-1])
+        before = [ring.node_for(key) for key in keys]
+        ring.add(f"node-{count}")
+        after_add = [ring.node_for(key) for key in keys]
+        ring.remove(nodes[0])
+        after_remove = [ring.node_for(key) for key in keys]
+
+        hashes = [HashRing.hash(hash_tag(key)) for key in keys]
+        modulo_moved = sum(h % count != h % (count + 1) for h in hashes) / len(keys)
+        added = sum(a != b for a, b in zip(before, after_add)) / len(keys)
+        removed = sum(a != b for a, b in zip(after_add, after_remove)) / len(keys)
+        print(f"{f'{count} -> {count + 1}':<10} {added:>8.1%} {1 / (count + 1):>8.1%} {modulo_moved:>9.1%}")
+        print(f"{f'{count + 1} -> {count}':<10} {removed:>8.1%} {1 / (count + 1):>8.1%}")
+
+
+async def check_scripted_pipeline(adapter: ShardedRedisAdapter, limiter: RedisRateLimiter, clients: int = 64) -> None:
+    """
+    One sharded pipeline of a rate limit script and an EXISTS of its key per
+    client: every script must reply, and its key must exist when the EXISTS
+    right behind it runs on the same node.
+    """
+    scripted = limiter.limiter_for(CHECK_RULE)
+    keys = [scripted.key(f"pipeline-check-{i}", CHECK_RULE) for i in range(clients)]
+    async with adapter.pipeline() as pipe:
+        for key in keys:
+            scripted.script(keys=[key], args=scripted.args(CHECK_RULE), client=pipe)
+            pipe.exists(key)
+        replies = await pipe.execute()
+    assert len(replies) == 2 * len(keys), f"{len(replies)} replies for {2 * len(keys)} queued commands"
+    for key, reply, exists in zip(keys, replies[::2], replies[1::2]):
+        assert isinstance(reply, list), f"script for {key} on {adapter.node_for(key)} did not run: {reply!r}"
+        assert scripted.parse(reply, CHECK_RULE).allowed, f"script for {key} on {adapter.node_for(key)} replied {reply}"
+        assert exists == 1, f"{key} missing on {adapter.node_for(key)} after its script ran"
+    await adapter.delete(*keys)
+
+
+async def throughput(count: int, args: argparse.Namespace) -> None:
+    with contextlib.ExitStack() as stack:
+        stand_ins = [stack.enter_context(RedisStandIn(latency_ms=args.latency_ms, service_ms=args.service_ms))
+                     for _ in range(count)]
+        adapter = ShardedRedisAdapter({f"node-{i}": RedisAdapter(stand_in.url, max_connections=args.concurrency)
+                                       for i, stand_in in enumerate(stand_ins)})
+        limiter = RedisRateLimiter(adapter, RULE)
+        await check_scripted_pipeline(adapter, limiter)
+        latencies = []
+        stop_at = time.monotonic() + args.duration
+
+        async def client(index: int) -> None:
+            i = index
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                await limiter.check_rate_limit(f"user-{i % args.clients}", RULE)
+                latencies.append(time.perf_counter() - started)
+                i += args.concurrency
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(index) for index in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        await adapter.close()
+    print(f"{count:>6} {len(latencies) / elapsed:>12,.0f} {percentile(latencies, 50) * 1000:>9.2f} "
+          f"{percentile(latencies, 99) * 1000:>9.2f}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    keys = client_keys(args.keys)
+    distribution(keys, args)
+    movement(keys, args)
+
+    print(f"\nRate limit checks, {args.concurrency} concurrent clients, {args.service_ms:g} ms per command "
+          f"(one node serves at most {1000 / args.service_ms:,.0f}/s), {args.latency_ms:g} ms round trip")
+    print(f"{'nodes':>6} {'checks/s':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    for count in args.nodes:
+        await throughput(count, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="Simulated round trip of the stand-ins")
+    parser.add_argument("--service-ms", type=float, default=2.0, help="Server time per command on each stand-in")
+    parser.add_argument("--keys", type=int, default=100_000, help="Client keys placed in the distribution tests")
+    parser.add_argument("--node-counts", type=int, nargs="+", default=[2, 3, 4, 8])
+    parser.add_argument("--vnodes", type=int, nargs="+", default=[1, 40, 160, 640])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1, 2, 4], help="Stand-ins in the throughput test")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=10_000, help="Distinct client ids checked")
+    parser.add_argument("--duration", type=float, default=3.0)
+    asyncio.run(main(parser.parse_args()))
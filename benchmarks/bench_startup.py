@@ -0,0 +1,129 @@
+"""
+Cold start and time to ready by worker count: the prefork launcher
+(``python -m app.server``) against ``uvicorn --workers``.
+
+For each worker count and mode the server is started against a fresh Redis
+stand-in, then ``/ready`` is polled over new connections. Reported: seconds
+until the first HTTP response (cold start), until every worker answered
+``/ready`` with 200 (time to ready), and the proportional memory (PSS) of
+the whole process tree at that point, which shows the pages forked workers
+share with the launcher.
+
+    python -m benchmarks.bench_startup --workers 1 2 4
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import argparse
+import subprocess
+import http.client
+from typing import Optional
+
+from benchmarks.common import RedisStandIn
+
+
+MODES = {
+    "prefork": lambda workers, port: [sys.executable, "-m", "app.server", "--workers", str(workers),
+                                      "--port", str(port)],
+    "uvicorn": lambda workers, port: [sys.executable, "-m", "uvicorn", "app.main:app", "--workers", str(workers),
+                                      "--port", str(port), "--log-level", "warning"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def probe(port: int) -> Optional[tuple[int, dict]]:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+    try:
+        connection.request("GET", "/ready")
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    except (OSError, ValueError):
+        return None
+    finally:
+        connection.close()
+
+
+def process_tree(root: int) -> list[int]:
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as stat:
+                    parents[int(entry)] = int(stat.read().rsplit(")", 1)[1].split()[1])
+            except OSError:
+                continue
+    tree, frontier = [root], [root]
+    while frontier:
+        frontier = [pid for pid, parent in parents.items() if parent in frontier]
+        tree.extend(frontier)
+    return tree
+
+
+def pss_mb(pids: list[int]) -> float:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as rollup:
+                for line in rollup:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total / 1024
+
+
+def measure(mode: str, workers: int, args: argparse.Namespace) -> None:
+    port = free_port()
+    with RedisStandIn(latency_ms=args.latency_ms) as stand_in:
+        env = {**os.environ, "REDIS_URL": stand_in.url, "SEED_ON_STARTUP": str(args.seed_products),
+               "LOG_FILE_PATH": "logs/benchmark.log"}
+        started = time.perf_counter()
+        server = subprocess.Popen(MODES[mode](workers, port), env=env, stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL)
+        first_response = None
+        ready_workers = set()
+        try:
+            while len(ready_workers) < workers:
+                if time.perf_counter() - started > args.timeout:
+                    raise TimeoutError(f"{mode} with {workers} workers not ready after {args.timeout:g}s")
+                result = probe(port)
+                if result is None:
+                    time.sleep(0.01)
+                    continue
+                first_response = first_response or time.perf_counter() - started
+                status, body = result
+                if status == 200:
+                    ready_workers.add(body["worker"])
+            ready = time.perf_counter() - started
+            memory = pss_mb(process_tree(server.pid))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+    print(f"{mode:<8} {workers:>7} {first_response:>12.2f} {ready:>10.2f} {memory:>9.0f}")
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"{'mode':<8} {'workers':>7} {'cold start s':>12} {'ready s':>10} {'PSS MB':>9}")
+    for workers in args.workers:
+        for mode in args.modes:
+            measure(mode, workers, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated Redis round trip")
+    parser.add_argument("--seed-products", type=int, default=0,
+                        help="SEED_ON_STARTUP: products one worker seeds while the others wait")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for all workers")
+    main(parser.parse_args())
@@ -0,0 +1,251 @@
+"""
+Memory per product and per cache entry, and the CPU it costs to save it.
+
+Products. ``--sample`` generated products are stored three ways and the
+average bytes per product, scaled to ``--count``, are reported:
+
+    hash         the former layout: a hash of field strings plus the JSON copy
+    record+json  the binary record (app/utils/product_codec.py) plus the JSON copy
+    record       the record alone (PRODUCT_JSON_COPY=false)
+
+"payload" is the bytes written; "redis" is what Redis holds for them,
+estimated from its encodings (listpack below 128 fields of 64 bytes,
+embstr strings up to 44 bytes, SDS headers, dict entries) rounded up to
+jemalloc size classes, or, with ``--redis-url``, measured with MEMORY USAGE
+on the first 1,000 sampled products written to that server (and deleted
+after). Then the CPU per product of encoding a record, decoding one back to
+a Product, and of serving its JSON from the record rather than the copy.
+
+Cache entries. Pages of N products as the cache stores them, raw and
+compressed at each ``--levels``, with compress and decompress time.
+
+Admission. An LRU of ``--l1-mb`` replays a Zipf-distributed stream of
+small hot responses with an occasional ``--large-kb`` one, with and without
+``max_entry_bytes``, and reports the hit ratio of the small ones.
+
+    python -m benchmarks.bench_storage --count 1000000
+"""
+
+import time
+import random
+import argparse
+from itertools import accumulate
+from bisect import bisect
+
+import benchmarks.common  # noqa: F401  (configures the app environment)
+from app.db.fake_products import generate_product_rows
+from app.models.product import Product
+from app.services.cache_service import RedisCacheService
+from app.utils.compression import compress, decompress
+from app.utils.lru_cache import LRUCache
+from app.utils.product_codec import decode_product, encode_product
+
+
+def size_class(size: int) -> int:
+    """
+    jemalloc's allocation size for ``size`` bytes: multiples of 8 then 16 up
+    to 128, then four classes per doubling.
+    """
+    if size <= 8:
+        return 8
+    if size <= 128:
+        return -(-size // 16) * 16
+    step = 1 << (size - 1).bit_length() - 3
+    return -(-size // step) * step
+
+
+def sds(length: int) -> int:
+    header = 3 if length < 256 else 5 if length < 65536 else 9
+    return size_class(header + length + 1)
+
+
+def string_value(length: int) -> int:
+    # robj and SDS in one allocation up to 44 bytes (embstr), two above
+    return size_class(16 + 3 + length + 1) if length <= 44 else size_class(16) + sds(length)
+
+
+def key_entry(key: str) -> int:
+    # Entry in the keyspace dict, its key and half a bucket at the usual load factor
+    return size_class(24) + sds(len(key)) + 4
+
+
+def listpack_entry(data: bytes) -> int:
+    length = len(data)
+    header = 1 if length < 64 else 2 if length < 4096 else 5
+    body = header + length
+    return body + (1 if body < 128 else 2 if body < 16384 else 3)
+
+
+def hash_value(fields: dict[str, str]) -> int:
+    pairs = [(name.encode(), value.encode()) for name, value in fields.items()]
+    if len(pairs) <= 128 and all(len(value) <= 64 and len(name) <= 64 for name, value in pairs):
+        return size_class(16) + size_class(6 + sum(listpack_entry(n) + listpack_entry(v) for n, v in pairs) + 1)
+    table = 1 << (len(pairs) - 1).bit_length()
+    return (size_class(16) + size_class(96) + size_class(8 * table)
+            + sum(size_class(24) + sds(len(name)) + sds(len(value)) for name, value in pairs))
+
+
+def hash_fields(fields: dict) -> dict[str, str]:
+    # What redis-py's HSET wrote: each value's str()
+    return {name: str(value) for name, value in fields.items()}
+
+
+def product_sizes(pid: int, fields: dict, product_json: str, record: bytes) -> dict[str, tuple[int, int]]:
+    """
+    Per layout, (payload bytes, estimated Redis bytes) of one product.
+    """
+    json_key = f"product:{pid}:json"
+    key = f"product:{pid}"
+    strings = hash_fields(fields)
+    json_bytes = len(product_json.encode())
+    json_copy = (json_bytes, key_entry(json_key) + string_value(json_bytes))
+    hashed = (sum(len(name) + len(value.encode()) for name, value in strings.items()),
+              key_entry(key) + hash_value(strings))
+    stored = (len(record), key_entry(key) + string_value(len(record)))
+    return {
+        "hash": (hashed[0] + json_copy[0], hashed[1] + json_copy[1]),
+        "record+json": (stored[0] + json_copy[0], stored[1] + json_copy[1]),
+        "record": stored,
+    }
+
+
+def measure_usage(url: str, rows: list) -> dict[str, float]:
+    """
+    Average MEMORY USAGE per product of each layout on a real Redis.
+    """
+    import redis
+
+    client = redis.Redis.from_url(url)
+    usage = {"hash": 0, "record+json": 0, "record": 0}
+    try:
+        for pid, fields, product_json, record in rows:
+            key, json_key = f"bench:storage:{pid}", f"bench:storage:{pid}:json"
+            client.set(json_key, product_json)
+            copy = client.memory_usage(json_key, samples=0)
+            client.hset(key, mapping=hash_fields(fields))
+            usage["hash"] += client.memory_usage(key, samples=0) + copy
+            client.delete(key)
+            client.set(key, record)
+            stored = client.memory_usage(key, samples=0)
+            usage["record+json"] += stored + copy
+            usage["record"] += stored
+            client.delete(key, json_key)
+    finally:
+        client.close()
+    return {layout: total / len(rows) for layout, total in usage.items()}
+
+
+def timed(function, items) -> float:
+    """
+    Microseconds per item of ``function`` over ``items``.
+    """
+    started = time.perf_counter()
+    for item in items:
+        function(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def bench_products(args: argparse.Namespace) -> list:
+    started = time.perf_counter()
+    totals = {"hash": [0, 0], "record+json": [0, 0], "record": [0, 0]}
+    sample = []
+    for start in range(0, args.sample, args.chunk_size):
+        for row in generate_product_rows(0, start, min(args.chunk_size, args.sample - start)):
+            for layout, (payload, memory) in product_sizes(*row).items():
+                totals[layout][0] += payload
+                totals[layout][1] += memory
+            if len(sample) < 1000:
+                sample.append(row)
+    print(f"Generated {args.sample:,} products in {time.perf_counter() - started:.0f}s")
+
+    measured = measure_usage(args.redis_url, sample) if args.redis_url else None
+    source = "measured" if measured else "estimated"
+    print(f"\n{'layout':<12} {'payload B':>10} {'redis B':>9} {f'redis MB at {args.count:,}':>20}  ({source})")
+    for layout, (payload, memory) in totals.items():
+        per_product = measured[layout] if measured else memory / args.sample
+        print(f"{layout:<12} {payload / args.sample:>10.0f} {per_product:>9.0f} "
+              f"{per_product * args.count / 2**20:>20,.0f}")
+
+    records = [record for _, _, _, record in sample]
+    dumps = [fields for _, fields, _, _ in sample]
+    copies = [product_json.encode() for _, _, product_json, _ in sample]
+    legacy = [hash_fields(fields) for fields in dumps]
+    print(f"\n{'per product':<34} {'µs':>8}")
+    for label, function, items in (
+        ("encode record", encode_product, dumps),
+        ("decode record", decode_product, records),
+        ("record -> Product", lambda record: Product(id=1, **decode_product(record)), records),
+        ("hash -> Product", lambda fields: Product.model_validate(fields), legacy),
+        ("record -> JSON", lambda record: Product(id=1, **decode_product(record)).model_dump_json(), records),
+        ("JSON copy -> JSON", bytes.decode, copies),
+    ):
+        print(f"{label:<34} {timed(function, items):>8.1f}")
+    return sample
+
+
+def bench_cache_entries(sample: list, args: argparse.Namespace) -> None:
+    print(f"\n{'cache entry':<18} {'level':>5} {'raw B':>10} {'stored B':>10} {'ratio':>6} "
+          f"{'compress µs':>12} {'decompress µs':>14}")
+    for size in args.page_sizes:
+        rows = (sample * (size // len(sample) + 1))[:size]
+        page = "[" + ",".join(product_json for _, _, product_json, _ in rows) + "]"
+        raw = RedisCacheService._encode(time.time() + 300, 0.01, page).encode()
+        repeat = max(1, 2_000_000 // len(raw))
+        for level in args.levels:
+            stored = compress(raw, level=level)
+            compress_us = timed(lambda data: compress(data, level=level), [raw] * repeat)
+            decompress_us = timed(decompress, [stored] * repeat)
+            print(f"{f'{size} products':<18} {level:>5} {len(raw):>10,} {len(stored):>10,} "
+                  f"{len(stored) / len(raw):>6.2f} {compress_us:>12.0f} {decompress_us:>14.0f}")
+
+
+def bench_admission(args: argparse.Namespace) -> None:
+    rng = random.Random(0)
+    weights = list(accumulate(1 / rank ** args.zipf for rank in range(1, args.keys + 1)))
+    small = "x" * args.small_kb * 1024
+    large = "x" * args.large_kb * 1024
+    print(f"\n{'L1 admission':<22} {'small hit %':>12} {'rejected':>9} {'evictions':>10}")
+    for label, max_entry in (("admit all", None), (f"max entry {args.l1_max_entry_kb} KB", args.l1_max_entry_kb)):
+        cache = LRUCache(args.l1_mb * 2**20, default_ttl=3600,
+                         max_entry_bytes=max_entry and max_entry * 1024)
+        rng.seed(0)
+        hits = reads = 0
+        for request in range(args.requests):
+            if rng.random() < args.large_share:
+                key = f"large:{request}"
+                if cache.get(key) is None:
+                    cache.set(key, large)
+                continue
+            key = f"small:{bisect(weights, rng.random() * weights[-1])}"
+            reads += 1
+            if cache.get(key) is None:
+                cache.set(key, small)
+            else:
+                hits += 1
+        print(f"{label:<22} {hits / reads * 100:>12.1f} {cache.rejections:>9,} {cache.evictions:>10,}")
+
+
+def main(args: argparse.Namespace) -> None:
+    sample = bench_products(args)
+    bench_cache_entries(sample, args)
+    bench_admission(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000, help="Catalog size the totals are scaled to")
+    parser.add_argument("--sample", type=int, default=100_000, help="Products generated and measured")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Products generated per batch")
+    parser.add_argument("--redis-url", default=None, help="Measure Redis memory with MEMORY USAGE on this server")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[2, 10, 100, 1000],
+                        help="Products per cached page")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 6], help="zlib levels")
+    parser.add_argument("--l1-mb", type=int, default=16, help="L1 budget of the admission run")
+    parser.add_argument("--l1-max-entry-kb", type=int, default=256, help="max_entry_bytes of the admission run")
+    parser.add_argument("--keys", type=int, default=20_000, help="Distinct small responses")
+    parser.add_argument("--small-kb", type=int, default=2, help="Size of a small response")
+    parser.add_argument("--large-kb", type=int, default=1024, help="Size of a large response")
+    parser.add_argument("--large-share", type=float, default=0.01, help="Share of requests for a large response")
+    parser.add_argument("--zipf", type=float, default=1.0, help="Skew of the small responses' popularity")
+    parser.add_argument("--requests", type=int, default=300_000, help="Requests replayed")
+    main(parser.parse_args())
@@ -0,0 +1,370 @@
+"""
+Reproducible benchmark suite: service micro-benchmarks and end-to-end load
+scenarios, swept over concurrency levels, with machine-readable results and
+regression checks against a stored baseline.
+
+Micro-benchmarks call one service directly: a RedisRateLimiter check, a
+RedisCacheService hit, ``ProductService.get_products``, a JWT decode and a
+Product serialization. Load scenarios drive the real FastAPI app in-process
+(httpx ASGI transport, Redis through the local stand-in):
+
+- ``steady``: every client pages through /products/ back to back.
+- ``bursty``: every ``--burst-interval`` all clients send one request at once.
+- ``login_storm``: clients page through /products/ while ``--logins`` clients
+  post credentials to /token (reported latency is the readers').
+- ``cache_expiry_storm``: the cached product list expires, then all clients
+  ask for it at once; repeated every ``--burst-interval``.
+
+Every scenario reports throughput and p50/p95/p99 latency at each
+``--concurrency`` level. ``--output`` saves the results as JSON; with
+``--baseline`` (a previous ``--output`` file) a throughput drop or p99 rise
+beyond ``--threshold`` is flagged and the run exits with status 1. Compare
+runs from the same machine and settings only.
+
+    python -m benchmarks.bench_suite --output baseline.json
+    python -m benchmarks.bench_suite --baseline baseline.json --output latest.json
+    python -m benchmarks.bench_suite --scenarios steady bursty --concurrency 1 16 64
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+from typing import Awaitable, Callable
+
+# Let the load scenarios through the rate limiter and the concurrency limit (the
+# suite measures the request path, not shedding); must be set before the app is imported
+os.environ.setdefault("RATE_LIMIT_DEFAULT", '{"algorithm": "fixed_window", "limit": 100000000, "period": 60}')
+os.environ.setdefault("CONCURRENCY_LIMIT_ENABLED", "false")
+
+import httpx
+
+from benchmarks.common import RedisStandIn, summarize
+from app.core.gateway_factory import GatewayFactory
+from app.db.fake_db import fake_users_db
+from app.main import app
+from app.models.rate_limit import RateLimitRule
+from app.services.cache_service import RedisCacheService
+from app.services.product_service import ProductService
+from app.services.rate_limit_service import RedisRateLimiter
+from app.utils.jwt_manager import create_access_token, decode_jwt_token
+
+
+USERNAME = "gyanranjan@gameopedia.com"
+PASSWORD = "Gyan@123"
+
+# Result fields compared with the baseline: field -> True when higher is better
+COMPARED_FIELDS = {"throughput": True, "p99_ms": False}
+
+# Options that change the numbers; a baseline recorded with other values is not comparable
+COMPARABLE_SETTINGS = ("latency_ms", "duration", "warmup", "products", "logins", "burst_interval")
+
+
+class Context:
+    """
+    The gateway under test and what the scenarios share.
+    """
+
+    def __init__(self, gateway, client: httpx.AsyncClient, args: argparse.Namespace):
+        self.gateway = gateway
+        self.client = client
+        self.args = args
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': USERNAME})}"}
+
+
+Scenario = Callable[[Context, int], Awaitable[dict]]
+
+SCENARIOS: dict[str, tuple[str, bool, Scenario]] = {}
+
+
+def scenario(name: str, kind: str, sweep: bool = True) -> Callable[[Scenario], Scenario]:
+    """
+    Register a scenario; ``sweep=False`` runs it once, single-threaded,
+    whatever the concurrency levels (for synchronous CPU-bound calls).
+    """
+    def register(function: Scenario) -> Scenario:
+        SCENARIOS[name] = (kind, sweep, function)
+        return function
+    return register
+
+
+async def closed_loop(operation: Callable[[], Awaitable], concurrency: int, duration: float) -> dict:
+    """
+    ``concurrency`` clients call ``operation`` back to back for ``duration`` seconds.
+    """
+    latencies = []
+    stop_at = time.monotonic() + duration
+
+    async def client() -> None:
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            await operation()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def tight_loop(operation: Callable[[], object], duration: float) -> dict:
+    latencies = []
+    stop_at = time.monotonic() + duration
+    started = time.perf_counter()
+    while time.monotonic() < stop_at:
+        call_started = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def bursts(send_burst: Callable[[int], Awaitable[list]], concurrency: int, args: argparse.Namespace) -> dict:
+    """
+    Every ``--burst-interval`` seconds, ``send_burst(concurrency)`` issues one
+    request per client at once and returns their latencies.
+    """
+    latencies = []
+    stop_at = time.monotonic() + args.duration
+    started = time.perf_counter()
+    while time.monotonic() < stop_at:
+        burst_started = time.monotonic()
+        latencies.extend(await send_burst(concurrency))
+        await asyncio.sleep(max(0.0, args.burst_interval - (time.monotonic() - burst_started)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def timed_get(ctx: Context, url: str, headers: dict) -> float:
+    started = time.perf_counter()
+    response = await ctx.client.get(url, headers=headers)
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200, f"{url}: {response.status_code} {response.text}"
+    return elapsed
+
+
+@scenario("rate_limiter", "micro")
+async def rate_limiter(ctx: Context, concurrency: int) -> dict:
+    rule = RateLimitRule(algorithm="gcra", limit=100_000_000, period=60)
+    limiter = RedisRateLimiter(ctx.gateway.redis_adapter, rule)
+    counter = iter(range(sys.maxsize))
+    return await closed_loop(lambda: limiter.check_rate_limit(f"bench:{next(counter) % 1000}", rule),
+                             concurrency, ctx.args.duration)
+
+
+@scenario("cache_hit", "micro")
+async def cache_hit(ctx: Context, concurrency: int) -> dict:
+    cache = RedisCacheService(ctx.gateway.redis_adapter)
+    page = (await ctx.gateway.product_service.get_products_json()).decode()
+
+    async def compute() -> str:
+        return page
+
+    await cache.get_or_compute("bench:suite:products", compute, ttl=3600)
+    return await closed_loop(lambda: cache.get_or_compute("bench:suite:products", compute, ttl=3600),
+                             concurrency, ctx.args.duration)
+
+
+@scenario("get_products", "micro")
+async def get_products(ctx: Context, concurrency: int) -> dict:
+    return await closed_loop(lambda: ctx.gateway.product_service.get_products(limit=10), concurrency,
+                             ctx.args.duration)
+
+
+@scenario("jwt_decode", "micro", sweep=False)
+async def jwt_decode(ctx: Context, concurrency: int) -> dict:
+    token = create_access_token({"sub": USERNAME})
+    return tight_loop(lambda: decode_jwt_token(token), ctx.args.duration)
+
+
+@scenario("product_serialize", "micro", sweep=False)
+async def product_serialize(ctx: Context, concurrency: int) -> dict:
+    product = (await ctx.gateway.product_service.get_products(limit=1)).products[0]
+    return tight_loop(lambda: ProductService.serialize(product), ctx.args.duration)
+
+
+@scenario("steady", "load")
+async def steady(ctx: Context, concurrency: int) -> dict:
+    return await closed_loop(lambda: timed_get(ctx, "/products/?limit=10", ctx.headers), concurrency,
+                             ctx.args.duration)
+
+
+@scenario("bursty", "load")
+async def bursty(ctx: Context, concurrency: int) -> dict:
+    async def send_burst(size: int) -> list:
+        return await asyncio.gather(*(timed_get(ctx, "/products/?limit=10", ctx.headers) for _ in range(size)))
+    return await bursts(send_burst, concurrency, ctx.args)
+
+
+@scenario("login_storm", "load")
+async def login_storm(ctx: Context, concurrency: int) -> dict:
+    stop_at = time.monotonic() + ctx.args.duration
+    statuses: dict[int, int] = {}
+
+    async def login() -> None:
+        while time.monotonic() < stop_at:
+            response = await ctx.client.post("/token", data={"username": USERNAME, "password": PASSWORD})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 503:
+                await asyncio.sleep(0.05)
+
+    storm = asyncio.gather(*(login() for _ in range(ctx.args.logins)))
+    stats = await closed_loop(lambda: timed_get(ctx, "/products/?limit=10", ctx.headers), concurrency,
+                              ctx.args.duration)
+    await storm
+    stats["logins"] = {str(code): count for code, count in sorted(statuses.items())}
+    return stats
+
+
+@scenario("cache_expiry_storm", "load")
+async def cache_expiry_storm(ctx: Context, concurrency: int) -> dict:
+    cache = ctx.gateway.cache_service
+    # Bypass the whole-response cache so every request reaches the expired entry
+    headers = {**ctx.headers, "Cache-Control": "no-cache"}
+    stampede_stats = getattr(getattr(cache, "l2", cache), "stampede_stats", {})
+    computes_before = stampede_stats.get("computes", 0)
+    storms = 0
+
+    async def send_burst(size: int) -> list:
+        nonlocal storms
+        await cache.invalidate("cached_products")
+        storms += 1
+        return await asyncio.gather(*(timed_get(ctx, "/cached_products/", headers) for _ in range(size)))
+
+    stats = await bursts(send_burst, concurrency, ctx.args)
+    if stampede_stats:
+        stats["backend_calls_per_storm"] = (stampede_stats["computes"] - computes_before) / storms
+    return stats
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Keys and fields of ``results`` that are worse than ``baseline`` by more
+    than ``threshold`` (a fraction).
+    """
+    regressions = []
+    for key, stats in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for field, higher_is_better in COMPARED_FIELDS.items():
+            old, new = previous.get(field), stats.get(field)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{key} {field}: {old:,.3f} -> {new:,.3f} ({change:+.0%})")
+    return regressions
+
+
+def format_result(key: str, stats: dict, previous: dict) -> str:
+    line = (f"{key:<26} {stats['throughput']:>11,.0f} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} "
+            f"{stats['p99_ms']:>9.3f}")
+    if previous:
+        line += f"   {stats['throughput'] / previous['throughput'] - 1:>+6.0%} {stats['p99_ms'] / previous['p99_ms'] - 1:>+7.0%}"
+    return line
+
+
+async def run_suite(redis_url: str, args: argparse.Namespace, baseline: dict) -> dict:
+    gateway = GatewayFactory.create_gateway(user_db=fake_users_db, redis_url=redis_url)
+    app.state.gateway = gateway
+    await gateway.start()
+    await gateway.product_service.seed_products(args.products, chunk_size=500)
+    results = {}
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+            ctx = Context(gateway, client, args)
+            for name in args.scenarios:
+                kind, sweep, function = SCENARIOS[name]
+                for concurrency in (args.concurrency if sweep else [1]):
+                    key = f"{name}@{concurrency}"
+                    if args.warmup:
+                        warmup_args = argparse.Namespace(**{**vars(args), "duration": args.warmup})
+                        await function(Context(gateway, client, warmup_args), concurrency)
+                    stats = await function(ctx, concurrency)
+                    results[key] = {"scenario": name, "kind": kind, "concurrency": concurrency, **stats}
+                    print(format_result(key, stats, baseline.get(key)))
+    finally:
+        await gateway.close()
+    return results
+
+
+async def main(args: argparse.Namespace) -> int:
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            report = json.load(f)
+        baseline = report["results"]
+        differing = {name: value for name, value in report["meta"]["settings"].items()
+                     if getattr(args, name) != value}
+        if differing:
+            print(f"Warning: the baseline was recorded with different settings {differing}")
+
+    stand_in = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        stand_in = RedisStandIn(latency_ms=args.latency_ms).start()
+        redis_url = stand_in.url
+
+    print(f"{args.duration:g}s per run, concurrency {' '.join(map(str, args.concurrency))}, "
+          f"{args.products} products, Redis {'stand-in +%gms' % args.latency_ms if stand_in else redis_url}")
+    header = f"{'scenario@concurrency':<26} {'ops/s':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header + ("   ops/s    p99 vs baseline" if baseline else ""))
+    try:
+        results = await run_suite(redis_url, args, baseline)
+    finally:
+        if stand_in is not None:
+            stand_in.stop()
+
+    if args.output:
+        report = {
+            "meta": {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "redis": "stand-in" if stand_in else "external",
+                "settings": {name: getattr(args, name) for name in COMPARABLE_SETTINGS},
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if baseline and not regressions:
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="Benchmark a real Redis instead of the local stand-in")
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="Simulated round trip of the stand-in")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds measured per scenario and level")
+    parser.add_argument("--warmup", type=float, default=0.5, help="Seconds run, unmeasured, before each measurement")
+    parser.add_argument("--products", type=int, default=1000, help="Products seeded before the run")
+    parser.add_argument("--logins", type=int, default=8, help="Concurrent login clients in login_storm")
+    parser.add_argument("--burst-interval", type=float, default=0.1, help="Seconds between bursts")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Flag regressions against this earlier --output file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Throughput drop or p99 rise, as a fraction, that counts as a regression")
+    sys.exit(asyncio.run(main(parser.parse_args())))
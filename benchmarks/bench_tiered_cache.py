@@ -0,0 +1,101 @@
+"""
+Hit ratio per tier and L1 memory of the two-tier response cache.
+
+Several simulated workers share one in-process fakeredis server (which, unlike
+the TCP stand-in, supports pub/sub). Its async client ignores redis-py's
+per-command NEVER_DECODE, so each worker's L2 reads the binary cache values
+through a client of its own that never decodes. Each worker reads Zipf-distributed keys
+through its own TieredCacheService, filling misses as a backend would, while
+a fraction of operations rewrite keys so invalidations flow between workers.
+
+    python -m benchmarks.bench_tiered_cache --workers 4 --keys 5000 --l1-mb 1 8
+"""
+
+import random
+import asyncio
+import argparse
+
+import fakeredis
+
+import benchmarks.common  # noqa: F401  (configures the app environment)
+from app.adapters.redis_adapter import RedisAdapter
+from app.services.cache_service import RedisCacheService, TieredCacheService
+from app.utils.lru_cache import LRUCache
+
+
+def zipf_keys(count: int, total: int, skew: float, rng: random.Random) -> list[str]:
+    weights = [1 / (rank ** skew) for rank in range(1, total + 1)]
+    return [f"bench:response:{i}" for i in rng.choices(range(total), weights=weights, k=count)]
+
+
+async def run(args: argparse.Namespace, l1_bytes: int) -> dict:
+    server = fakeredis.FakeServer()
+    workers = [
+        TieredCacheService(RedisAdapter(client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True)),
+                           LRUCache(l1_bytes, default_ttl=args.l1_ttl),
+                           l2=RedisCacheService(RedisAdapter(client=fakeredis.FakeAsyncRedis(server=server))))
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        await worker.start()
+    await asyncio.sleep(0.05)
+
+    payload = "x" * args.value_bytes
+    rng = random.Random(args.seed)
+    stale_reads = 0
+    versions: dict[str, int] = {}
+
+    async def drive(worker: TieredCacheService, keys: list[str]) -> None:
+        nonlocal stale_reads
+        for key in keys:
+            if rng.random() < args.write_ratio:
+                versions[key] = versions.get(key, 0) + 1
+                await worker.cache_response(key, f"{versions[key]}:{payload}", expire_time=args.ttl)
+                continue
+            value = await worker.get_cached_response(key)
+            if value is None:
+                await worker.cache_response(key, f"{versions.get(key, 0)}:{payload}", expire_time=args.ttl)
+            elif int(value.split(":", 1)[0]) != versions.get(key, 0):
+                stale_reads += 1
+
+    per_worker = args.operations // args.workers
+    await asyncio.gather(*(drive(worker, zipf_keys(per_worker, args.keys, args.skew, rng)) for worker in workers))
+
+    totals = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "l1_bytes": 0}
+    for worker in workers:
+        stats = worker.tier_stats()
+        for name in totals:
+            totals[name] += stats[name]
+        await worker.close()
+    lookups = totals["l1_hits"] + totals["l2_hits"] + totals["misses"]
+    return {
+        "l1_ratio": totals["l1_hits"] / lookups,
+        "l2_ratio": totals["l2_hits"] / lookups,
+        "miss_ratio": totals["misses"] / lookups,
+        "l1_mb_per_worker": totals["l1_bytes"] / args.workers / 2**20,
+        "stale_reads": stale_reads,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"workers={args.workers} keys={args.keys} skew={args.skew} writes={args.write_ratio:.0%}")
+    print(f"{'L1 budget':>10} {'L1 hit':>8} {'L2 hit':>8} {'miss':>8} {'L1 MB/worker':>13} {'stale reads':>12}")
+    for mb in args.l1_mb:
+        stats = await run(args, int(mb * 2**20))
+        print(f"{mb:>8} MB {stats['l1_ratio']:>8.1%} {stats['l2_ratio']:>8.1%} {stats['miss_ratio']:>8.1%} "
+              f"{stats['l1_mb_per_worker']:>13.2f} {stats['stale_reads']:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=40000)
+    parser.add_argument("--keys", type=int, default=5000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of key popularity")
+    parser.add_argument("--write-ratio", type=float, default=0.01)
+    parser.add_argument("--value-bytes", type=int, default=2048)
+    parser.add_argument("--ttl", type=int, default=300)
+    parser.add_argument("--l1-ttl", type=float, default=5.0)
+    parser.add_argument("--l1-mb", type=float, nargs="+", default=[0.5, 2, 8])
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
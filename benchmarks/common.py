@@ -0,0 +1,219 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run fully offline: ``RedisStandIn`` speaks the Redis wire protocol on
+a local TCP port and executes commands with ``fakeredis``, optionally adding a
+simulated network round trip so that blocking and non-blocking clients can be
+compared honestly. Pass ``--redis-url`` to a script to target a real server.
+"""
+
+import os
+import asyncio
+import statistics
+import threading
+from typing import Optional
+
+# The app reads its configuration at import time; provide harmless defaults so
+# benchmarks can import it without a .env file.
+for _name, _value in {
+    "CURRENT_ENVIRONMENT": "benchmark",
+    "DEBUG": "0",
+    "SECRET_KEY": "benchmark-secret",
+    "JWT_SECRET": "benchmark-jwt-secret",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "LOG_FILE_PATH": "logs/benchmark.log",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import fakeredis
+from redis.exceptions import ExecAbortError, NoScriptError
+
+
+def _encode(value) -> bytes:
+    """
+    Encode a fakeredis reply as RESP2.
+    """
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        return b":1\r\n" if value else b":0\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, float):
+        value = repr(value)
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, Exception):
+        # redis-py strips the error code while parsing; restore it for the client
+        prefix = "NOSCRIPT" if isinstance(value, NoScriptError) else "EXECABORT" if isinstance(value, ExecAbortError) else "ERR"
+        message = str(value).replace("\r\n", " ")
+        if not message.split(" ", 1)[0].isupper():
+            message = f"{prefix} {message}"
+        return b"-%s\r\n" % message.encode()
+    if isinstance(value, (list, tuple, set)):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    raise TypeError(f"Cannot encode {type(value)!r} as RESP")
+
+
+def _parse_commands(buffer: bytearray) -> list:
+    """
+    Pop every complete RESP array command off the front of ``buffer``.
+    """
+    commands = []
+    while buffer:
+        if buffer[:1] != b"*":
+            end = buffer.find(b"\r\n")
+            if end < 0:
+                break
+            commands.append(bytes(buffer[:end]).split())
+            del buffer[:end + 2]
+            continue
+        pos = buffer.find(b"\r\n")
+        if pos < 0:
+            break
+        count = int(buffer[1:pos])
+        pos += 2
+        args = []
+        for _ in range(count):
+            end = buffer.find(b"\r\n", pos)
+            if end < 0:
+                return commands
+            size = int(buffer[pos + 1:end])
+            start = end + 2
+            if len(buffer) < start + size + 2:
+                return commands
+            args.append(bytes(buffer[start:start + size]))
+            pos = start + size + 2
+        if len(args) < count:
+            break
+        commands.append(args)
+        del buffer[:pos]
+    return commands
+
+
+class RedisStandIn:
+    """
+    A local Redis stand-in served over TCP from a background thread.
+
+    Every batch of bytes read from a connection waits ``latency_ms`` before it
+    is answered, which models one network round trip per request or pipeline.
+    With ``service_ms``, each command also occupies the server for that long,
+    one command at a time across all connections, like Redis's single
+    command thread; that caps one stand-in at 1000 / ``service_ms`` commands
+    per second.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, server: Optional[fakeredis.FakeServer] = None,
+                 service_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.service_time = service_ms / 1000
+        self.server = server or fakeredis.FakeServer()
+        self.port: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._busy: Optional[asyncio.Lock] = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def start(self) -> "RedisStandIn":
+        self._thread = threading.Thread(target=self._run, name="redis-stand-in", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "RedisStandIn":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._busy = asyncio.Lock()
+        server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=4096))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        server.close()
+        tasks = asyncio.all_tasks(self._loop)
+        for task in tasks:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = fakeredis.FakeRedis(server=self.server, single_connection_client=True)
+        client.response_callbacks = {}
+        buffer = bytearray()
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                buffer.extend(chunk)
+                commands = _parse_commands(buffer)
+                if not commands:
+                    continue
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if self.service_time:
+                    async with self._busy:
+                        await asyncio.sleep(self.service_time * len(commands))
+                replies = []
+                for command in commands:
+                    try:
+                        replies.append(_encode(client.execute_command(*command)))
+                    except Exception as e:
+                        replies.append(_encode(e))
+                writer.write(b"".join(replies))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            client.close()
+
+
+def percentile(samples: list, pct: float) -> float:
+    """
+    Nearest-rank percentile of ``samples`` (``pct`` in 0..100).
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    """
+    Summarize per-operation latencies (seconds) measured over ``elapsed`` seconds.
+    """
+    return {
+        "ops": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def format_row(name: str, stats: dict) -> str:
+    return (
+        f"{name:<28} {stats['throughput']:>12,.0f} ops/s   "
+        f"p50 {stats['p50_ms']:>8.3f} ms   p95 {stats['p95_ms']:>8.3f} ms   p99 {stats['p99_ms']:>8.3f} ms"
+    )